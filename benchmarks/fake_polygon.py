@@ -0,0 +1,140 @@
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from polygon_cache.cache import CachedRESTClient
+
+AGGREGATES_URL = re.compile(
+    r"^/v2/aggs/ticker/(?P<ticker>[^/]+)/range/(?P<multiplier>\d+)/(?P<timespan>\w+)"
+    r"/(?P<from_>\d{4}-\d{2}-\d{2})/(?P<to>\d{4}-\d{2}-\d{2})"
+)
+
+
+class FakePolygon(ThreadingHTTPServer):
+    # a local stand in for polygon's aggregates endpoint. every request waits
+    # latency seconds and returns bars_per_day bars for every day in its range,
+    # and every rate_limit_every-th request is rejected with a 429 to exercise
+    # the client's retries
+    daemon_threads = True
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        bars_per_day: int = 24,
+        rate_limit_every: int = 0,
+        port: int = 0,
+    ):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.bars_per_day = bars_per_day
+        self.rate_limit_every = rate_limit_every
+        self.requests = 0
+        self.rate_limited = 0
+        self.sent_bytes = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakePolygon":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "FakePolygon":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count_request(self) -> bool:
+        # counts a request, true if it should be rejected with a 429
+        with self._lock:
+            self.requests += 1
+            limited = (
+                self.rate_limit_every > 0 and self.requests % self.rate_limit_every == 0
+            )
+            self.rate_limited += limited
+            return limited
+
+    def count_bytes(self, sent: int):
+        with self._lock:
+            self.sent_bytes += sent
+
+
+def fake_aggregates(ticker: str, from_: str, to: str, bars_per_day: int) -> dict:
+    # an aggregates body with bars_per_day evenly spaced bars on every day
+    start = datetime.strptime(from_, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    end = datetime.strptime(to, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    step = 24 * 60 * 60 * 1000 // bars_per_day
+    first = int(start.timestamp() * 1000)
+    results = [
+        {
+            "v": 100 + i % 50,
+            "vw": 10.5,
+            "o": 10,
+            "c": 11,
+            "h": 12,
+            "l": 9,
+            "t": first + i * step,
+            "n": 1 + i % 7,
+        }
+        for i in range(((end - start).days + 1) * bars_per_day)
+    ]
+    return {
+        "ticker": ticker,
+        "status": "OK",
+        "adjusted": True,
+        "queryCount": len(results),
+        "resultsCount": len(results),
+        "results": results,
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        match = AGGREGATES_URL.match(self.path.split("?")[0])
+        if match is None:
+            return self._reply(404, {"status": "NOT_FOUND"})
+        if self.server.count_request():
+            return self._reply(429, {"status": "ERROR"}, {"Retry-After": "0"})
+        time.sleep(self.server.latency)
+        self._reply(
+            200,
+            fake_aggregates(
+                match["ticker"], match["from_"], match["to"], self.server.bars_per_day
+            ),
+        )
+
+    def _reply(self, status: int, body: dict, headers: dict = None):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+        self.server.count_bytes(len(content))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def fake_client(server: FakePolygon, cache_location: str, **options):
+    # a client that sends its requests to the fake server instead of polygon
+    client = CachedRESTClient("benchmark", cache_location=cache_location, **options)
+    client.url = server.url
+    return client
@@ -0,0 +1,192 @@
+import argparse
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import List
+
+from benchmarks.fake_polygon import FakePolygon, fake_client
+from polygon_cache.warm import parse_timespan
+
+
+class LoadReport:
+    def __init__(self):
+        self.calls = 0
+        self.latencies = []
+        self.failed = []
+        self.hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+        self.rate_limited = 0
+        self.cache_bytes_before = 0
+        self.cache_bytes_after = 0
+        self.seconds = 0.0
+
+    def percentile(self, percent: float) -> float:
+        # nearest rank percentile of the latencies of calls that succeeded
+        if not self.latencies:
+            return 0.0
+        ranked = sorted(self.latencies)
+        return ranked[max(0, round(percent / 100 * len(ranked)) - 1)]
+
+    def summary(self) -> str:
+        return "\n".join(
+            [
+                f"{self.calls} calls in {self.seconds:.1f}s "
+                f"({self.calls / self.seconds if self.seconds else 0:.1f} calls/s), "
+                f"{len(self.failed)} failed",
+                f"latency p50 {self.percentile(50) * 1000:.0f}ms "
+                f"p99 {self.percentile(99) * 1000:.0f}ms "
+                f"max {max(self.latencies, default=0) * 1000:.0f}ms",
+                f"{self.hits} responses served from the cache, {self.misses} missed, "
+                f"{self.upstream_calls} upstream calls, "
+                f"{self.rate_limited} rate limited",
+                f"cache grew from {self.cache_bytes_before / 1e6:.1f}MB "
+                f"to {self.cache_bytes_after / 1e6:.1f}MB",
+            ]
+            + [
+                f"failed {' '.join(map(str, call))}: {error}"
+                for call, error in self.failed
+            ]
+        )
+
+
+def plan_calls(
+    seed: int,
+    calls: int,
+    tickers: int,
+    exponent: float,
+    timespans: List[tuple],
+    history_from: date,
+    history_to: date,
+    max_window_days: int,
+) -> List[tuple]:
+    # (ticker, multiplier, timespan, from, to) calls for tickers picked with a
+    # zipf distribution, a few popular tickers get most of the calls like in
+    # production, over random windows of the history that often overlap
+    rng = random.Random(seed)
+    names = [f"T{rank:04d}" for rank in range(1, tickers + 1)]
+    weights = [1 / rank**exponent for rank in range(1, tickers + 1)]
+    history_days = (history_to - history_from).days + 1
+    planned = []
+    for ticker in rng.choices(names, weights, k=calls):
+        multiplier, timespan = rng.choice(timespans)
+        days = rng.randint(1, min(max_window_days, history_days))
+        start = history_from + timedelta(days=rng.randrange(history_days - days + 1))
+        end = start + timedelta(days=days - 1)
+        planned.append(
+            (ticker, multiplier, timespan, start.isoformat(), end.isoformat())
+        )
+    return planned
+
+
+def run_load(
+    server: FakePolygon,
+    cache_location: str,
+    planned: List[tuple],
+    concurrency: int,
+    warm_fraction: float = 0.0,
+    max_threads: int = 20,
+    seed: int = 0,
+) -> LoadReport:
+    # makes the planned calls from concurrency callers sharing one client,
+    # after making a warm_fraction of them to start from a partly warm cache
+    client = fake_client(server, cache_location)
+    warm = random.Random(seed).sample(planned, int(len(planned) * warm_fraction))
+    for call in warm:
+        client.stocks_equities_aggregates(*call, max_threads=max_threads)
+
+    report = LoadReport()
+    report.calls = len(planned)
+    report.cache_bytes_before = client.cache.size()
+    requests, rate_limited = server.requests, server.rate_limited
+    client.metrics.reset()
+
+    def call(planned_call):
+        started = time.perf_counter()
+        try:
+            client.stocks_equities_aggregates(*planned_call, max_threads=max_threads)
+        except Exception as error:
+            report.failed.append((planned_call, error))
+        else:
+            report.latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(call, planned))
+    report.seconds = time.perf_counter() - started
+    report.upstream_calls = server.requests - requests
+    report.rate_limited = server.rate_limited - rate_limited
+    report.cache_bytes_after = client.cache.size()
+    report.hits = client.metrics.total("polygon_cache_hits_total")
+    report.misses = client.metrics.total("polygon_cache_misses_total")
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.load",
+        description="Load test the client against a local fake polygon server.",
+    )
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--tickers", type=int, default=100)
+    parser.add_argument(
+        "--zipf", type=float, default=1.1, help="the zipf exponent of the tickers"
+    )
+    parser.add_argument(
+        "--timespan",
+        nargs="+",
+        default=["minute", "day"],
+        help="timespans picked at random, e.g. minute or 5/minute",
+    )
+    parser.add_argument("--from", dest="from_", default="2019-01-01")
+    parser.add_argument("--to", default="2020-12-31")
+    parser.add_argument("--max-window-days", type=int, default=30)
+    parser.add_argument(
+        "--warm-fraction",
+        type=float,
+        default=0.2,
+        help="the fraction of the calls made before the load test",
+    )
+    parser.add_argument("--max-threads", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--bars-per-day", type=int, default=390)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument(
+        "--cache-location",
+        help="the cache to use, an empty temporary one if not given",
+    )
+    options = parser.parse_args(argv)
+
+    planned = plan_calls(
+        options.seed,
+        options.calls,
+        options.tickers,
+        options.zipf,
+        [parse_timespan(timespan) for timespan in options.timespan],
+        date.fromisoformat(options.from_),
+        date.fromisoformat(options.to),
+        options.max_window_days,
+    )
+    with FakePolygon(
+        options.latency, options.bars_per_day, options.rate_limit_every
+    ) as server, tempfile.TemporaryDirectory() as directory:
+        report = run_load(
+            server,
+            options.cache_location or f"{directory}/polygon-cache",
+            planned,
+            options.concurrency,
+            options.warm_fraction,
+            options.max_threads,
+            options.seed,
+        )
+    print(report.summary())
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
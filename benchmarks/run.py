@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, Tuple
+
+from polygon.rest.models import StocksEquitiesAggregatesApiResponse
+
+from benchmarks.fake_polygon import FakePolygon, fake_aggregates, fake_client
+from polygon_cache.backend import PolygonCache
+from polygon_cache.cache import CachedRESTClient
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+# a benchmark regresses when its rate drops this far below its baseline
+DEFAULT_TOLERANCE = 0.25
+START = date(2019, 1, 1)
+
+# name: (function, unit), a function is called with the options and a
+# temporary directory and returns the amount of work it timed and the seconds
+BENCHMARKS: Dict[str, Tuple[Callable, str]] = {}
+
+
+def benchmark(name: str, unit: str):
+    def register(function):
+        BENCHMARKS[name] = (function, unit)
+        return function
+
+    return register
+
+
+def _to(options) -> str:
+    return (START + timedelta(days=max(1, int(365 * options.scale)) - 1)).isoformat()
+
+
+def _fetch(client: CachedRESTClient, options) -> Tuple[int, float]:
+    started = time.perf_counter()
+    response = client.stocks_equities_aggregates(
+        "AAA", 1, "minute", START.isoformat(), _to(options)
+    )
+    return len(response.results), time.perf_counter() - started
+
+
+@benchmark("aggregates_cold", "bars/s")
+def aggregates_cold(options, directory):
+    with FakePolygon(
+        options.latency, options.bars_per_day, options.rate_limit_every
+    ) as server:
+        return _fetch(fake_client(server, os.path.join(directory, "cache")), options)
+
+
+@benchmark("aggregates_warm", "bars/s")
+def aggregates_warm(options, directory):
+    with FakePolygon(0, options.bars_per_day) as server:
+        client = fake_client(server, os.path.join(directory, "cache"))
+        _fetch(client, options)
+        return _fetch(client, options)
+
+
+def _combine(options, compact: bool):
+    bars = int(2_000_000 * options.scale)
+    chunk_days = 5
+    responses = []
+    day = START
+    while len(responses) * chunk_days * options.bars_per_day < bars:
+        end = day + timedelta(days=chunk_days - 1)
+        response = StocksEquitiesAggregatesApiResponse()
+        for attr, value in fake_aggregates(
+            "AAA", day.isoformat(), end.isoformat(), options.bars_per_day
+        ).items():
+            setattr(response, attr, value)
+        responses.append(response)
+        day = end + timedelta(days=1)
+
+    started = time.perf_counter()
+    combined = CachedRESTClient._combine_aggregate_results(
+        responses,
+        ("ticker", "status", "adjusted"),
+        ("queryCount",),
+        (),
+        StocksEquitiesAggregatesApiResponse,
+        merged_attrs=("results",),
+        compact=compact,
+    )
+    return len(combined.results), time.perf_counter() - started
+
+
+@benchmark("combine", "bars/s")
+def combine(options, directory):
+    return _combine(options, compact=False)
+
+
+@benchmark("combine_compact", "bars/s")
+def combine_compact(options, directory):
+    return _combine(options, compact=True)
+
+
+def _cached_responses(options, directory) -> dict:
+    with FakePolygon(0, options.bars_per_day) as server:
+        client = fake_client(server, os.path.join(directory, "source"))
+        _fetch(client, options)
+    keys = [entry["key"] for entry in client.cache.entries("AAA")]
+    return client.cache.get_responses(keys)
+
+
+@benchmark("cache_write", "MB/s")
+def cache_write(options, directory):
+    responses = _cached_responses(options, directory)
+    cache = PolygonCache(os.path.join(directory, "written"))
+    started = time.perf_counter()
+    for key, response in responses.items():
+        cache.save_response(key, response)
+    seconds = time.perf_counter() - started
+    return sum(len(response.content) for response in responses.values()) / 1e6, seconds
+
+
+@benchmark("cache_read", "MB/s")
+def cache_read(options, directory):
+    responses = _cached_responses(options, directory)
+    cache = PolygonCache(os.path.join(directory, "source"))
+    started = time.perf_counter()
+    read = cache.get_responses(list(responses))
+    seconds = time.perf_counter() - started
+    return sum(len(response.content) for response in read.values()) / 1e6, seconds
+
+
+def run(options) -> Dict[str, dict]:
+    # the fastest of several runs, which is the least disturbed by whatever
+    # else the machine is doing
+    results = {}
+    for name in options.only or BENCHMARKS:
+        function, unit = BENCHMARKS[name]
+        for _ in range(options.repeat):
+            with tempfile.TemporaryDirectory() as directory:
+                amount, seconds = function(options, directory)
+            rate = amount / seconds
+            if name not in results or rate > results[name]["rate"]:
+                results[name] = {"rate": round(rate, 1), "unit": unit}
+    return results
+
+
+def compare(results: Dict[str, dict], baselines: Dict[str, dict], tolerance: float):
+    # prints every result next to its baseline, returns the regressed names
+    regressed = []
+    for name, result in results.items():
+        line = f"{name:<16} {result['rate']:>14,.1f} {result['unit']}"
+        baseline = baselines.get(name)
+        if baseline is not None:
+            change = result["rate"] / baseline["rate"] - 1
+            line += f"  {change:+.0%} against {baseline['rate']:,.1f}"
+            if change < -tolerance:
+                regressed.append(name)
+                line += "  REGRESSED"
+        print(line)
+    return regressed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Benchmark the client against a local fake polygon server.",
+    )
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="multiplies the amount of data, 1 is a year of bars and 2 million "
+        "bars to combine",
+    )
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--bars-per-day", type=int, default=390)
+    parser.add_argument(
+        "--rate-limit-every",
+        type=int,
+        default=0,
+        help="reject every nth request with a 429",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--baselines", default=BASELINES)
+    parser.add_argument(
+        "--save", action="store_true", help="store the results as the baselines"
+    )
+    options = parser.parse_args(argv)
+
+    results = run(options)
+    baselines = {}
+    if os.path.exists(options.baselines):
+        with open(options.baselines) as file:
+            baselines = json.load(file)["benchmarks"]
+    regressed = compare(results, {} if options.save else baselines, options.tolerance)
+    if options.save:
+        with open(options.baselines, "w") as file:
+            json.dump(
+                {
+                    "machine": f"{platform.machine()} {platform.processor()}".strip(),
+                    "python": platform.python_version(),
+                    "benchmarks": {**baselines, **results},
+                },
+                file,
+                indent=2,
+            )
+            file.write("\n")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,751 @@
+import lzma
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import weakref
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+from requests_cache.backends.base import BaseCache
+from requests_cache.backends.sqlite import DbCache
+
+from polygon_cache.tracing import span
+
+AGGREGATES_PATH = re.compile(
+    r"/v2/aggs/ticker/(?P<ticker>[^/]+)/range/(?P<multiplier>\d+)/(?P<timespan>[^/]+)"
+    r"/(?P<from_date>\d{4}-\d{2}-\d{2})/(?P<to_date>\d{4}-\d{2}-\d{2})$"
+)
+TICKS_PATH = re.compile(
+    r"/v2/ticks/stocks/(?P<endpoint>trades|nbbo)/(?P<ticker>[^/]+)"
+    r"/(?P<from_date>\d{4}-\d{2}-\d{2})$"
+)
+TICKS_ENDPOINTS = {"trades": "trades", "nbbo": "quotes"}
+
+# sqlite's default limit on the number of ? placeholders in one statement
+SQLITE_MAX_VARIABLES = 999
+
+ENTRY_COLUMNS = (
+    "key",
+    "endpoint",
+    "ticker",
+    "multiplier",
+    "timespan",
+    "adjusted",
+    "from_date",
+    "to_date",
+    "row_count",
+    "first_timestamp",
+    "last_timestamp",
+    "bytes",
+    "created_at",
+    "last_access",
+    "tier",
+)
+HOT = "hot"
+ARCHIVE = "archive"
+# archived responses are read about once a quarter so they're compressed as
+# small as lzma goes, at the cost of slow archiving
+ARCHIVE_COMPRESSION_PRESET = 9
+
+# eviction stops once the cache is back under this fraction of its maximum
+# size, so it doesn't run again on the very next write
+EVICTION_LOW_WATER_MARK = 0.9
+EVICTION_BATCH_SIZE = 100
+
+# access times kept in memory before they're written to the index, so reads
+# don't grow them without bound when nothing evicts
+ACCESS_FLUSH_SIZE = 1000
+
+# how many seconds compaction waits for writers to finish before it fails
+COMPACT_TIMEOUT = 60
+
+DEFAULT_SHARDS = 16
+SHARD_NAME = "shard-{:03d}"
+SHARD_FILE = re.compile(r"^shard-\d{3}(?P<extension>\..+)$")
+
+
+def describe_url(url: str) -> dict:
+    # pulls what a cached response covers out of its polygon url
+    parsed = urlparse(url)
+    query = dict(parse_qsl(parsed.query))
+    if match := AGGREGATES_PATH.search(parsed.path):
+        description = match.groupdict()
+        description["endpoint"] = "aggregates"
+        description["multiplier"] = int(description["multiplier"])
+        if "unadjusted" in query:
+            description["adjusted"] = query["unadjusted"].lower() != "true"
+        return description
+    if match := TICKS_PATH.search(parsed.path):
+        description = match.groupdict()
+        description["endpoint"] = TICKS_ENDPOINTS[description["endpoint"]]
+        description["to_date"] = description["from_date"]
+        return description
+    return {"endpoint": parsed.path}
+
+
+def describe_response(key: str, response) -> dict:
+    # the index entry of a response that was just cached
+    entry = {column: None for column in ENTRY_COLUMNS}
+    entry.update(describe_url(response.url))
+    try:
+        parsed_response = response.json()
+    except ValueError:
+        parsed_response = {}
+    if isinstance(parsed_response, dict):
+        if "adjusted" in parsed_response:
+            entry["adjusted"] = parsed_response["adjusted"]
+        results = parsed_response.get("results") or []
+        entry["row_count"] = len(results)
+        # the timestamps of results that are strictly increasing, which show
+        # whether chunks of aggregates overlap without decoding them
+        timestamps = [
+            result.get("t") if isinstance(result, dict) else None for result in results
+        ]
+        if (
+            timestamps
+            and all(isinstance(timestamp, (int, float)) for timestamp in timestamps)
+            and all(a < b for a, b in zip(timestamps, timestamps[1:]))
+        ):
+            entry["first_timestamp"] = timestamps[0]
+            entry["last_timestamp"] = timestamps[-1]
+    now = datetime.utcnow().isoformat()
+    entry.update(
+        key=key,
+        bytes=len(response.content),
+        created_at=now,
+        last_access=now,
+        tier=HOT,
+    )
+    return entry
+
+
+def filter_entries(entries: List[dict], **filters) -> List[dict]:
+    # the entries matching every filter that isn't None, by date
+    filters = {column: value for column, value in filters.items() if value is not None}
+    return sorted(
+        (
+            entry
+            for entry in entries
+            if all(entry[column] == value for column, value in filters.items())
+        ),
+        key=lambda entry: (entry["from_date"] or "", entry["to_date"] or ""),
+    )
+
+
+def merge_intervals(entries: List[dict]) -> List[Tuple[date, date]]:
+    # the merged, inclusive date ranges of entries sorted by from date
+    intervals = []
+    for entry in entries:
+        start = datetime.strptime(entry["from_date"], "%Y-%m-%d").date()
+        end = datetime.strptime(entry["to_date"], "%Y-%m-%d").date()
+        if intervals and start <= intervals[-1][1] + timedelta(1):
+            intervals[-1] = (intervals[-1][0], max(intervals[-1][1], end))
+        else:
+            intervals.append((start, end))
+    return intervals
+
+
+class PolygonCache(DbCache):
+    # the requests_cache sqlite backend plus an index of what every cached
+    # response covers, kept in the same file and updated on every write.
+    # with a max_size the least recently used responses are evicted by a
+    # background thread whenever the hot tier grows past it. responses moved
+    # to the archive tier are kept lzma compressed in a separate file, which
+    # may be on another volume, and are read back from there transparently
+    def __init__(
+        self,
+        location="polygon-cache",
+        extension=".sqlite",
+        max_size: Optional[int] = None,
+        archive_location: Optional[str] = None,
+        **options,
+    ):
+        super().__init__(location, extension=extension, **options)
+        self.filename = location + extension
+        self.archive_filename = (archive_location or location + "-archive") + extension
+        self.max_size = max_size
+        self._index_lock = threading.RLock()
+        # reads only record their access time in memory, it is written to the
+        # index in batches before each eviction pass or once enough pile up
+        self._accessed: Dict[str, str] = {}
+        self._mounted: Dict[str, tuple] = {}
+        self._evictor = None
+        with self._index() as con:
+            # readers aren't blocked by writers, and so not by compaction
+            con.execute("pragma journal_mode=wal")
+            con.execute(
+                f"create table if not exists entries ({', '.join(ENTRY_COLUMNS)}, "
+                "primary key (key))"
+            )
+            columns = [row[1] for row in con.execute("pragma table_info(entries)")]
+            # cache files indexed before some of the columns existed
+            for column in ENTRY_COLUMNS:
+                if column not in columns:
+                    con.execute(f"alter table entries add column {column}")
+            # everything indexed before tiering existed is in the hot tier
+            con.execute("update entries set tier=? where tier is null", (HOT,))
+            con.execute(
+                "create index if not exists entries_coverage "
+                "on entries (ticker, endpoint, multiplier, timespan, from_date)"
+            )
+            con.execute(
+                "create index if not exists entries_last_access "
+                "on entries (last_access)"
+            )
+
+    @contextmanager
+    def _index(self):
+        with self._index_lock:
+            con = sqlite3.connect(self.filename)
+            try:
+                yield con
+                con.commit()
+            finally:
+                con.close()
+
+    @contextmanager
+    def _archive(self):
+        with self._index_lock:
+            con = sqlite3.connect(self.archive_filename)
+            try:
+                con.execute("pragma journal_mode=wal")
+                con.execute(
+                    "create table if not exists responses (key PRIMARY KEY, value)"
+                )
+                yield con
+                con.commit()
+            finally:
+                con.close()
+
+    def _has_archive(self) -> bool:
+        return os.path.exists(self.archive_filename)
+
+    def save_response(self, key, response):
+        with span("cache_write", bytes=len(response.content)):
+            super().save_response(key, response)
+            if self._has_archive():
+                # a fresh response replaces an archived one
+                with self._archive() as con:
+                    con.execute("delete from responses where key=?", (key,))
+            self._index_response(key, response)
+        if self.max_size is not None:
+            self._wake_evictor()
+
+    def get_response_and_time(self, key, default=(None, None)):
+        response, timestamp = super().get_response_and_time(key, (None, None))
+        if response is None:
+            cold = self._get_cold([key])
+            if key not in cold:
+                return default
+            response, timestamp = cold[key]
+        self._record_access([key])
+        return response, timestamp
+
+    def has_key(self, key):
+        return super().has_key(key) or bool(self._cold_keys([key]))
+
+    def reindex(self):
+        # rebuilds the index from the cached responses, e.g. for cache files
+        # written before the index existed
+        for key in list(self.responses):
+            response, _ = self.get_response_and_time(key)
+            if response is not None:
+                self._index_response(key, response)
+
+    def _index_response(self, key, response):
+        entry = describe_response(key, response)
+        with self._index() as con:
+            con.execute(
+                f"insert or replace into entries ({', '.join(ENTRY_COLUMNS)}) "
+                f"values ({', '.join('?' * len(ENTRY_COLUMNS))})",
+                [entry[column] for column in ENTRY_COLUMNS],
+            )
+
+    @staticmethod
+    def _select_batches(con, columns: str, table: str, keys: List[str]) -> list:
+        # looks up many keys with one query per batch of placeholders
+        rows = []
+        for i in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            batch = keys[i : i + SQLITE_MAX_VARIABLES]
+            rows += con.execute(
+                f"select {columns} from `{table}` "
+                f"where key in ({', '.join('?' * len(batch))})",
+                batch,
+            ).fetchall()
+        return rows
+
+    def _select_keys(self, columns: str, keys: List[str]) -> list:
+        with self.responses.connection() as con:
+            return self._select_batches(con, columns, self.responses.table_name, keys)
+
+    def _select_archived(self, columns: str, keys: List[str]) -> list:
+        if not keys or not self._has_archive():
+            return []
+        with self._archive() as con:
+            return self._select_batches(con, columns, "responses", keys)
+
+    def _cold_keys(self, keys: List[str]) -> set:
+        # the keys that are in the archive tier or a mounted bundle
+        cold = {row[0] for row in self._select_archived("key", keys)}
+        return cold | {key for key in keys if key in self._mounted}
+
+    def _get_cold(self, keys: List[str]) -> dict:
+        cold = {}
+        for key, value in self._select_archived("key, value", keys):
+            response, timestamp = pickle.loads(lzma.decompress(value))
+            cold[key] = self.restore_response(response), timestamp
+        by_bundle = {}
+        for key in keys:
+            if key not in cold and key in self._mounted:
+                bundle, url = self._mounted[key]
+                by_bundle.setdefault(bundle, {})[url] = key
+        for bundle, urls in by_bundle.items():
+            for url, (response, timestamp) in bundle.get_responses(list(urls)).items():
+                cold[urls[url]] = self.restore_response(response), timestamp
+        return cold
+
+    def mount(self, bundle, keys: Dict[str, str]):
+        # serves the responses in a read only bundle when they aren't in the
+        # cache itself, keys maps cache keys to the urls the bundle has them
+        # under. a key in more than one bundle is served from the first one
+        for key, url in keys.items():
+            self._mounted.setdefault(key, (bundle, url))
+
+    def cached_keys(self, keys: List[str]) -> set:
+        cached = {row[0] for row in self._select_keys("key", keys)}
+        return cached | self._cold_keys([key for key in keys if key not in cached])
+
+    def get_responses(self, keys: List[str]) -> dict:
+        # the bulk version of get_response_and_time, returns the restored
+        # responses for the keys that are cached in either tier or mounted
+        responses = {}
+        for key, value in self._select_keys("key, value", keys):
+            response, _ = pickle.loads(bytes(value))
+            responses[key] = self.restore_response(response)
+        cold = self._get_cold([key for key in keys if key not in responses])
+        for key, (response, _) in cold.items():
+            responses[key] = response
+        self._record_access(responses)
+        return responses
+
+    def archive(self, before: date) -> int:
+        # moves the responses for data that ends before the given date from the
+        # hot tier to the compressed archive, returns the number moved
+        with self._index() as con:
+            keys = [
+                row[0]
+                for row in con.execute(
+                    "select key from entries where to_date < ? and tier=?",
+                    (before.isoformat(), HOT),
+                )
+            ]
+        moved = 0
+        for i in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            batch = keys[i : i + SQLITE_MAX_VARIABLES]
+            rows = self._select_keys("key, value", batch)
+            # the archive copy is committed before the hot one is deleted so an
+            # interrupted run at worst leaves a response in both tiers
+            with self._archive() as con:
+                con.executemany(
+                    "insert or replace into responses values (?, ?)",
+                    [
+                        (
+                            key,
+                            lzma.compress(
+                                bytes(value), preset=ARCHIVE_COMPRESSION_PRESET
+                            ),
+                        )
+                        for key, value in rows
+                    ],
+                )
+            placeholders = ", ".join("?" * len(batch))
+            with self.responses.connection(commit_on_success=True) as con:
+                con.execute(
+                    f"delete from `{self.responses.table_name}` "
+                    f"where key in ({placeholders})",
+                    batch,
+                )
+            with self._index() as con:
+                con.execute(
+                    f"update entries set tier=? where key in ({placeholders})",
+                    [ARCHIVE, *batch],
+                )
+            moved += len(rows)
+        return moved
+
+    def compact(self, recompress: bool = False) -> int:
+        # rewrites the cache file, and the archive if there is one, without the
+        # free pages left by overwritten and deleted responses. with recompress
+        # the archived responses are compressed again with the current preset.
+        # returns the number of bytes freed
+        freed = compact_file(self.filename)
+        if self._has_archive():
+            if recompress:
+                self._recompress_archive()
+            freed += compact_file(self.archive_filename)
+        return freed
+
+    def _recompress_archive(self):
+        with self._archive() as con:
+            keys = [row[0] for row in con.execute("select key from responses")]
+        for i in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            rows = self._select_archived(
+                "key, value", keys[i : i + SQLITE_MAX_VARIABLES]
+            )
+            with self._archive() as con:
+                con.executemany(
+                    "update responses set value=? where key=?",
+                    [
+                        (
+                            lzma.compress(
+                                lzma.decompress(value),
+                                preset=ARCHIVE_COMPRESSION_PRESET,
+                            ),
+                            key,
+                        )
+                        for key, value in rows
+                    ],
+                )
+
+    def claim(self, key: str) -> bool:
+        # only partitioned file caches coordinate warmers on several hosts,
+        # runs sharing a sqlite cache resume through backfill manifests
+        return True
+
+    def release(self, key: str):
+        pass
+
+    def size(self, tier: str = HOT) -> int:
+        # the total uncompressed size of the indexed responses in a tier in bytes
+        with self._index() as con:
+            return con.execute(
+                "select coalesce(sum(bytes), 0) from entries where tier=?", (tier,)
+            ).fetchone()[0]
+
+    def _record_access(self, keys):
+        now = datetime.utcnow().isoformat()
+        for key in keys:
+            self._accessed[key] = now
+        if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+            self._flush_accessed()
+
+    def _flush_accessed(self):
+        accessed, self._accessed = self._accessed, {}
+        if accessed:
+            with self._index() as con:
+                con.executemany(
+                    "update entries set last_access=? where key=?",
+                    [(when, key) for key, when in accessed.items()],
+                )
+
+    def evict(self, max_size: Optional[int] = None) -> int:
+        # deletes the least recently used hot responses in small batches until
+        # the hot tier is under the low water mark, returns the bytes freed
+        max_size = self.max_size if max_size is None else max_size
+        self._flush_accessed()
+        size = self.size()
+        if max_size is None or size <= max_size:
+            return 0
+
+        target = max_size * EVICTION_LOW_WATER_MARK
+        freed = 0
+        while size - freed > target:
+            with self._index() as con:
+                batch = con.execute(
+                    "select key, bytes from entries where tier=? "
+                    "order by last_access, created_at limit ?",
+                    (HOT, EVICTION_BATCH_SIZE),
+                ).fetchall()
+            if not batch:
+                break
+            for key, size_in_bytes in batch:
+                self.delete(key)
+                freed += size_in_bytes or 0
+                if size - freed <= target:
+                    break
+        return freed
+
+    def _wake_evictor(self):
+        if self._evictor is None or not self._evictor.is_alive():
+            self._evictor = _Evictor(self)
+            self._evictor.start()
+        self._evictor.wake.set()
+
+    def delete(self, key):
+        super().delete(key)
+        if self._has_archive():
+            with self._archive() as con:
+                con.execute("delete from responses where key=?", (key,))
+        with self._index() as con:
+            con.execute("delete from entries where key=?", (key,))
+
+    def clear(self):
+        super().clear()
+        if self._has_archive():
+            with self._archive() as con:
+                con.execute("delete from responses")
+        with self._index() as con:
+            con.execute("delete from entries")
+
+    def entries(
+        self,
+        ticker: Optional[str] = None,
+        endpoint: Optional[str] = "aggregates",
+        multiplier: Optional[int] = None,
+        timespan: Optional[str] = None,
+        adjusted: Optional[bool] = None,
+    ) -> List[dict]:
+        filters = {
+            "ticker": ticker,
+            "endpoint": endpoint,
+            "multiplier": multiplier,
+            "timespan": timespan,
+            "adjusted": adjusted,
+        }
+        filters = {
+            column: value for column, value in filters.items() if value is not None
+        }
+        where = " and ".join(f"{column}=?" for column in filters) or "1"
+        with self._index() as con:
+            rows = con.execute(
+                f"select {', '.join(ENTRY_COLUMNS)} from entries where {where} "
+                "order by from_date, to_date",
+                list(filters.values()),
+            ).fetchall()
+        return [dict(zip(ENTRY_COLUMNS, row)) for row in rows]
+
+    def coverage(
+        self,
+        ticker: str,
+        endpoint: str = "aggregates",
+        multiplier: Optional[int] = None,
+        timespan: Optional[str] = None,
+        adjusted: Optional[bool] = None,
+    ) -> List[Tuple[date, date]]:
+        # returns the merged, inclusive date ranges the cache holds for a ticker
+        return merge_intervals(
+            self.entries(ticker, endpoint, multiplier, timespan, adjusted)
+        )
+
+
+class ShardedPolygonCache(BaseCache):
+    # a directory of PolygonCache shards. responses are routed to a shard by a
+    # hash of their ticker, so fetchers and readers of different tickers use
+    # different files and locks and each shard can be maintained on its own.
+    # keys carry the number of their shard as a prefix
+    def __init__(
+        self,
+        location="polygon-cache",
+        extension=".sqlite",
+        shards: Optional[int] = None,
+        max_size: Optional[int] = None,
+        archive_location: Optional[str] = None,
+        **options,
+    ):
+        super().__init__(**options)
+        os.makedirs(location, exist_ok=True)
+        existing = sum(
+            1
+            for name in os.listdir(location)
+            if (match := SHARD_FILE.match(name)) and match["extension"] == extension
+        )
+        if shards is None:
+            shards = existing or DEFAULT_SHARDS
+        elif existing and existing != shards:
+            raise ValueError(
+                f"{location} has {existing} shards, it can't be opened with {shards}"
+            )
+        if archive_location is not None:
+            os.makedirs(archive_location, exist_ok=True)
+        # splits and backfill manifests are kept in a file of their own
+        self.filename = os.path.join(location, "polygon-cache" + extension)
+        con = sqlite3.connect(self.filename)
+        try:
+            con.execute("pragma journal_mode=wal")
+        finally:
+            con.close()
+        # every shard gets an equal part of the size limit
+        self.max_size = max_size
+        self.shards = [
+            PolygonCache(
+                os.path.join(location, SHARD_NAME.format(i)),
+                extension=extension,
+                max_size=None if max_size is None else max_size // shards,
+                archive_location=(
+                    None
+                    if archive_location is None
+                    else os.path.join(archive_location, SHARD_NAME.format(i))
+                ),
+                **options,
+            )
+            for i in range(shards)
+        ]
+
+    def _shard_number(self, ticker: Optional[str]) -> int:
+        return zlib.crc32((ticker or "").encode()) % len(self.shards)
+
+    def shard_for(self, ticker: Optional[str]) -> PolygonCache:
+        return self.shards[self._shard_number(ticker)]
+
+    def _shard(self, key: str) -> PolygonCache:
+        return self.shards[int(key.partition(":")[0])]
+
+    def _by_shard(self, keys: List[str]) -> Dict[PolygonCache, List[str]]:
+        by_shard = {}
+        for key in keys:
+            by_shard.setdefault(self._shard(key), []).append(key)
+        return by_shard
+
+    def create_key(self, request):
+        number = self._shard_number(describe_url(request.url).get("ticker"))
+        return f"{number}:{self.shards[number].create_key(request)}"
+
+    def save_response(self, key, response):
+        self._shard(key).save_response(key, response)
+
+    def add_key_mapping(self, new_key, key_to_response):
+        self._shard(key_to_response).add_key_mapping(new_key, key_to_response)
+
+    def get_response_and_time(self, key, default=(None, None)):
+        return self._shard(key).get_response_and_time(key, default)
+
+    def has_key(self, key):
+        return self._shard(key).has_key(key)
+
+    def delete(self, key):
+        self._shard(key).delete(key)
+
+    def clear(self):
+        for shard in self.shards:
+            shard.clear()
+
+    def remove_old_entries(self, created_before):
+        for shard in self.shards:
+            shard.remove_old_entries(created_before)
+
+    def reindex(self):
+        for shard in self.shards:
+            shard.reindex()
+
+    def cached_keys(self, keys: List[str]) -> set:
+        cached = set()
+        for shard, shard_keys in self._by_shard(keys).items():
+            cached |= shard.cached_keys(shard_keys)
+        return cached
+
+    def get_responses(self, keys: List[str]) -> dict:
+        responses = {}
+        for shard, shard_keys in self._by_shard(keys).items():
+            responses.update(shard.get_responses(shard_keys))
+        return responses
+
+    def mount(self, bundle, keys: Dict[str, str]):
+        by_shard = {}
+        for key, url in keys.items():
+            by_shard.setdefault(self._shard(key), {})[key] = url
+        for shard, shard_keys in by_shard.items():
+            shard.mount(bundle, shard_keys)
+
+    def archive(self, before: date) -> int:
+        return sum(shard.archive(before) for shard in self.shards)
+
+    def compact(self, recompress: bool = False) -> int:
+        freed = compact_file(self.filename)
+        return freed + sum(shard.compact(recompress) for shard in self.shards)
+
+    def claim(self, key: str) -> bool:
+        return self._shard(key).claim(key)
+
+    def release(self, key: str):
+        self._shard(key).release(key)
+
+    def size(self, tier: str = HOT) -> int:
+        return sum(shard.size(tier) for shard in self.shards)
+
+    def evict(self, max_size: Optional[int] = None) -> int:
+        max_size = self.max_size if max_size is None else max_size
+        if max_size is None:
+            return 0
+        return sum(shard.evict(max_size // len(self.shards)) for shard in self.shards)
+
+    def entries(self, ticker: Optional[str] = None, *args, **kwargs) -> List[dict]:
+        if ticker is not None:
+            return self.shard_for(ticker).entries(ticker, *args, **kwargs)
+        entries = [
+            entry
+            for shard in self.shards
+            for entry in shard.entries(ticker, *args, **kwargs)
+        ]
+        return sorted(
+            entries,
+            key=lambda entry: (entry["from_date"] or "", entry["to_date"] or ""),
+        )
+
+    def coverage(self, ticker: str, *args, **kwargs) -> List[Tuple[date, date]]:
+        return self.shard_for(ticker).coverage(ticker, *args, **kwargs)
+
+
+def gaps(
+    intervals: List[Tuple[date, date]], start: date, end: date
+) -> List[Tuple[date, date]]:
+    # the inclusive date ranges between start and end that intervals don't cover
+    missing = []
+    current = start
+    for interval_start, interval_end in intervals:
+        if interval_end < current:
+            continue
+        if interval_start > end:
+            break
+        if interval_start > current:
+            missing.append((current, interval_start - timedelta(1)))
+        current = max(current, interval_end + timedelta(1))
+    if current <= end:
+        missing.append((current, end))
+    return missing
+
+
+def compact_file(filename: str) -> int:
+    # rewrites a sqlite file without its free pages with VACUUM, in place so
+    # every connection, in this process or any other, keeps using the same
+    # file. cache files use write ahead logging, where the rewrite goes to the
+    # log and readers keep reading the last commit until it's done, so only
+    # writers wait for it. returns the number of bytes freed
+    if not os.path.exists(filename):
+        return 0
+    size = os.path.getsize(filename)
+    con = sqlite3.connect(filename, timeout=COMPACT_TIMEOUT, isolation_level=None)
+    try:
+        # files written before the cache switched to the log are switched now
+        con.execute("pragma journal_mode=wal")
+        con.execute("vacuum")
+        # moves the rewrite from the log into the file, once the readers of
+        # the old pages are done, and empties the log
+        con.execute("pragma wal_checkpoint(truncate)")
+    finally:
+        con.close()
+    return size - os.path.getsize(filename)
+
+
+class _Evictor(threading.Thread):
+    # runs an eviction pass after writes, off the thread doing the writing.
+    # it only holds a weak reference so the cache can still be collected
+    def __init__(self, cache: PolygonCache):
+        super().__init__(name="polygon-cache-evictor", daemon=True)
+        self.cache = weakref.ref(cache)
+        self.wake = threading.Event()
+
+    def run(self):
+        while True:
+            woken = self.wake.wait(timeout=60)
+            cache = self.cache()
+            if cache is None:
+                return
+            if woken:
+                self.wake.clear()
+                cache.evict()
+            del cache
@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class BackfillManifest:
+    # the planned chunks of named backfill jobs and whether each one is done,
+    # kept next to the cached responses so an interrupted job can resume
+    # without planning or probing the chunks it already finished
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._lock = threading.RLock()
+        with self._connection() as con:
+            con.execute(
+                "create table if not exists backfill_chunks "
+                "(job, ticker, multiplier, timespan, from_date, to_date, state, "
+                "error, updated_at, "
+                "primary key (job, ticker, multiplier, timespan, from_date, to_date))"
+            )
+
+    @contextmanager
+    def _connection(self):
+        with self._lock:
+            con = sqlite3.connect(self.filename)
+            try:
+                yield con
+                con.commit()
+            finally:
+                con.close()
+
+    def exists(self, job: str) -> bool:
+        with self._connection() as con:
+            return (
+                con.execute(
+                    "select 1 from backfill_chunks where job=? limit 1", (job,)
+                ).fetchone()
+                is not None
+            )
+
+    def plan(self, job: str, chunks: List[tuple]):
+        # chunks are (ticker, multiplier, timespan, from, to) tuples, chunks the
+        # job already has keep their state
+        now = datetime.utcnow().isoformat()
+        with self._connection() as con:
+            con.executemany(
+                "insert or ignore into backfill_chunks "
+                "values (?, ?, ?, ?, ?, ?, ?, null, ?)",
+                [(job, *chunk, PENDING, now) for chunk in chunks],
+            )
+
+    def unfinished(self, job: str) -> List[tuple]:
+        with self._connection() as con:
+            return con.execute(
+                "select ticker, multiplier, timespan, from_date, to_date "
+                "from backfill_chunks where job=? and state!=? "
+                "order by ticker, timespan, multiplier, from_date",
+                (job, DONE),
+            ).fetchall()
+
+    def mark(self, job: str, chunks: List[tuple], state: str, error: str = None):
+        now = datetime.utcnow().isoformat()
+        with self._connection() as con:
+            con.executemany(
+                "update backfill_chunks set state=?, error=?, updated_at=? "
+                "where job=? and ticker=? and multiplier=? and timespan=? "
+                "and from_date=? and to_date=?",
+                [(state, error, now, job, *chunk) for chunk in chunks],
+            )
+
+    def progress(self, job: str) -> Dict[str, int]:
+        with self._connection() as con:
+            return dict(
+                con.execute(
+                    "select state, count(*) from backfill_chunks "
+                    "where job=? group by state",
+                    (job,),
+                ).fetchall()
+            )
+
+    def delete(self, job: str):
+        with self._connection() as con:
+            con.execute("delete from backfill_chunks where job=?", (job,))
@@ -0,0 +1,160 @@
+from array import array
+from collections.abc import Sequence
+from itertools import chain
+from typing import Dict, List, Optional
+
+# marks a field a bar doesn't have in a column of python objects
+_MISSING = object()
+
+
+class Bar:
+    # a view of one bar of Bars. fields are read as attributes, bar.c, or like
+    # a dict, bar["c"], so code written for dict results works with either
+    __slots__ = ("_bars", "_index")
+
+    def __init__(self, bars: "Bars", index: int):
+        self._bars = bars
+        self._index = index
+
+    def __getattr__(self, key):
+        try:
+            return self._bars._value(key, self._index)
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __getitem__(self, key):
+        return self._bars._value(key, self._index)
+
+    def __contains__(self, key) -> bool:
+        try:
+            self._bars._value(key, self._index)
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self._bars._value(key, self._index)
+        except KeyError:
+            return default
+
+    def keys(self) -> List[str]:
+        return [key for key in self._bars.fields if key in self]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def to_dict(self) -> dict:
+        return {key: self[key] for key in self.keys()}
+
+    def copy(self) -> dict:
+        return self.to_dict()
+
+    def __eq__(self, other):
+        if isinstance(other, Bar):
+            other = other.to_dict()
+        if not isinstance(other, dict):
+            return NotImplemented
+        return self.to_dict() == other
+
+    def __repr__(self):
+        return f"Bar({self.to_dict()!r})"
+
+
+class Bars(Sequence):
+    # aggregates bars stored by column rather than as a dict per bar. integer
+    # fields like t and n are kept in arrays of 64 bit integers, other numbers
+    # like prices and volumes in arrays of doubles, and a field that is the
+    # same in every bar like T only once, so a bar takes 8 bytes a field
+    # instead of the few hundred bytes of a dict. fields that are missing from
+    # some bars or aren't numbers stay python objects
+    def __init__(self, columns: Dict[str, object], length: int):
+        self.fields = tuple(columns)
+        self._columns = columns
+        self._length = length
+
+    @classmethod
+    def from_dicts(cls, results: List[dict]) -> "Bars":
+        # every field of any bar, in the order they first appear
+        fields = dict.fromkeys(chain.from_iterable(results))
+        return cls({field: _column(results, field) for field in fields}, len(results))
+
+    def column(self, field: str):
+        # every bar's value of a field, an array for numeric fields
+        column = self._columns[field]
+        if isinstance(column, _Constant):
+            return [column.value] * self._length
+        return column
+
+    def _value(self, field: str, index: int):
+        column = self._columns.get(field)
+        if column is None:
+            raise KeyError(field)
+        if isinstance(column, _Constant):
+            return column.value
+        value = column[index]
+        if value is _MISSING:
+            raise KeyError(field)
+        return value
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            positions = range(*index.indices(self._length))
+            return Bars(
+                {
+                    field: column if isinstance(column, _Constant) else column[index]
+                    for field, column in self._columns.items()
+                },
+                len(positions),
+            )
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("bars index out of range")
+        return Bar(self, index)
+
+    def to_dicts(self) -> List[dict]:
+        return [bar.to_dict() for bar in self]
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            bar == other_bar for bar, other_bar in zip(self, other)
+        )
+
+    def __repr__(self):
+        return f"<Bars of {self._length} bars with fields {', '.join(self.fields)}>"
+
+
+class _Constant:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _column(results: List[dict], field: str):
+    values = [result.get(field, _MISSING) for result in results]
+    types = set(map(type, values))
+    if len(types) == 1 and values.count(values[0]) == len(values):
+        if values[0] is not _MISSING:
+            return _Constant(values[0])
+    if types == {int}:
+        try:
+            return array("q", values)
+        except OverflowError:
+            pass
+    if types <= {int, float}:
+        return array("d", values)
+    return values
+
+
+def compact_bars(results: Optional[List[dict]]) -> Bars:
+    return Bars.from_dicts(results or [])
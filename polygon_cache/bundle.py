@@ -0,0 +1,168 @@
+import lzma
+import os
+import pickle
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
+from urllib.request import pathname2url
+
+from polygon_cache.backend import ARCHIVE_COMPRESSION_PRESET, SQLITE_MAX_VARIABLES
+
+BUNDLE_VERSION = 1
+
+
+def strip_api_key(url: str) -> str:
+    # bundles are shared so responses are stored without the exporter's key
+    parsed = urlparse(url)
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if name != "apiKey"
+    ]
+    return parsed._replace(query=urlencode(query)).geturl()
+
+
+def bundle_keys(client, urls: List[str]) -> Dict[str, str]:
+    # the keys a client caches bundled urls under with its own api key
+    keys = {}
+    for url in urls:
+        parsed = urlparse(url)
+        endpoint = parsed._replace(query="").geturl()
+        keys[client._cache_key(endpoint, dict(parse_qsl(parsed.query)))] = url
+    return keys
+
+
+class Bundle:
+    # a read only snapshot of part of a cache in a single sqlite file, with the
+    # responses lzma compressed and stored under their url without api key
+    def __init__(self, filename: str):
+        self.filename = filename
+        with self._connection() as con:
+            version = con.execute("pragma user_version").fetchone()[0]
+        if version != BUNDLE_VERSION:
+            raise ValueError(f"{filename} is not a polygon-cache bundle")
+
+    @contextmanager
+    def _connection(self):
+        con = sqlite3.connect(
+            f"file:{pathname2url(os.path.abspath(self.filename))}?mode=ro", uri=True
+        )
+        try:
+            yield con
+        finally:
+            con.close()
+
+    def urls(self) -> List[str]:
+        with self._connection() as con:
+            return [row[0] for row in con.execute("select url from responses")]
+
+    def get_responses(self, urls: List[str]) -> Dict[str, tuple]:
+        # the pickled (response, timestamp) pairs of the urls in the bundle
+        responses = {}
+        with self._connection() as con:
+            for i in range(0, len(urls), SQLITE_MAX_VARIABLES):
+                batch = urls[i : i + SQLITE_MAX_VARIABLES]
+                rows = con.execute(
+                    "select url, value from responses "
+                    f"where url in ({', '.join('?' * len(batch))})",
+                    batch,
+                )
+                for url, value in rows:
+                    responses[url] = pickle.loads(lzma.decompress(value))
+        return responses
+
+    def splits(self) -> Tuple[list, list]:
+        with self._connection() as con:
+            return (
+                con.execute("select * from splits").fetchall(),
+                con.execute("select * from splits_fetched").fetchall(),
+            )
+
+
+def _selected(
+    entry: dict,
+    timespans: Optional[List[Tuple[int, str]]],
+    from_: Optional[str],
+    to: Optional[str],
+) -> bool:
+    if timespans is not None and (
+        entry["endpoint"] != "aggregates"
+        or (entry["multiplier"], entry["timespan"]) not in timespans
+    ):
+        return False
+    if entry["from_date"] is None:
+        return from_ is None and to is None
+    return (from_ is None or entry["to_date"] >= from_) and (
+        to is None or entry["from_date"] <= to
+    )
+
+
+def export_bundle(
+    client,
+    filename: str,
+    tickers: List[str],
+    timespans: Optional[List[Tuple[int, str]]] = None,
+    from_: Optional[str] = None,
+    to: Optional[str] = None,
+) -> int:
+    # writes the cached responses of some tickers, optionally only aggregates
+    # of some timespans and overlapping a date range, and their splits to a
+    # new bundle. returns the number of responses exported
+    entries = [
+        entry
+        for ticker in tickers
+        for entry in client.cache.entries(ticker, endpoint=None)
+        if _selected(entry, timespans, from_, to)
+    ]
+    if os.path.exists(filename):
+        os.remove(filename)
+    exported = 0
+    con = sqlite3.connect(filename)
+    try:
+        con.execute(f"pragma user_version = {BUNDLE_VERSION}")
+        con.execute("create table responses (url primary key, value)")
+        con.execute("create table splits (ticker, ex_date, ratio)")
+        con.execute("create table splits_fetched (ticker, fetched_at)")
+        for entry in entries:
+            response, timestamp = client.cache.get_response_and_time(entry["key"])
+            if response is None:
+                continue
+            reduced = client.cache.reduce_response(response)
+            reduced.url = strip_api_key(reduced.url)
+            if reduced.request is not None:
+                reduced.request.url = reduced.url
+            con.execute(
+                "insert or replace into responses values (?, ?)",
+                (
+                    reduced.url,
+                    lzma.compress(
+                        pickle.dumps((reduced, timestamp)),
+                        preset=ARCHIVE_COMPRESSION_PRESET,
+                    ),
+                ),
+            )
+            exported += 1
+        splits, fetched = client.splits.export(tickers)
+        con.executemany("insert into splits values (?, ?, ?)", splits)
+        con.executemany("insert into splits_fetched values (?, ?)", fetched)
+        con.commit()
+    finally:
+        con.close()
+    return exported
+
+
+def import_bundle(client, filename: str) -> int:
+    # copies every response in a bundle into the client's cache, returns the
+    # number of responses imported
+    bundle = Bundle(filename)
+    urls = bundle.urls()
+    keys = {url: key for key, url in bundle_keys(client, urls).items()}
+    for i in range(0, len(urls), SQLITE_MAX_VARIABLES):
+        responses = bundle.get_responses(urls[i : i + SQLITE_MAX_VARIABLES])
+        for url, (response, _) in responses.items():
+            client.cache.save_response(
+                keys[url], client.cache.restore_response(response)
+            )
+    client.splits.load(*bundle.splits())
+    return len(urls)
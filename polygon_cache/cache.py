@@ -1,20 +1,315 @@
+import heapq
+import os
+import re
+import time
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List
+from functools import partial
+from operator import itemgetter
+from typing import List, Optional, Sequence, Union
 
 import pytz
 import requests
 import requests_cache
 from polygon import RESTClient
-from polygon.rest.models import StocksEquitiesAggregatesApiResponse
+from polygon.rest.models import (
+    HistoricNBboQuotesV2ApiResponse,
+    HistoricTradesV2ApiResponse,
+    StocksEquitiesAggregatesApiResponse,
+    unmarshal,
+)
+from requests_cache.core import _normalize_parameters
+
+from polygon_cache.backend import PolygonCache, ShardedPolygonCache
+from polygon_cache.bars import compact_bars
+from polygon_cache.bundle import Bundle, bundle_keys
+from polygon_cache.lazy import LazyAggregatesResponse, LazyResults
+from polygon_cache.memory import MemoryProfiler, profile
+from polygon_cache.metrics import Metrics, endpoint_label
+from polygon_cache.partitions import PartitionedFileCache
+from polygon_cache.plan import (
+    DEFAULT_BYTES_PER_ROW,
+    DEFAULT_SECONDS_PER_CALL,
+    AggregatesPlan,
+    PlannedChunk,
+    chunk_days,
+    estimate_rows,
+)
+from polygon_cache.ratelimit import RateLimiter
+from polygon_cache.resample import can_resample, resample_aggregates
+from polygon_cache.splits import SplitsTable, adjust_for_splits
+from polygon_cache.tracing import span, submit_in_span, tracing
+
+# finer bars that coarser aggregates can be built from, finest first
+RESAMPLE_SOURCES = ((1, "minute"), (1, "hour"), (1, "day"))
+
+# days per aggregates call so every call stays under polygon's 5000 bar limit,
+# dates are inclusive so n days covers n + 1 calendar days. equities trade for
+# at most 16 hours on 5 days a week while crypto and forex trade around the clock
+EQUITIES_CHUNK_DAYS = {"minute": 5, "hour": 5}
+ROUND_THE_CLOCK_CHUNK_DAYS = {"minute": 2, "hour": 200}
+DEFAULT_CHUNK_DAYS = 3000
+
+# the largest page polygon returns for historic trades and quotes
+TICK_PAGE_LIMIT = 50000
+
+TICK_URL_DATE = re.compile(
+    r"/v2/ticks/stocks/(?:trades|nbbo)/[^/]+/(\d{4}-\d{2}-\d{2})"
+)
+
+
+MODES = ("online", "offline")
+TICK_ENDPOINTS = {
+    HistoricTradesV2ApiResponse: "trades",
+    HistoricNBboQuotesV2ApiResponse: "quotes",
+}
+
+
+class CacheMissError(LookupError):
+    # raised in offline mode for requests that aren't cached, missing holds
+    # the missing aggregates chunks or urls
+    def __init__(self, missing: list):
+        self.missing = missing
+        shown = ", ".join(map(str, missing[:10]))
+        more = f" and {len(missing) - 10} more" if len(missing) > 10 else ""
+        super().__init__(f"{len(missing)} requests are not cached: {shown}{more}")
 
 
 class CachedRESTClient(RESTClient):
-    def __init__(self, auth_key: str, cache_location: str = "polygon-cache"):
-        requests_cache.install_cache(cache_location, filter_fn=self._cache_filter)
-        super().__init__(auth_key)
+    def __init__(
+        self,
+        auth_key: str,
+        cache_location: str = "polygon-cache",
+        resample_from_cache: bool = False,
+        local_split_adjustment: bool = False,
+        requests_per_minute: Optional[float] = None,
+        max_retries: int = 3,
+        mode: str = "online",
+        max_cache_size: Optional[int] = None,
+        archive_location: Optional[str] = None,
+        shards: Optional[int] = None,
+        bundles: Sequence[str] = (),
+        server: Optional[str] = None,
+        multi_host: bool = False,
+        tracer=None,
+        profile_memory: bool = False,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode}, expected one of {MODES}")
+        if mode == "offline" and server is not None:
+            raise ValueError("An offline client can't use a cache server")
+        if multi_host and max_cache_size is not None:
+            raise ValueError("A multi host cache can't have a maximum size")
+        self.mode = mode
+        # with the socket path of a polygon-cache server the client only reads
+        # the cache and leaves fetching and writing to the server
+        self.server = None
+        if server is not None:
+            # imported here as the server needs unix sockets, which windows
+            # doesn't have
+            from polygon_cache.server import ServerConnection
+
+            self.server = ServerConnection(server)
+        # the least recently used responses are evicted once the cache grows
+        # past max_cache_size bytes, responses moved to the archive tier with
+        # cache.archive are stored compressed under archive_location
+        if multi_host or PartitionedFileCache.is_partitioned(cache_location):
+            # cache_location is a directory of immutable files that several
+            # hosts can share over a network file system
+            self._cache = PartitionedFileCache(cache_location)
+        elif shards is not None or os.path.isdir(cache_location):
+            # cache_location is a directory of files that each hold the
+            # responses of some of the tickers
+            self._cache = ShardedPolygonCache(
+                cache_location,
+                shards=shards,
+                max_size=max_cache_size,
+                archive_location=archive_location,
+            )
+        else:
+            self._cache = PolygonCache(
+                cache_location,
+                max_size=max_cache_size,
+                archive_location=archive_location,
+            )
+        if mode == "offline" or server is not None:
+            # everything is served from the cache, or fetched by the server, so
+            # no http session is set up
+            self.auth_key = auth_key
+            self.url = "https://" + self.DEFAULT_HOST
+            self._session = None
+        else:
+            requests_cache.install_cache(
+                cache_location, backend=self._cache, filter_fn=self._cache_filter
+            )
+            super().__init__(auth_key)
+        # polygon's own aggregation rules may differ slightly from local
+        # resampling so serving coarser bars from cached finer bars is opt in
+        self.resample_from_cache = resample_from_cache
+        # only unadjusted bars are cached and adjusted bars are computed from a
+        # locally cached splits table, so a new split doesn't invalidate history
+        self.local_split_adjustment = local_split_adjustment
+        self.splits = SplitsTable(
+            self._cache.filename,
+            self.reference_stock_splits,
+            # offline the splits that are stored are used however old they are
+            max_age=None if mode == "offline" else timedelta(days=1),
+        )
+        # only requests that go to polygon count towards the rate limit
+        self.rate_limiter = (
+            RateLimiter(requests_per_minute) if requests_per_minute else None
+        )
+        # requests rejected with a 429 are retried this many times
+        self.max_retries = max_retries
+        # hits, misses and where the time goes, see metrics.prometheus()
+        self.metrics = Metrics()
+        # an opentelemetry tracer or a tracing.CallbackTracer gets a span for
+        # every stage of a call
+        self.tracer = tracer
+        # the peak memory of every call and of its parse, model and combine
+        # stages are measured with tracemalloc, which slows allocations down
+        self.memory_profiler = MemoryProfiler(self.metrics) if profile_memory else None
+        for bundle in bundles:
+            self.mount_bundle(bundle)
+
+    @property
+    def cache(
+        self,
+    ) -> Union[PolygonCache, ShardedPolygonCache, PartitionedFileCache]:
+        return self._cache
+
+    def mount_bundle(self, filename: str):
+        # serves the responses in an exported bundle without copying them into
+        # the cache, the bundle's splits are used for tickers without any
+        bundle = Bundle(filename)
+        self.cache.mount(bundle, bundle_keys(self, bundle.urls()))
+        self.splits.load(*bundle.splits())
+
+    def _handle_response(self, response_type: str, endpoint: str, params: dict):
+        # requests_cache passes query parameters on as a list, which stops
+        # requests from merging in the session's apiKey, so it's added here
+        params = {"apiKey": self.auth_key, **params}
+        with tracing(self.tracer):
+            if self.mode == "offline":
+                return self._handle_offline_response(response_type, endpoint, params)
+            if self.server is not None:
+                return self._handle_shared_response(response_type, endpoint, params)
+            response = self._get(endpoint, params)
+            if response is None:
+                return None
+            return self._parse(response_type, endpoint_label(endpoint), response)
+
+    def _get(self, endpoint: str, params: dict) -> Optional[requests.Response]:
+        # one request through the cached session, rate limited and retried when
+        # polygon rejects it with a 429
+        label = endpoint_label(endpoint)
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None and not self.cache.has_key(
+                self._cache_key(endpoint, params)
+            ):
+                self.rate_limiter.acquire()
+            started = time.perf_counter()
+            with span("http", endpoint=label, attempt=attempt) as http_span:
+                response = self._session.get(endpoint, params=params)
+                http_span.set_attribute("status", response.status_code)
+                http_span.set_attribute(
+                    "from_cache", getattr(response, "from_cache", False)
+                )
+            if getattr(response, "from_cache", False):
+                self.metrics.inc("polygon_cache_hits_total", endpoint=label)
+            else:
+                self.metrics.inc("polygon_cache_misses_total", endpoint=label)
+                self.metrics.observe(
+                    "polygon_cache_upstream_seconds",
+                    time.perf_counter() - started,
+                    endpoint=label,
+                )
+                self.metrics.inc(
+                    "polygon_cache_downloaded_bytes_total",
+                    len(response.content),
+                    endpoint=label,
+                )
+            if response.status_code == 200:
+                return response
+            try:
+                response.raise_for_status()
+            except requests.HTTPError:
+                if response.status_code == 429:
+                    self.metrics.inc("polygon_cache_rate_limited_total", endpoint=label)
+                if response.status_code != 429 or attempt == self.max_retries:
+                    raise
+                self.metrics.inc("polygon_cache_retries_total", endpoint=label)
+                time.sleep(self._retry_delay(response, attempt))
+            else:
+                return None
+
+    def _get_json(self, endpoint: str, params: dict) -> Optional[dict]:
+        response = self._get(endpoint, params)
+        return None if response is None else response.json()
+
+    def _parse(self, response_type: str, label: str, response):
+        # response is a cached or fetched response, or an already decoded body
+        with self.metrics.time("polygon_cache_parse_seconds", endpoint=label), span(
+            "parse", endpoint=label
+        ):
+            with profile(self.memory_profiler, "parse"):
+                body = (
+                    response.json()
+                    if isinstance(response, requests.Response)
+                    else response
+                )
+            with profile(self.memory_profiler, "model"):
+                return unmarshal.unmarshal_json(response_type, body)
+
+    def _handle_shared_response(self, response_type, endpoint, params):
+        # hits are read straight from the shared cache, misses are fetched by
+        # the server so all its clients share one rate limit and one request
+        # per chunk
+        label = endpoint_label(endpoint)
+        response, _ = self.cache.get_response_and_time(
+            self._cache_key(endpoint, params)
+        )
+        if response is not None:
+            self.metrics.inc("polygon_cache_hits_total", endpoint=label)
+            return self._parse(response_type, label, response)
+        self.metrics.inc("polygon_cache_misses_total", endpoint=label)
+        with self.metrics.time("polygon_cache_upstream_seconds", endpoint=label):
+            body = self.server.fetch(endpoint, params)
+        if body is None:
+            return None
+        return self._parse(response_type, label, body)
+
+    def _handle_offline_response(self, response_type, endpoint, params):
+        label = endpoint_label(endpoint)
+        response, _ = self.cache.get_response_and_time(
+            self._cache_key(endpoint, params)
+        )
+        if response is None:
+            self.metrics.inc("polygon_cache_misses_total", endpoint=label)
+            raise CacheMissError([endpoint])
+        self.metrics.inc("polygon_cache_hits_total", endpoint=label)
+        return self._parse(response_type, label, response)
+
+    @staticmethod
+    def _retry_delay(response: requests.Response, attempt: int) -> float:
+        try:
+            return float(response.headers["Retry-After"])
+        # a key error is thrown if there is no retry after header
+        # a value error is thrown if it is an http date instead of seconds
+        except (KeyError, ValueError):
+            return 2**attempt
 
     def _cache_filter(self, resp: requests.Response) -> bool:
+        # error responses such as 429s are never cached and may not be json
+        if resp.status_code != 200:
+            return False
+
+        try:
+            return self._filter_by_url_date(resp.url)
+        # a value error is thrown if the url isn't a historic trades or quotes url
+        except ValueError:
+            pass
+
         parsed_response = resp.json()
 
         try:
@@ -28,11 +323,24 @@ class CachedRESTClient(RESTClient):
         try:
             return self._filter_by_unix_timestamp(parsed_response)
         # a key error is thrown if a unix timestamp is not found
-        except KeyError:
+        # an index error is thrown if there are no results
+        except (KeyError, IndexError):
             pass
 
         return False
 
+    @staticmethod
+    def _filter_by_url_date(url: str) -> bool:
+        # historic trades and quotes are paginated and a page can be empty or
+        # timestamped in nanoseconds so the date is taken from the url instead
+        match = TICK_URL_DATE.search(url)
+        if match is None:
+            raise ValueError(f"No historic ticks date found in {url}")
+        return (
+            datetime.strptime(match.group(1), "%Y-%m-%d").date()
+            < datetime.now(pytz.timezone("EST")).date()
+        )
+
     @staticmethod
     def _filter_by_from(parsed_response: dict) -> bool:
         # all polygon api requests that use a
@@ -51,42 +359,762 @@ class CachedRESTClient(RESTClient):
             < datetime.now(pytz.UTC).date()
         )
 
+    def _cache_key(self, endpoint: str, params: dict = None) -> str:
+        # builds the request url exactly like the cached session does so the key
+        # matches the one requests_cache stores the response under
+        params = {"apiKey": self.auth_key, **(params or {})}
+        request = requests.Request(
+            "GET", endpoint, params=_normalize_parameters(params)
+        )
+        return self.cache.create_key(request.prepare())
+
+    def _aggregate_endpoint(self, ticker, multiplier, timespan, from_, to) -> str:
+        return (
+            f"{self.url}/v2/aggs/ticker/{ticker}"
+            f"/range/{multiplier}/{timespan}/{from_}/{to}"
+        )
+
+    def _plan_aggregate_chunks(
+        self, timespan, from_, to, chunk_days=EQUITIES_CHUNK_DAYS
+    ) -> List[tuple]:
+        start = datetime.strptime(from_, "%Y-%m-%d")
+        end = datetime.strptime(to, "%Y-%m-%d")
+        max_days_calls = chunk_days.get(timespan, DEFAULT_CHUNK_DAYS)
+
+        return [
+            (dates[0].strftime("%Y-%m-%d"), dates[1].strftime("%Y-%m-%d"))
+            for dates in self._calculate_aggregate_api_calls(start, end, max_days_calls)
+        ]
+
+    def _is_cached(
+        self, ticker, multiplier, timespan, from_, to, query_params, chunk_days
+    ) -> bool:
+        keys = self._aggregate_chunk_keys(
+            ticker,
+            multiplier,
+            timespan,
+            self._plan_aggregate_chunks(timespan, from_, to, chunk_days),
+            query_params,
+        )
+        return len(self.cache.cached_keys(keys)) == len(set(keys))
+
+    def _aggregate_chunk_keys(
+        self, ticker, multiplier, timespan, chunks, query_params
+    ) -> List[str]:
+        return [
+            self._cache_key(
+                self._aggregate_endpoint(ticker, multiplier, timespan, *dates),
+                query_params,
+            )
+            for dates in chunks
+        ]
+
+    def _resample_cached_aggregates(
+        self, ticker, multiplier, timespan, from_, to, query_params, chunk_days, adjust
+    ):
+        for source_multiplier, source_timespan in RESAMPLE_SOURCES:
+            if not can_resample(
+                source_multiplier, source_timespan, multiplier, timespan
+            ) or not self._is_cached(
+                ticker,
+                source_multiplier,
+                source_timespan,
+                from_,
+                to,
+                query_params,
+                chunk_days,
+            ):
+                continue
+
+            source = self._fetch_aggregates(
+                ticker,
+                source_multiplier,
+                source_timespan,
+                from_,
+                to,
+                1,
+                query_params,
+                chunk_days,
+            )
+            if adjust is not None:
+                # coarser bars can span a split, so the bars they're built from
+                # are adjusted first
+                source.results = adjust(source.results)
+            source.results = resample_aggregates(source.results, multiplier, timespan)
+            source.resultsCount = len(source.results)
+            return source
+
+        return None
+
     def stocks_equities_aggregates(
+        self,
+        ticker,
+        multiplier,
+        timespan,
+        from_,
+        to,
+        max_threads=20,
+        lazy=False,
+        compact=False,
+        **query_params,
+    ) -> StocksEquitiesAggregatesApiResponse:
+        adjust_locally = self.local_split_adjustment and not _is_true(
+            query_params.get("unadjusted")
+        )
+        if self.local_split_adjustment:
+            query_params["unadjusted"] = "true"
+
+        with tracing(self.tracer), span(
+            "stocks_equities_aggregates",
+            ticker=ticker,
+            multiplier=multiplier,
+            timespan=timespan,
+            from_=from_,
+            to=to,
+        ), profile(
+            self.memory_profiler, "stocks_equities_aggregates", call=True
+        ) as peaks:
+            adjust = None
+            if adjust_locally:
+                with span("split_adjustment", ticker=ticker):
+                    splits = self.splits.get(ticker)
+                adjust = partial(adjust_for_splits, splits=splits)
+
+            response = self._aggregates(
+                ticker,
+                multiplier,
+                timespan,
+                from_,
+                to,
+                max_threads,
+                query_params,
+                EQUITIES_CHUNK_DAYS,
+                lazy,
+                compact,
+                adjust,
+            )
+            if adjust_locally:
+                response.adjusted = True
+
+        if peaks is not None:
+            response.peak_memory = peaks
+        return response
+
+    def plan_stocks_equities_aggregates(
         self, ticker, multiplier, timespan, from_, to, max_threads=20, **query_params
+    ) -> AggregatesPlan:
+        # what stocks_equities_aggregates would fetch, worked out from the
+        # cache alone without any requests
+        if self.local_split_adjustment:
+            query_params["unadjusted"] = "true"
+        return self._plan_aggregates(
+            ticker,
+            multiplier,
+            timespan,
+            from_,
+            to,
+            max_threads,
+            query_params,
+            EQUITIES_CHUNK_DAYS,
+        )
+
+    def _plan_aggregates(
+        self,
+        ticker,
+        multiplier,
+        timespan,
+        from_,
+        to,
+        max_threads,
+        query_params,
+        chunk_days_by_timespan,
+    ) -> AggregatesPlan:
+        if self.resample_from_cache and not self._is_cached(
+            ticker,
+            multiplier,
+            timespan,
+            from_,
+            to,
+            query_params,
+            chunk_days_by_timespan,
+        ):
+            for source_multiplier, source_timespan in RESAMPLE_SOURCES:
+                if can_resample(
+                    source_multiplier, source_timespan, multiplier, timespan
+                ) and self._is_cached(
+                    ticker,
+                    source_multiplier,
+                    source_timespan,
+                    from_,
+                    to,
+                    query_params,
+                    chunk_days_by_timespan,
+                ):
+                    multiplier, timespan = source_multiplier, source_timespan
+                    break
+
+        chunks = self._plan_aggregate_chunks(
+            timespan, from_, to, chunk_days_by_timespan
+        )
+        keys = self._aggregate_chunk_keys(
+            ticker, multiplier, timespan, chunks, query_params
+        )
+        cached = self.cache.cached_keys(keys)
+        # misses are estimated from what is cached of the ticker if anything is
+        entries = {
+            entry["key"]: entry
+            for entry in self.cache.entries(
+                ticker, multiplier=multiplier, timespan=timespan
+            )
+            if entry["row_count"] is not None
+        }
+        indexed_days = sum(
+            chunk_days(entry["from_date"], entry["to_date"])
+            for entry in entries.values()
+        )
+        indexed_rows = sum(entry["row_count"] for entry in entries.values())
+        indexed_bytes = sum(entry["bytes"] for entry in entries.values())
+        bytes_per_row = (
+            indexed_bytes / indexed_rows if indexed_rows else DEFAULT_BYTES_PER_ROW
+        )
+
+        planned = []
+        for dates, key in zip(chunks, keys):
+            entry = entries.get(key)
+            if entry is not None:
+                rows, bytes_ = entry["row_count"], entry["bytes"]
+            else:
+                days = chunk_days(*dates)
+                rows = (
+                    round(days * indexed_rows / indexed_days)
+                    if indexed_days
+                    else estimate_rows(
+                        multiplier,
+                        timespan,
+                        days,
+                        chunk_days_by_timespan is ROUND_THE_CLOCK_CHUNK_DAYS,
+                    )
+                )
+                bytes_ = round(rows * bytes_per_row)
+            planned.append(
+                PlannedChunk(
+                    ticker,
+                    multiplier,
+                    timespan,
+                    *dates,
+                    key in cached,
+                    rows,
+                    bytes_,
+                )
+            )
+
+        requests_per_minute = (
+            None if self.rate_limiter is None else 60 / self.rate_limiter.interval
+        )
+        seconds_per_call = self.metrics.mean(
+            "polygon_cache_upstream_seconds", endpoint="aggregates"
+        )
+        return AggregatesPlan(
+            planned,
+            requests_per_minute,
+            seconds_per_call or DEFAULT_SECONDS_PER_CALL,
+            max_threads,
+        )
+
+    def crypto_aggregates(
+        self,
+        ticker,
+        multiplier,
+        timespan,
+        from_,
+        to,
+        max_threads=20,
+        lazy=False,
+        compact=False,
+        **query_params,
     ) -> StocksEquitiesAggregatesApiResponse:
-        start = datetime.strptime(from_, "%Y-%m-%d")
-        end = datetime.strptime(to, "%Y-%m-%d")
-        if timespan == "minute" or timespan == "hour":
-            max_days_calls = 5
-        else:
-            max_days_calls = 3000
+        # crypto tickers are prefixed with X: e.g. X:BTCUSD, the response has
+        # the same shape as stock aggregates so it uses the same model
+        with tracing(self.tracer), span(
+            "crypto_aggregates",
+            ticker=ticker,
+            multiplier=multiplier,
+            timespan=timespan,
+            from_=from_,
+            to=to,
+        ), profile(self.memory_profiler, "crypto_aggregates", call=True) as peaks:
+            response = self._aggregates(
+                ticker,
+                multiplier,
+                timespan,
+                from_,
+                to,
+                max_threads,
+                query_params,
+                ROUND_THE_CLOCK_CHUNK_DAYS,
+                lazy,
+                compact,
+            )
+
+        if peaks is not None:
+            response.peak_memory = peaks
+        return response
+
+    def forex_currencies_aggregates(
+        self,
+        ticker,
+        multiplier,
+        timespan,
+        from_,
+        to,
+        max_threads=20,
+        lazy=False,
+        compact=False,
+        **query_params,
+    ) -> StocksEquitiesAggregatesApiResponse:
+        # forex tickers are prefixed with C: e.g. C:EURUSD
+        with tracing(self.tracer), span(
+            "forex_currencies_aggregates",
+            ticker=ticker,
+            multiplier=multiplier,
+            timespan=timespan,
+            from_=from_,
+            to=to,
+        ), profile(
+            self.memory_profiler, "forex_currencies_aggregates", call=True
+        ) as peaks:
+            response = self._aggregates(
+                ticker,
+                multiplier,
+                timespan,
+                from_,
+                to,
+                max_threads,
+                query_params,
+                ROUND_THE_CLOCK_CHUNK_DAYS,
+                lazy,
+                compact,
+            )
+
+        if peaks is not None:
+            response.peak_memory = peaks
+        return response
+
+    def _aggregates(
+        self,
+        ticker,
+        multiplier,
+        timespan,
+        from_,
+        to,
+        max_threads,
+        query_params,
+        chunk_days,
+        lazy=False,
+        compact=False,
+        adjust=None,
+    ) -> StocksEquitiesAggregatesApiResponse:
+        # adjust is applied to the bars as they come from polygon, before
+        # they're resampled or compacted
+        response = None
+        if self.resample_from_cache and not self._is_cached(
+            ticker, multiplier, timespan, from_, to, query_params, chunk_days
+        ):
+            with span("resample") as resample_span:
+                response = self._resample_cached_aggregates(
+                    ticker,
+                    multiplier,
+                    timespan,
+                    from_,
+                    to,
+                    query_params,
+                    chunk_days,
+                    adjust,
+                )
+                resample_span.set_attribute("resampled", response is not None)
+            if response is not None and compact:
+                response.results = compact_bars(response.results)
+        if response is None:
+            # resampled results are built from every bar so they're never lazy
+            fetch = self._lazy_aggregates if lazy else self._fetch_aggregates
+            response = fetch(
+                ticker,
+                multiplier,
+                timespan,
+                from_,
+                to,
+                max_threads,
+                query_params,
+                chunk_days,
+                # bars are adjusted as dicts and compacted after
+                compact and adjust is None,
+            )
+            if adjust is not None:
+                lazy_results = isinstance(response, LazyAggregatesResponse)
+                if lazy_results:
+                    response.results.map_chunks(adjust)
+                else:
+                    response.results = adjust(response.results)
+                if compact and lazy_results:
+                    response.results.map_chunks(compact_bars)
+                elif compact:
+                    response.results = compact_bars(response.results)
+
+        return response
 
-        dates_api_calls = self._calculate_aggregate_api_calls(
-            start, end, max_days_calls
+    def _fetch_aggregates(
+        self,
+        ticker,
+        multiplier,
+        timespan,
+        from_,
+        to,
+        max_threads,
+        query_params,
+        chunk_days,
+        compact=False,
+    ) -> StocksEquitiesAggregatesApiResponse:
+        with span("plan") as plan_span:
+            chunks = self._plan_aggregate_chunks(timespan, from_, to, chunk_days)
+            keys = self._aggregate_chunk_keys(
+                ticker, multiplier, timespan, chunks, query_params
+            )
+            plan_span.set_attribute("chunks", len(chunks))
+        # every chunk is looked up in one query, hits are served right away
+        # and only the misses are sent to the thread pool
+        with span("cache_lookup", keys=len(keys)) as lookup_span:
+            cached = self.cache.get_responses(keys)
+            lookup_span.set_attribute("hits", len(cached))
+        self.metrics.inc("polygon_cache_hits_total", len(cached), endpoint="aggregates")
+        api_responses = [
+            (
+                self._parse(
+                    "StocksEquitiesAggregatesApiResponse", "aggregates", cached[key]
+                )
+                if key in cached
+                else None
+            )
+            for key in keys
+        ]
+        misses = [i for i, key in enumerate(keys) if key not in cached]
+        if misses and self.mode == "offline":
+            self.metrics.inc(
+                "polygon_cache_misses_total", len(misses), endpoint="aggregates"
+            )
+            raise CacheMissError(
+                [(ticker, multiplier, timespan, *chunks[i]) for i in misses]
+            )
+
+        fetched = self._fetch_aggregate_chunks(
+            ticker, multiplier, timespan, chunks, misses, max_threads, query_params
         )
+        for i, api_response in fetched.items():
+            api_responses[i] = api_response
+
+        with self.metrics.time(
+            "polygon_cache_combine_seconds", endpoint="aggregates"
+        ), span("combine", chunks=len(api_responses)), profile(
+            self.memory_profiler, "combine"
+        ):
+            combined = self._combine_aggregate_results(
+                api_responses,
+                ("ticker", "status", "adjusted"),
+                ("queryCount",),
+                (),
+                StocksEquitiesAggregatesApiResponse,
+                merged_attrs=("results",),
+                compact=compact,
+            )
+        combined.resultsCount = len(combined.results)
+        return combined
 
-        executor = ThreadPoolExecutor(max_threads)
-        api_responses = []
-        for dates in dates_api_calls:
-            date1 = dates[0].strftime("%Y-%m-%d")
-            date2 = dates[1].strftime("%Y-%m-%d")
-            api_responses.append(
-                executor.submit(
-                    super().stocks_equities_aggregates,
+    def _fetch_aggregate_chunks(
+        self, ticker, multiplier, timespan, chunks, indices, max_threads, query_params
+    ) -> dict:
+        # the chunks at indices fetched by a pool of threads, by index
+        if not indices:
+            return {}
+        with ThreadPoolExecutor(min(max_threads, len(indices))) as executor:
+            futures = {
+                i: submit_in_span(
+                    executor,
+                    "fetch_chunk",
+                    {"from_": chunks[i][0], "to": chunks[i][1]},
+                    self._fetch_aggregate_chunk,
                     ticker,
                     multiplier,
                     timespan,
-                    date1,
-                    date2,
+                    *chunks[i],
+                    **query_params,
+                )
+                for i in indices
+            }
+            return {i: future.result() for i, future in futures.items()}
+
+    def _lazy_aggregates(
+        self,
+        ticker,
+        multiplier,
+        timespan,
+        from_,
+        to,
+        max_threads,
+        query_params,
+        chunk_days,
+        compact=False,
+    ) -> LazyAggregatesResponse:
+        with span("plan") as plan_span:
+            chunks = self._plan_aggregate_chunks(timespan, from_, to, chunk_days)
+            keys = self._aggregate_chunk_keys(
+                ticker, multiplier, timespan, chunks, query_params
+            )
+            plan_span.set_attribute("chunks", len(chunks))
+        with span("cache_lookup", keys=len(keys)) as lookup_span:
+            cached = self.cache.cached_keys(keys)
+            lookup_span.set_attribute("hits", len(cached))
+        if self.mode == "offline" and len(cached) < len(set(keys)):
+            # misses are reported right away rather than once they're touched
+            raise CacheMissError(
+                [
+                    (ticker, multiplier, timespan, *dates)
+                    for dates, key in zip(chunks, keys)
+                    if key not in cached
+                ]
+            )
+        # the index knows how many results a cached chunk has, and the
+        # timestamps of its first and last results that show whether it
+        # overlaps other chunks, without decoding it. archived and
+        # mounted responses may not be indexed
+        indexed = {
+            entry["key"]: entry
+            for entry in self.cache.entries(
+                ticker, multiplier=multiplier, timespan=timespan
+            )
+        }
+        counts, bounds = [], []
+        for key in keys:
+            entry = indexed.get(key, {}) if key in cached else {}
+            counts.append(entry.get("row_count"))
+            first, last = entry.get("first_timestamp"), entry.get("last_timestamp")
+            bounds.append(None if first is None else (first, last))
+        query_counts = {}
+
+        def load(indices: List[int]) -> dict:
+            with tracing(self.tracer), span("load_chunks", chunks=len(indices)):
+                hits = self.cache.get_responses([keys[i] for i in indices])
+                self.metrics.inc(
+                    "polygon_cache_hits_total", len(hits), endpoint="aggregates"
+                )
+                api_responses = {
+                    i: self._parse(
+                        "StocksEquitiesAggregatesApiResponse",
+                        "aggregates",
+                        hits[keys[i]],
+                    )
+                    for i in indices
+                    if keys[i] in hits
+                }
+                api_responses.update(
+                    self._fetch_aggregate_chunks(
+                        ticker,
+                        multiplier,
+                        timespan,
+                        chunks,
+                        [i for i in indices if keys[i] not in hits],
+                        max_threads,
+                        query_params,
+                    )
+                )
+            loaded = {}
+            for i, api_response in api_responses.items():
+                query_counts[i] = getattr(api_response, "queryCount", 0)
+                results = _sorted_unique(
+                    getattr(api_response, "results", None) or [], "t"
                 )
+                loaded[i] = compact_bars(results) if compact else results
+            return loaded
+
+        return LazyAggregatesResponse(
+            ticker,
+            not _is_true(query_params.get("unadjusted")),
+            LazyResults(counts, load, key="t", bounds=bounds),
+            query_counts,
+        )
+
+    def _fetch_aggregate_chunk(
+        self, ticker, multiplier, timespan, from_, to, **query_params
+    ) -> StocksEquitiesAggregatesApiResponse:
+        # one call for one planned chunk, every asset class shares the same
+        # aggregates endpoint
+        return super().stocks_equities_aggregates(
+            ticker, multiplier, timespan, from_, to, **query_params
+        )
+
+    @staticmethod
+    def _chunk_days_for(ticker: str) -> dict:
+        # crypto (X:BTCUSD) and forex (C:EURUSD) tickers trade around the clock
+        if ticker.startswith(("X:", "C:")):
+            return ROUND_THE_CLOCK_CHUNK_DAYS
+        return EQUITIES_CHUNK_DAYS
+
+    def historic_trades_v2(
+        self, ticker, date, **query_params
+    ) -> HistoricTradesV2ApiResponse:
+        return self._fetch_tick_pages(
+            super().historic_trades_v2,
+            ticker,
+            date,
+            query_params,
+            HistoricTradesV2ApiResponse,
+        )
+
+    def historic_n___bbo_quotes_v2(
+        self, ticker, date, **query_params
+    ) -> HistoricNBboQuotesV2ApiResponse:
+        return self._fetch_tick_pages(
+            super().historic_n___bbo_quotes_v2,
+            ticker,
+            date,
+            query_params,
+            HistoricNBboQuotesV2ApiResponse,
+        )
+
+    def historic_trades_v2_range(
+        self, ticker, from_, to, max_threads=20, **query_params
+    ) -> HistoricTradesV2ApiResponse:
+        return self._fetch_tick_days(
+            self.historic_trades_v2,
+            ticker,
+            from_,
+            to,
+            max_threads,
+            query_params,
+            HistoricTradesV2ApiResponse,
+        )
+
+    def historic_n___bbo_quotes_v2_range(
+        self, ticker, from_, to, max_threads=20, **query_params
+    ) -> HistoricNBboQuotesV2ApiResponse:
+        return self._fetch_tick_days(
+            self.historic_n___bbo_quotes_v2,
+            ticker,
+            from_,
+            to,
+            max_threads,
+            query_params,
+            HistoricNBboQuotesV2ApiResponse,
+        )
+
+    def _fetch_tick_days(
+        self, fetch_day, ticker, from_, to, max_threads, query_params, response_class
+    ):
+        # each day is paginated serially but days are fetched in parallel,
+        # weekends are skipped since there are no trades or quotes to fetch
+        start = datetime.strptime(from_, "%Y-%m-%d")
+        end = datetime.strptime(to, "%Y-%m-%d")
+        days = [
+            day.strftime("%Y-%m-%d")
+            for day in (start + timedelta(i) for i in range((end - start).days + 1))
+            if day.weekday() < 5
+        ]
+        if not days:
+            # a weekend, or a range that ends before it starts
+            response = response_class()
+            response.ticker = ticker
+            response.results = []
+            response.results_count = 0
+            response.db_latency = 0
+            return response
+
+        with ThreadPoolExecutor(max_threads) as executor:
+            api_responses = [
+                submit_in_span(
+                    executor,
+                    "fetch_day",
+                    {"date": day},
+                    fetch_day,
+                    ticker,
+                    day,
+                    **query_params,
+                )
+                for day in days
+            ]
+            api_responses = [result.result() for result in api_responses]
+
+        with self.metrics.time(
+            "polygon_cache_combine_seconds", endpoint=TICK_ENDPOINTS[response_class]
+        ):
+            combined = self._combine_aggregate_results(
+                api_responses,
+                ("ticker",),
+                ("results_count", "db_latency"),
+                ("results",),
+                response_class,
             )
+        return _carry_attrs(api_responses[0], combined)
+
+    def _fetch_tick_pages(self, fetch_page, ticker, date, query_params, response_class):
+        # pages are requested with the timestamp of the last tick of the
+        # previous page as the offset, so ticks sharing that timestamp can be
+        # returned twice and are dropped from the start of the next page
+        params = dict(query_params)
+        # polygon returns at most TICK_PAGE_LIMIT ticks however many are asked
+        # for, so a larger limit would make the first page look like the last
+        params["limit"] = min(
+            int(params.get("limit", TICK_PAGE_LIMIT)), TICK_PAGE_LIMIT
+        )
+        pages = []
+        while True:
+            page = fetch_page(ticker, date, **params)
+            page_results = getattr(page, "results", None) or []
+            page.results = page_results
+            if pages:
+                page.results = self._drop_repeated_ticks(
+                    pages[-1].results, page_results
+                )
+            page.results_count = len(page.results)
+            page.db_latency = getattr(page, "db_latency", 0)
+            pages.append(page)
+
+            # a short page is the last one, and a page with nothing new means
+            # more ticks share one timestamp than fit on a page
+            if len(page_results) < params["limit"] or not page.results:
+                break
+            params["timestamp"] = page_results[-1]["t"]
 
-        api_responses = [result.result() for result in api_responses]
-        return self._combine_aggregate_results(api_responses,
-                                               ("ticker", "status", "adjusted"),
-                                               ("queryCount", "resultsCount"),
-                                               ("results",),
-                                               StocksEquitiesAggregatesApiResponse)
+        for page in pages:
+            page.ticker = ticker
+
+        with self.metrics.time(
+            "polygon_cache_combine_seconds", endpoint=TICK_ENDPOINTS[response_class]
+        ):
+            combined = self._combine_aggregate_results(
+                pages,
+                ("ticker",),
+                ("results_count", "db_latency"),
+                ("results",),
+                response_class,
+            )
+        return _carry_attrs(pages[0], combined)
+
+    @staticmethod
+    def _drop_repeated_ticks(previous_results: list, results: list) -> list:
+        if not previous_results:
+            return results
+        offset = previous_results[-1]["t"]
+        seen = []
+        for tick in reversed(previous_results):
+            if tick["t"] != offset:
+                break
+            seen.append(tick)
+        start = 0
+        while (
+            start < len(results)
+            and results[start]["t"] == offset
+            and results[start] in seen
+        ):
+            start += 1
+        return results[start:]
 
     @staticmethod
     def _calculate_aggregate_api_calls(
@@ -107,6 +1135,25 @@ class CachedRESTClient(RESTClient):
 
         return dates
 
+    @staticmethod
+    def _merge_sorted_results(chunks: List[list], key: str = "t") -> list:
+        # merges chunks that are each sorted by key into one strictly increasing
+        # timeline, keeping the result from the earliest chunk when chunk
+        # boundaries overlap
+        chunks = [_sorted_unique(chunk, key) for chunk in chunks if chunk]
+        if all(
+            previous[-1][key] < chunk[0][key]
+            for previous, chunk in zip(chunks, chunks[1:])
+        ):
+            # chunks that don't overlap, the usual case, are just concatenated
+            return [result for chunk in chunks for result in chunk]
+
+        merged = []
+        for result in heapq.merge(*chunks, key=itemgetter(key)):
+            if not merged or merged[-1][key] != result[key]:
+                merged.append(result)
+        return merged
+
     @staticmethod
     def _combine_aggregate_results(
         api_responses: list,
@@ -114,10 +1161,15 @@ class CachedRESTClient(RESTClient):
         summed_attrs,
         combined_attrs,
         response_class,
+        merged_attrs=(),
+        merge_key="t",
+        compact=False,
     ):
         combined_results = {}
-        [combined_results.update({attr: getattr(api_responses[0], attr)})
-         for attr in constant_attrs]
+        [
+            combined_results.update({attr: getattr(api_responses[0], attr)})
+            for attr in constant_attrs
+        ]
         [combined_results.update({attr: 0}) for attr in summed_attrs]
         [combined_results.update({attr: []}) for attr in combined_attrs]
 
@@ -134,8 +1186,51 @@ class CachedRESTClient(RESTClient):
             for attr in summed_attrs + combined_attrs:
                 combined_results[attr] += getattr(api_response, attr)
 
+        for attr in merged_attrs:
+            # chunks without any data leave the attribute out entirely
+            combined_results[attr] = CachedRESTClient._merge_sorted_results(
+                [
+                    getattr(api_response, attr, None) or []
+                    for api_response in api_responses
+                ],
+                merge_key,
+            )
+            if compact:
+                combined_results[attr] = compact_bars(combined_results[attr])
+
         combined_api_response = response_class()
         for attr, value in combined_results.items():
             setattr(combined_api_response, attr, value)
 
         return combined_api_response
+
+
+def _is_strictly_increasing(results: list, key: str) -> bool:
+    return all(
+        previous[key] < result[key] for previous, result in zip(results, results[1:])
+    )
+
+
+def _carry_attrs(source, combined):
+    # attributes polygon returns that aren't combined, like success and map, are
+    # the same in every response so they're copied from the first
+    for attr, value in vars(source).items():
+        if not hasattr(combined, attr):
+            setattr(combined, attr, value)
+    return combined
+
+
+def _sorted_unique(results: list, key: str) -> list:
+    # results sorted by key, keeping the first of results with the same key
+    if _is_strictly_increasing(results, key):
+        return results
+    unique = []
+    for result in sorted(results, key=itemgetter(key)):
+        if not unique or unique[-1][key] != result[key]:
+            unique.append(result)
+    return unique
+
+
+def _is_true(value) -> bool:
+    # query parameters can be passed as booleans or as strings
+    return str(value).lower() == "true"
@@ -0,0 +1,255 @@
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+from polygon_cache.bundle import export_bundle, import_bundle
+from polygon_cache.cache import CachedRESTClient
+from polygon_cache.plan import AggregatesPlan
+from polygon_cache.warm import parse_timespan, read_tickers, warm
+
+
+def _client(args) -> CachedRESTClient:
+    return CachedRESTClient(
+        args.api_key,
+        cache_location=args.cache_location,
+        local_split_adjustment=args.local_split_adjustment,
+        requests_per_minute=args.requests_per_minute,
+        archive_location=args.archive_location,
+        shards=args.shards,
+        multi_host=args.multi_host,
+    )
+
+
+def _warm(args) -> int:
+    report = warm(
+        _client(args),
+        read_tickers(args.tickers_file),
+        [parse_timespan(timespan) for timespan in args.timespan],
+        args.from_,
+        args.to,
+        concurrency=args.concurrency,
+        job=args.job,
+    )
+    print(report.summary())
+    return 1 if report.failed else 0
+
+
+def _plan(args) -> int:
+    # the client is offline so planning can't make any requests
+    client = CachedRESTClient(
+        args.api_key,
+        cache_location=args.cache_location,
+        local_split_adjustment=args.local_split_adjustment,
+        requests_per_minute=args.requests_per_minute,
+        mode="offline",
+        archive_location=args.archive_location,
+        shards=args.shards,
+        multi_host=args.multi_host,
+    )
+    query_params = {"unadjusted": "true"} if args.local_split_adjustment else {}
+    plan = AggregatesPlan([], args.requests_per_minute, max_threads=args.concurrency)
+    for ticker in read_tickers(args.tickers_file):
+        for multiplier, timespan in map(parse_timespan, args.timespan):
+            plan += client._plan_aggregates(
+                ticker,
+                multiplier,
+                timespan,
+                args.from_,
+                args.to,
+                args.concurrency,
+                query_params,
+                client._chunk_days_for(ticker),
+            )
+    if args.chunks:
+        for chunk in plan.chunks:
+            print(chunk)
+    print(plan.summary())
+    return 0
+
+
+def _archive(args) -> int:
+    before = date.today() - timedelta(days=args.older_than)
+    try:
+        moved = _client(args).cache.archive(before)
+    except ValueError as error:
+        parser().error(str(error))
+    print(f"archived {moved} responses for data before {before}")
+    return 0
+
+
+def _compact(args) -> int:
+    freed = _client(args).cache.compact(recompress=args.recompress)
+    print(f"compacted the cache, freed {freed} bytes")
+    return 0
+
+
+def _export(args) -> int:
+    exported = export_bundle(
+        _client(args),
+        args.bundle,
+        read_tickers(args.tickers_file),
+        (
+            [parse_timespan(timespan) for timespan in args.timespan]
+            if args.timespan
+            else None
+        ),
+        args.from_,
+        args.to,
+    )
+    print(f"exported {exported} responses to {args.bundle}")
+    return 0
+
+
+def _import(args) -> int:
+    imported = import_bundle(_client(args), args.bundle)
+    print(f"imported {imported} responses from {args.bundle}")
+    return 0
+
+
+def _serve(args) -> int:
+    from polygon_cache.server import CacheServer
+
+    with CacheServer(_client(args), args.socket) as server:
+        print(f"serving {args.cache_location} on {args.socket}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="polygon-cache")
+    parser.add_argument(
+        "--api-key",
+        default=os.environ.get("POLYGON_API_KEY"),
+        help="polygon api key, defaults to the POLYGON_API_KEY environment variable",
+    )
+    parser.add_argument("--cache-location", default="polygon-cache")
+    parser.add_argument(
+        "--local-split-adjustment",
+        action="store_true",
+        help="cache unadjusted bars like CachedRESTClient(local_split_adjustment=True)",
+    )
+    parser.add_argument("--requests-per-minute", type=float)
+    parser.add_argument(
+        "--shards",
+        type=int,
+        help="keep the cache as a directory of this many files sharded by ticker",
+    )
+    parser.add_argument(
+        "--multi-host",
+        action="store_true",
+        help="keep the cache as immutable files that warmers on several hosts "
+        "can share over a network file system",
+    )
+    parser.add_argument(
+        "--archive-location",
+        help="where the archive tier is stored, defaults to next to the cache",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    warm_parser = subparsers.add_parser(
+        "warm", help="fetch and cache every aggregates chunk that isn't cached yet"
+    )
+    warm_parser.add_argument("tickers_file", help="file with one ticker per line")
+    warm_parser.add_argument(
+        "--timespan",
+        action="append",
+        required=True,
+        help="timespan to warm e.g. minute or 5/minute, can be repeated",
+    )
+    warm_parser.add_argument("--from", dest="from_", required=True)
+    warm_parser.add_argument("--to", required=True)
+    warm_parser.add_argument("--concurrency", type=int, default=4)
+    warm_parser.add_argument(
+        "--job",
+        help="name of the backfill, rerunning with the same name resumes it",
+    )
+    warm_parser.set_defaults(handler=_warm)
+
+    plan_parser = subparsers.add_parser(
+        "plan",
+        help="report which aggregates chunks a warm would fetch and what it "
+        "would cost, without making any requests",
+    )
+    plan_parser.add_argument("tickers_file", help="file with one ticker per line")
+    plan_parser.add_argument(
+        "--timespan",
+        action="append",
+        required=True,
+        help="timespan to plan e.g. minute or 5/minute, can be repeated",
+    )
+    plan_parser.add_argument("--from", dest="from_", required=True)
+    plan_parser.add_argument("--to", required=True)
+    plan_parser.add_argument("--concurrency", type=int, default=4)
+    plan_parser.add_argument(
+        "--chunks", action="store_true", help="list every chunk as a hit or miss"
+    )
+    plan_parser.set_defaults(handler=_plan)
+
+    archive_parser = subparsers.add_parser(
+        "archive", help="move old cached responses to the compressed archive tier"
+    )
+    archive_parser.add_argument(
+        "--older-than",
+        type=int,
+        default=365,
+        help="archive responses for data that ends more than this many days ago",
+    )
+    archive_parser.set_defaults(handler=_archive)
+
+    compact_parser = subparsers.add_parser(
+        "compact", help="rewrite the cache files without their unused space"
+    )
+    compact_parser.add_argument(
+        "--recompress",
+        action="store_true",
+        help="compress the archived responses again with the current settings",
+    )
+    compact_parser.set_defaults(handler=_compact)
+
+    export_parser = subparsers.add_parser(
+        "export", help="write the cached responses of some tickers to a bundle"
+    )
+    export_parser.add_argument("bundle", help="bundle file to write")
+    export_parser.add_argument("tickers_file", help="file with one ticker per line")
+    export_parser.add_argument(
+        "--timespan",
+        action="append",
+        help="only export aggregates of this timespan e.g. minute or 5/minute, "
+        "can be repeated",
+    )
+    export_parser.add_argument("--from", dest="from_")
+    export_parser.add_argument("--to")
+    export_parser.set_defaults(handler=_export)
+
+    import_parser = subparsers.add_parser(
+        "import", help="copy the responses in a bundle into the cache"
+    )
+    import_parser.add_argument("bundle", help="bundle file to read")
+    import_parser.set_defaults(handler=_import)
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="fetch for every CachedRESTClient(server=...) on this host, "
+        "sharing one cache, rate limit and set of in flight requests",
+    )
+    serve_parser.add_argument(
+        "--socket", default="polygon-cache.sock", help="unix socket to listen on"
+    )
+    serve_parser.set_defaults(handler=_serve)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = parser().parse_args(argv)
+    if args.api_key is None:
+        parser().error("an api key is required, use --api-key or POLYGON_API_KEY")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
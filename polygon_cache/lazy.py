@@ -0,0 +1,244 @@
+import heapq
+import threading
+from bisect import bisect_right
+from collections.abc import Sequence
+from operator import itemgetter
+from typing import Callable, Dict, List, Optional
+
+from polygon.rest.models import StocksEquitiesAggregatesApiResponse
+
+
+class LazyResults(Sequence):
+    # the results of an aggregates call as a read only sequence over its
+    # chunks. a chunk is read from the cache, or fetched, and decoded only once
+    # an index in it is touched. the length of a cached chunk comes from the
+    # cache index so len() and negative indexes only fetch the chunks that
+    # aren't cached.
+    # with a key the results of every chunk are sorted by it and chunks whose
+    # keys overlap are merged like eager results are, keeping the first result
+    # of a key. the first and last keys of cached chunks come from the index,
+    # the chunks whose keys aren't known are loaded once any result is touched
+    # as they could overlap any other chunk
+    def __init__(
+        self,
+        counts: List[Optional[int]],
+        load: Callable[[List[int]], Dict[int, list]],
+        key: Optional[str] = None,
+        bounds: Optional[List[Optional[tuple]]] = None,
+    ):
+        self._counts = list(counts)
+        self._load = load
+        self._key = key
+        # the first and last keys of every chunk with results that are known
+        self._bounds = {i: bound for i, bound in enumerate(bounds or []) if bound}
+        # chunks loaded but not yet part of their group's results
+        self._loaded: Dict[int, list] = {}
+        self._loaded_chunks = set()
+        # consecutive chunks whose results are merged, every chunk is a group
+        # of its own unless it overlaps others
+        self._groups: Optional[List[List[int]]] = None
+        self._group_counts: List[Optional[int]] = []
+        self._results: Dict[int, list] = {}
+        self._functions: List[Callable[[list], list]] = []
+        self._lock = threading.RLock()
+
+    def map_chunks(self, function: Callable[[list], list]):
+        # applies function to the results of every chunk, or of overlapping
+        # chunks merged together, once they're loaded. function mustn't change
+        # how many results there are
+        with self._lock:
+            self._functions.append(function)
+            for group, results in self._results.items():
+                self._results[group] = function(results)
+
+    def _load_chunks(self, indices):
+        missing = [i for i in indices if i not in self._loaded_chunks]
+        if not missing:
+            return
+        for i, results in self._load(missing).items():
+            self._loaded[i] = results
+            self._loaded_chunks.add(i)
+            self._counts[i] = len(results)
+            if self._key is not None and results:
+                self._bounds[i] = (results[0][self._key], results[-1][self._key])
+
+    def _group(self) -> List[List[int]]:
+        # a chunk starts a new group when every key before it is smaller than
+        # every key from it on
+        with self._lock:
+            if self._groups is not None:
+                return self._groups
+            count = len(self._counts)
+            if self._key is None:
+                self._groups = [[i] for i in range(count)]
+            else:
+                self._load_chunks(
+                    [
+                        i
+                        for i in range(count)
+                        if i not in self._bounds and self._counts[i] != 0
+                    ]
+                )
+                firsts = [None] * (count + 1)
+                for i in reversed(range(count)):
+                    firsts[i] = firsts[i + 1]
+                    if i in self._bounds and (
+                        firsts[i] is None or self._bounds[i][0] < firsts[i]
+                    ):
+                        firsts[i] = self._bounds[i][0]
+                self._groups = []
+                last = None
+                for i in range(count):
+                    if (
+                        self._groups
+                        and last is not None
+                        and firsts[i] is not None
+                        and last >= firsts[i]
+                    ):
+                        self._groups[-1].append(i)
+                    else:
+                        self._groups.append([i])
+                    if i in self._bounds and (
+                        last is None or self._bounds[i][1] > last
+                    ):
+                        last = self._bounds[i][1]
+            # merged groups are only counted once they're merged
+            self._group_counts = [
+                self._counts[group[0]] if len(group) == 1 else None
+                for group in self._groups
+            ]
+            return self._groups
+
+    def _ensure_loaded(self, groups):
+        with self._lock:
+            chunks = self._group()
+            missing = sorted(g for g in groups if g not in self._results)
+            if not missing:
+                return
+            self._load_chunks([i for g in missing for i in chunks[g]])
+            for g in missing:
+                results = [self._loaded.pop(i) for i in chunks[g]]
+                if len(results) == 1:
+                    results = results[0]
+                else:
+                    results = _merge(results, self._key)
+                for function in self._functions:
+                    results = function(results)
+                self._results[g] = results
+                self._group_counts[g] = len(results)
+
+    def _offsets(self, until: Optional[int] = None) -> List[int]:
+        # offsets[g] is the index of group g's first result and the last offset
+        # is the number of results, up to the group holding the result at
+        # index until if it's given. groups whose counts aren't known are
+        # loaded on the way, all at once if every group is needed
+        with self._lock:
+            groups = self._group()
+            if until is None:
+                self._ensure_loaded(
+                    [g for g, count in enumerate(self._group_counts) if count is None]
+                )
+            offsets = [0]
+            for g in range(len(groups)):
+                if until is not None and offsets[-1] > until:
+                    break
+                if self._group_counts[g] is None:
+                    self._ensure_loaded([g])
+                offsets.append(offsets[-1] + self._group_counts[g])
+            return offsets
+
+    @property
+    def loaded_chunks(self) -> int:
+        return len(self._loaded_chunks)
+
+    def __len__(self) -> int:
+        return self._offsets()[-1]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.start, index.stop, index.step
+            forward = (step or 1) > 0 and (start or 0) >= 0
+            offsets = self._offsets(
+                stop - 1 if forward and stop is not None and stop > 0 else None
+            )
+            positions = range(*index.indices(offsets[-1]))
+            if not positions:
+                return []
+            first, last = sorted((positions[0], positions[-1]))
+            self._ensure_loaded(
+                range(bisect_right(offsets, first) - 1, bisect_right(offsets, last))
+            )
+            return [self._result(offsets, position) for position in positions]
+
+        offsets = self._offsets(index if index >= 0 else None)
+        if index < 0:
+            index += offsets[-1]
+        if not 0 <= index < offsets[-1]:
+            raise IndexError("results index out of range")
+        self._ensure_loaded([bisect_right(offsets, index) - 1])
+        return self._result(offsets, index)
+
+    def _result(self, offsets: List[int], index: int) -> dict:
+        # bisect_right skips groups without results, which share their offset
+        # with the group after them
+        group = bisect_right(offsets, index) - 1
+        return self._results[group][index - offsets[group]]
+
+    def load_all(self):
+        self._ensure_loaded(range(len(self._group())))
+
+    def __iter__(self):
+        # iterating touches every chunk so they're all loaded at once
+        self.load_all()
+        for g in range(len(self._group())):
+            yield from self._results[g]
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return (
+            f"<LazyResults of {len(self._counts)} chunks, "
+            f"{len(self._loaded_chunks)} loaded>"
+        )
+
+
+def _merge(chunks: List[list], key: str) -> list:
+    # chunks sorted by key merged into one strictly increasing sequence,
+    # keeping the result of the earliest chunk for a key
+    merged = []
+    for result in heapq.merge(*chunks, key=itemgetter(key)):
+        if not merged or merged[-1][key] != result[key]:
+            merged.append(result)
+    return merged
+
+
+class LazyAggregatesResponse(StocksEquitiesAggregatesApiResponse):
+    # an aggregates response whose results are LazyResults, the counts are
+    # worked out from them when they're read
+    def __init__(
+        self,
+        ticker: str,
+        adjusted: bool,
+        results: LazyResults,
+        query_counts: Dict[int, int],
+    ):
+        super().__init__()
+        self.ticker = ticker
+        self.status = "OK"
+        self.adjusted = adjusted
+        self.results = results
+        # the query count of every chunk, filled in as chunks are loaded
+        self.query_counts = query_counts
+
+    @property
+    def resultsCount(self) -> int:
+        return len(self.results)
+
+    @property
+    def queryCount(self) -> int:
+        # polygon's query counts are only known once every chunk is loaded
+        self.results.load_all()
+        return sum(self.query_counts.values())
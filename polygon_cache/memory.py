@@ -0,0 +1,83 @@
+import contextvars
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional
+
+# the peaks of the stages of the call in progress, copied into pool threads with
+# the rest of the context so stages there count towards the call
+_current_peaks: contextvars.ContextVar = contextvars.ContextVar(
+    "polygon_cache_peaks", default=None
+)
+
+
+class _Stage:
+    def __init__(self, start: int):
+        self.start = start
+        self.peak = start
+
+
+class MemoryProfiler:
+    # measures the peak memory allocated during every stage of a call with
+    # tracemalloc. tracemalloc only keeps one peak for the whole process, so
+    # it's sampled and reset whenever a stage starts or ends and the samples
+    # are folded into every stage still open. stages that run at the same time
+    # in other threads count towards each other's peaks
+    def __init__(self, metrics):
+        if not hasattr(tracemalloc, "reset_peak"):
+            raise ValueError("Profiling memory needs python 3.9 or later")
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._open = []
+        self._started_tracing = False
+
+    def _sample(self) -> int:
+        current, peak = tracemalloc.get_traced_memory()
+        for stage in self._open:
+            stage.peak = max(stage.peak, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    @contextmanager
+    def stage(self, name: str):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                # tracing slows every allocation down so it only runs while
+                # stages are open, unless it was started by someone else
+                tracemalloc.start()
+                self._started_tracing = True
+            stage = _Stage(self._sample())
+            self._open.append(stage)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._sample()
+                self._open.remove(stage)
+                if not self._open and self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+                used = stage.peak - stage.start
+                peaks = _current_peaks.get()
+                if peaks is not None:
+                    peaks[name] = max(peaks.get(name, 0), used)
+            self.metrics.observe("polygon_cache_peak_memory_bytes", used, stage=name)
+
+    @contextmanager
+    def call(self, name: str):
+        # a stage for a whole call that yields the peaks of every stage within
+        # it by name, the largest one where a stage ran more than once
+        peaks: Dict[str, int] = {}
+        token = _current_peaks.set(peaks)
+        try:
+            with self.stage(name):
+                yield peaks
+        finally:
+            _current_peaks.reset(token)
+
+
+def profile(profiler: Optional[MemoryProfiler], name: str, call: bool = False):
+    # a stage of the profiler, or nothing if memory isn't profiled
+    if profiler is None:
+        return nullcontext()
+    return profiler.call(name) if call else profiler.stage(name)
@@ -0,0 +1,166 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from polygon_cache.backend import AGGREGATES_PATH, TICKS_ENDPOINTS, TICKS_PATH
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+
+METRICS = {
+    "polygon_cache_hits_total": (COUNTER, "Requests served from the cache."),
+    "polygon_cache_misses_total": (COUNTER, "Requests that weren't cached."),
+    "polygon_cache_upstream_seconds": (
+        HISTOGRAM,
+        "Time waiting for polygon to answer a request that wasn't cached.",
+    ),
+    "polygon_cache_downloaded_bytes_total": (
+        COUNTER,
+        "Bytes of response bodies downloaded from polygon.",
+    ),
+    "polygon_cache_parse_seconds": (
+        HISTOGRAM,
+        "Time decoding a response body into a response object.",
+    ),
+    "polygon_cache_combine_seconds": (
+        HISTOGRAM,
+        "Time combining chunks or pages into one response.",
+    ),
+    "polygon_cache_retries_total": (COUNTER, "Requests retried after a 429."),
+    "polygon_cache_rate_limited_total": (COUNTER, "429 responses from polygon."),
+    "polygon_cache_peak_memory_bytes": (
+        HISTOGRAM,
+        "Peak memory allocated during a stage of a call, with profile_memory.",
+    ),
+}
+
+# upper bounds in seconds, chosen to tell cache reads apart from requests
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# histograms that aren't measured in seconds have buckets of their own
+MEMORY_BUCKETS = tuple(2**power for power in range(20, 35, 2))
+BUCKETS = {"polygon_cache_peak_memory_bytes": MEMORY_BUCKETS}
+
+
+def endpoint_label(url: str) -> str:
+    # a label per kind of endpoint rather than per url, so tickers and dates
+    # don't each get their own time series
+    path = urlparse(url).path
+    if AGGREGATES_PATH.search(path):
+        return "aggregates"
+    if match := TICKS_PATH.search(path):
+        return TICKS_ENDPOINTS[match["endpoint"]]
+    return "/".join(path.split("/")[:4])
+
+
+class Metrics:
+    # thread safe counters and histograms of what a client did, labelled by
+    # endpoint, with a dump in the prometheus text format
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        # a count per bucket and one for +Inf, followed by the sum and the
+        # count of the observations
+        self._histograms: Dict[Tuple[str, tuple], list] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self._buckets(name)
+        with self._lock:
+            histogram = self._histograms.setdefault(key, [0] * (len(buckets) + 3))
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def _buckets(self, name: str) -> Tuple[float, ...]:
+        return BUCKETS.get(name, self.buckets)
+
+    @contextmanager
+    def time(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def value(self, name: str, **labels) -> float:
+        # a counter's value, or a histogram's number of observations
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key in self._histograms:
+                return self._histograms[key][-1]
+            return self._counters.get(key, 0)
+
+    def mean(self, name: str, **labels) -> Optional[float]:
+        # a histogram's mean observation, None if nothing was observed
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if not histogram:
+                return None
+            return histogram[-2] / histogram[-1]
+
+    def total(self, name: str) -> float:
+        # a counter's value, or a histogram's sum, over every label
+        with self._lock:
+            if METRICS[name][0] == HISTOGRAM:
+                return sum(
+                    histogram[-2]
+                    for (metric, _), histogram in self._histograms.items()
+                    if metric == name
+                )
+            return sum(
+                value for (metric, _), value in self._counters.items() if metric == name
+            )
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def prometheus(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            if kind == COUNTER:
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_labels(labels)} {value:g}")
+                continue
+            bounds = [
+                str(bound) if isinstance(bound, int) else f"{bound:g}"
+                for bound in self._buckets(name)
+            ] + ["+Inf"]
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(bounds, histogram):
+                    cumulative += count
+                    bucket_labels = _labels(labels + (("le", bound),))
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram[-2]:g}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
@@ -0,0 +1,278 @@
+import json
+import os
+import pickle
+import socket
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from requests_cache.backends.base import BaseCache
+
+from polygon_cache.backend import (
+    HOT,
+    describe_response,
+    describe_url,
+    filter_entries,
+    merge_intervals,
+)
+from polygon_cache.tracing import span
+
+PARTITION_EXTENSION = ".partition"
+LOCK_EXTENSION = ".lock"
+TAKEOVER_EXTENSION = ".takeover"
+# marks a directory as a partitioned file cache so it's reopened as one
+LAYOUT_FILE = "partitioned-file-cache"
+# a claim that hasn't been released after this many seconds is assumed to be
+# left behind by a warmer that died and can be taken over
+CLAIM_TIMEOUT = 60 * 60
+
+
+class PartitionedFileCache(BaseCache):
+    # a cache that several hosts can share over a network file system. every
+    # response is an immutable file in a directory per ticker, written to a
+    # temporary file and renamed into place so readers never see a partial
+    # file. nothing is locked to read or write, lock files created with
+    # O_EXCL only let warmers claim chunks so no two hosts fetch the same one.
+    # the splits table and backfill manifests are kept in a sqlite file per
+    # host, which only that host writes to
+    def __init__(self, location="polygon-cache", extension=".sqlite", **options):
+        super().__init__(**options)
+        self.location = location
+        os.makedirs(location, exist_ok=True)
+        with open(os.path.join(location, LAYOUT_FILE), "a"):
+            pass
+        self.filename = os.path.join(location, socket.gethostname() + extension)
+        self._mounted: Dict[str, tuple] = {}
+
+    @staticmethod
+    def is_partitioned(location: str) -> bool:
+        return os.path.exists(os.path.join(location, LAYOUT_FILE))
+
+    def create_key(self, request):
+        # the key is the path of the response's file below the cache directory
+        ticker = describe_url(request.url).get("ticker") or "_"
+        return f"{quote(ticker, safe='')}/{super().create_key(request)}"
+
+    def _path(self, key: str, extension: str = PARTITION_EXTENSION) -> str:
+        return os.path.join(self.location, key + extension)
+
+    def save_response(self, key, response):
+        entry = describe_response(key, response)
+        value = pickle.dumps((self.reduce_response(response), datetime.utcnow()))
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = (
+            f"{path}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        with span("cache_write", bytes=len(response.content)):
+            with open(temporary, "wb") as partition:
+                partition.write(json.dumps(entry).encode() + b"\n")
+                partition.write(value)
+                partition.flush()
+                os.fsync(partition.fileno())
+            os.replace(temporary, path)
+
+    def _read(self, key: str) -> Optional[tuple]:
+        try:
+            with open(self._path(key), "rb") as partition:
+                partition.readline()
+                return pickle.loads(partition.read())
+        except FileNotFoundError:
+            return None
+
+    def get_response_and_time(self, key, default=(None, None)):
+        stored = self._read(key)
+        if stored is None:
+            return self._get_mounted([key]).get(key, default)
+        response, timestamp = stored
+        return self.restore_response(response), timestamp
+
+    def _get_mounted(self, keys: List[str]) -> dict:
+        by_bundle = {}
+        for key in keys:
+            if key in self._mounted:
+                bundle, url = self._mounted[key]
+                by_bundle.setdefault(bundle, {})[url] = key
+        responses = {}
+        for bundle, urls in by_bundle.items():
+            for url, (response, timestamp) in bundle.get_responses(list(urls)).items():
+                responses[urls[url]] = self.restore_response(response), timestamp
+        return responses
+
+    def has_key(self, key):
+        return os.path.exists(self._path(key)) or key in self._mounted
+
+    def cached_keys(self, keys: List[str]) -> set:
+        return {key for key in keys if self.has_key(key)}
+
+    def get_responses(self, keys: List[str]) -> dict:
+        responses = {}
+        for key in keys:
+            response, _ = self.get_response_and_time(key)
+            if response is not None:
+                responses[key] = response
+        return responses
+
+    def mount(self, bundle, keys: Dict[str, str]):
+        for key, url in keys.items():
+            self._mounted.setdefault(key, (bundle, url))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _keys(self, ticker: Optional[str] = None) -> List[str]:
+        directories = (
+            [quote(ticker, safe="")]
+            if ticker is not None
+            else [entry.name for entry in os.scandir(self.location) if entry.is_dir()]
+        )
+        keys = []
+        for directory in directories:
+            try:
+                names = os.listdir(os.path.join(self.location, directory))
+            except FileNotFoundError:
+                continue
+            keys += [
+                f"{directory}/{name[: -len(PARTITION_EXTENSION)]}"
+                for name in names
+                if name.endswith(PARTITION_EXTENSION)
+            ]
+        return keys
+
+    def clear(self):
+        for key in self._keys():
+            self.delete(key)
+
+    def remove_old_entries(self, created_before):
+        for key in self._keys():
+            stored = self._read(key)
+            if stored is not None and stored[1] < created_before:
+                self.delete(key)
+
+    def reindex(self):
+        # every partition carries its own index entry
+        pass
+
+    def _entry(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(key), "rb") as partition:
+                return json.loads(partition.readline())
+        except FileNotFoundError:
+            return None
+
+    def entries(
+        self,
+        ticker: Optional[str] = None,
+        endpoint: Optional[str] = "aggregates",
+        multiplier: Optional[int] = None,
+        timespan: Optional[str] = None,
+        adjusted: Optional[bool] = None,
+    ) -> List[dict]:
+        entries = [self._entry(key) for key in self._keys(ticker)]
+        return filter_entries(
+            [entry for entry in entries if entry is not None],
+            ticker=ticker,
+            endpoint=endpoint,
+            multiplier=multiplier,
+            timespan=timespan,
+            adjusted=adjusted,
+        )
+
+    def coverage(
+        self,
+        ticker: str,
+        endpoint: str = "aggregates",
+        multiplier: Optional[int] = None,
+        timespan: Optional[str] = None,
+        adjusted: Optional[bool] = None,
+    ) -> List[Tuple[date, date]]:
+        return merge_intervals(
+            self.entries(ticker, endpoint, multiplier, timespan, adjusted)
+        )
+
+    def size(self, tier: str = HOT) -> int:
+        if tier != HOT:
+            return 0
+        return sum(os.path.getsize(self._path(key)) for key in self._keys())
+
+    def claim(self, key: str) -> bool:
+        # claims the fetching of a response for this process, false if another
+        # process, possibly on another host, claimed it first
+        path = self._path(key, LOCK_EXTENSION)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for _ in range(2):
+            try:
+                descriptor = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._take_over(path):
+                    return False
+                continue
+            with os.fdopen(descriptor, "w") as lock:
+                lock.write(f"{socket.gethostname()} {os.getpid()}\n")
+            return True
+        return False
+
+    @staticmethod
+    def _take_over(path: str) -> bool:
+        # removes a lock file left behind by a warmer that died, false if it
+        # isn't stale or another process is taking it over. the takeover of a
+        # lock file is claimed with a file named after its inode and
+        # modification time, so only one process removes it and never a lock
+        # file created since. those files are removed by compact
+        try:
+            stale = os.stat(path)
+        except FileNotFoundError:
+            return True
+        if time.time() - stale.st_mtime < CLAIM_TIMEOUT:
+            return False
+        identity = (stale.st_ino, stale.st_mtime_ns)
+        try:
+            os.close(
+                os.open(
+                    f"{path}.{stale.st_ino}.{stale.st_mtime_ns}{TAKEOVER_EXTENSION}",
+                    os.O_CREAT | os.O_EXCL | os.O_WRONLY,
+                )
+            )
+        except FileExistsError:
+            return False
+        try:
+            current = os.stat(path)
+        except FileNotFoundError:
+            return True
+        if (current.st_ino, current.st_mtime_ns) == identity:
+            os.remove(path)
+        return True
+
+    def release(self, key: str):
+        try:
+            os.remove(self._path(key, LOCK_EXTENSION))
+        except FileNotFoundError:
+            pass
+
+    def compact(self, recompress: bool = False) -> int:
+        # partitions are never rewritten so there is nothing to compact, only
+        # temporary files left by writers that died and files that claimed
+        # the takeover of stale locks are removed
+        freed = 0
+        for directory in os.scandir(self.location):
+            if not directory.is_dir():
+                continue
+            for file in os.scandir(directory.path):
+                if (
+                    file.name.endswith((".tmp", TAKEOVER_EXTENSION))
+                    and time.time() - file.stat().st_mtime > CLAIM_TIMEOUT
+                ):
+                    freed += file.stat().st_size
+                    os.remove(file.path)
+        return freed
+
+    def archive(self, before: date) -> int:
+        raise ValueError("A multi host cache has no archive tier")
+
+    def evict(self, max_size: Optional[int] = None) -> int:
+        raise ValueError("A multi host cache can't be evicted")
@@ -0,0 +1,118 @@
+import math
+from datetime import datetime
+from typing import List, Optional
+
+# bars per calendar day of a ticker with a multiplier of 1, for chunks that
+# aren't cached when nothing of the ticker is cached to go by. equities trade
+# 16 hours on weekdays including extended hours
+EQUITIES_BARS_PER_DAY = {
+    "minute": 16 * 60 * 5 / 7,
+    "hour": 16 * 5 / 7,
+    "day": 5 / 7,
+}
+ROUND_THE_CLOCK_BARS_PER_DAY = {"minute": 24 * 60, "hour": 24, "day": 1}
+LONGER_TIMESPAN_DAYS = {"week": 7, "month": 30, "quarter": 91, "year": 365}
+# roughly the size of a bar in a response body
+DEFAULT_BYTES_PER_ROW = 100
+# how long polygon takes to answer when the client hasn't timed any requests
+DEFAULT_SECONDS_PER_CALL = 0.5
+
+
+def chunk_days(from_: str, to: str) -> int:
+    start = datetime.strptime(from_, "%Y-%m-%d")
+    end = datetime.strptime(to, "%Y-%m-%d")
+    return (end - start).days + 1
+
+
+def estimate_rows(
+    multiplier: int, timespan: str, days: int, round_the_clock: bool = False
+) -> int:
+    if timespan in LONGER_TIMESPAN_DAYS:
+        return math.ceil(days / LONGER_TIMESPAN_DAYS[timespan] / multiplier)
+    bars_per_day = (
+        ROUND_THE_CLOCK_BARS_PER_DAY if round_the_clock else EQUITIES_BARS_PER_DAY
+    )
+    return math.ceil(days * bars_per_day[timespan] / multiplier)
+
+
+class PlannedChunk:
+    def __init__(self, ticker, multiplier, timespan, from_, to, cached, rows, bytes_):
+        self.ticker = ticker
+        self.multiplier = multiplier
+        self.timespan = timespan
+        self.from_ = from_
+        self.to = to
+        self.cached = cached
+        # counted for cached chunks that are indexed, estimated for the rest
+        self.rows = rows
+        self.bytes = bytes_
+
+    def __repr__(self):
+        state = "hit" if self.cached else "miss"
+        return (
+            f"{self.ticker} {self.multiplier}/{self.timespan} {self.from_} - "
+            f"{self.to} {state} {self.rows} rows {self.bytes} bytes"
+        )
+
+
+class AggregatesPlan:
+    # the chunks an aggregates call would fetch, which are cached and what
+    # fetching the rest would cost
+    def __init__(
+        self,
+        chunks: List[PlannedChunk],
+        requests_per_minute: Optional[float] = None,
+        seconds_per_call: float = DEFAULT_SECONDS_PER_CALL,
+        max_threads: int = 20,
+    ):
+        self.chunks = chunks
+        self.requests_per_minute = requests_per_minute
+        self.seconds_per_call = seconds_per_call
+        self.max_threads = max_threads
+
+    def __add__(self, other: "AggregatesPlan") -> "AggregatesPlan":
+        return AggregatesPlan(
+            self.chunks + other.chunks,
+            self.requests_per_minute,
+            self.seconds_per_call,
+            self.max_threads,
+        )
+
+    @property
+    def hits(self) -> List[PlannedChunk]:
+        return [chunk for chunk in self.chunks if chunk.cached]
+
+    @property
+    def misses(self) -> List[PlannedChunk]:
+        return [chunk for chunk in self.chunks if not chunk.cached]
+
+    @property
+    def calls(self) -> int:
+        # every miss is one api call
+        return len(self.misses)
+
+    @property
+    def rows(self) -> int:
+        return sum(chunk.rows for chunk in self.chunks)
+
+    @property
+    def bytes_to_fetch(self) -> int:
+        return sum(chunk.bytes for chunk in self.misses)
+
+    @property
+    def seconds(self) -> float:
+        # the estimated time to fetch the misses, limited either by the
+        # requests in flight or by the rate limit
+        if not self.calls:
+            return 0.0
+        fetching = math.ceil(self.calls / self.max_threads) * self.seconds_per_call
+        if self.requests_per_minute is None:
+            return fetching
+        return max(fetching, (self.calls - 1) * 60 / self.requests_per_minute)
+
+    def summary(self) -> str:
+        return (
+            f"planned {len(self.chunks)} chunks: {len(self.hits)} cached, "
+            f"{self.calls} api calls to fetch about {self.bytes_to_fetch / 1e6:.1f}MB, "
+            f"about {self.rows} rows in total, estimated {self.seconds:.0f}s"
+        )
@@ -0,0 +1,27 @@
+import threading
+import time
+
+
+class RateLimiter:
+    # a token bucket shared by every thread making requests, allowing bursts
+    # of up to `burst` requests and `requests_per_minute` on average
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        self.interval = 60 / requests_per_minute
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) / self.interval
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * self.interval
+            time.sleep(wait)
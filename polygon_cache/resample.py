@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Callable, List
+
+import pytz
+
+EXCHANGE_TIMEZONE = pytz.timezone("America/New_York")
+
+# milliseconds in one unit of each intraday timespan
+INTRADAY_TIMESPAN_MS = {"minute": 60 * 1000, "hour": 60 * 60 * 1000}
+
+# timespans ordered from finest to coarsest
+TIMESPAN_ORDER = ("minute", "hour", "day", "week", "month", "quarter", "year")
+
+
+def can_resample(
+    source_multiplier: int, source_timespan: str, multiplier: int, timespan: str
+) -> bool:
+    # bars can only be built from bars that are strictly finer than the
+    # requested bars and that line up with the requested bucket boundaries
+    if source_timespan not in TIMESPAN_ORDER or timespan not in TIMESPAN_ORDER:
+        return False
+    source_rank = TIMESPAN_ORDER.index(source_timespan)
+    rank = TIMESPAN_ORDER.index(timespan)
+    if source_rank > rank:
+        return False
+    if source_rank == rank:
+        return source_multiplier < multiplier and multiplier % source_multiplier == 0
+    if source_timespan in INTRADAY_TIMESPAN_MS and timespan in INTRADAY_TIMESPAN_MS:
+        source_ms = source_multiplier * INTRADAY_TIMESPAN_MS[source_timespan]
+        return (multiplier * INTRADAY_TIMESPAN_MS[timespan]) % source_ms == 0
+    # anything coarser than a day is built from calendar days in the exchange
+    # timezone so the source has to be at most one day long
+    return source_timespan in INTRADAY_TIMESPAN_MS or source_multiplier == 1
+
+
+def _local_midnight_ms(local_date) -> int:
+    midnight = EXCHANGE_TIMEZONE.localize(
+        datetime(local_date.year, local_date.month, local_date.day)
+    )
+    return int(midnight.timestamp() * 1000)
+
+
+def bucket_function(multiplier: int, timespan: str) -> Callable[[int], int]:
+    # returns a function mapping a bar's unix ms timestamp to the unix ms
+    # timestamp of the start of the bucket it belongs to
+    if timespan in INTRADAY_TIMESPAN_MS:
+        # intraday bars are aligned to the unix epoch like polygon's own bars
+        width = multiplier * INTRADAY_TIMESPAN_MS[timespan]
+        return lambda t: t - t % width
+
+    def local_date(t):
+        return datetime.fromtimestamp(t / 1000, EXCHANGE_TIMEZONE).date()
+
+    if timespan == "day":
+        epoch = datetime(1970, 1, 1).date()
+
+        def day_bucket(t):
+            date = local_date(t)
+            date -= timedelta((date - epoch).days % multiplier)
+            return _local_midnight_ms(date)
+
+        return day_bucket
+
+    if timespan == "week":
+        # weeks start on sunday in the exchange timezone
+        first_sunday = datetime(1970, 1, 4).date()
+
+        def week_bucket(t):
+            date = local_date(t)
+            weeks = (date - first_sunday).days // 7
+            return _local_midnight_ms(
+                first_sunday + timedelta(weeks - weeks % multiplier) * 7
+            )
+
+        return week_bucket
+
+    months = {"month": 1, "quarter": 3, "year": 12}[timespan] * multiplier
+
+    def month_bucket(t):
+        date = local_date(t)
+        index = date.year * 12 + date.month - 1
+        index -= index % months
+        return _local_midnight_ms(
+            date.replace(year=index // 12, month=index % 12 + 1, day=1)
+        )
+
+    return month_bucket
+
+
+def resample_aggregates(
+    results: List[dict], multiplier: int, timespan: str
+) -> List[dict]:
+    # builds coarser OHLCV bars from finer bars sorted by timestamp in a single
+    # pass, each output bar is stamped with the start of its bucket
+    bucket = bucket_function(multiplier, timespan)
+    resampled = []
+    for start, group in groupby(results, key=lambda bar: bucket(bar["t"])):
+        bars = list(group)
+        combined = {
+            "o": bars[0]["o"],
+            "h": max(bar["h"] for bar in bars),
+            "l": min(bar["l"] for bar in bars),
+            "c": bars[-1]["c"],
+            "t": start,
+        }
+        if "T" in bars[0]:
+            combined["T"] = bars[0]["T"]
+        if all("v" in bar for bar in bars):
+            volume = sum(bar["v"] for bar in bars)
+            combined["v"] = volume
+            if volume and all("vw" in bar for bar in bars):
+                combined["vw"] = sum(bar["vw"] * bar["v"] for bar in bars) / volume
+        if all("n" in bar for bar in bars):
+            combined["n"] = sum(bar["n"] for bar in bars)
+        resampled.append(combined)
+
+    return resampled
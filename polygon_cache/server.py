@@ -0,0 +1,100 @@
+import json
+import os
+import socket
+import socketserver
+import threading
+from concurrent.futures import Future
+from typing import Dict, Optional
+
+import requests
+
+
+class ServerError(RuntimeError):
+    # raised in clients for errors other than http errors the server ran into
+    pass
+
+
+def _check_unix_sockets():
+    if not hasattr(socket, "AF_UNIX"):
+        raise ServerError("A cache server needs unix sockets, this platform has none")
+
+
+# windows has no unix sockets, there a CacheServer raises once it's created
+_StreamServer = getattr(socketserver, "UnixStreamServer", socketserver.TCPServer)
+
+
+class CacheServer(socketserver.ThreadingMixIn, _StreamServer):
+    # a unix socket server that fetches for the CachedRESTClients of every
+    # process on a host. it owns the client that writes the cache, rate limits
+    # and retries, and fetches a url that several clients miss at the same time
+    # only once. clients read hits from the cache themselves
+    daemon_threads = True
+
+    def __init__(self, client, path: str):
+        _check_unix_sockets()
+        self.client = client
+        self.path = path
+        self._in_flight: Dict[str, Future] = {}
+        self._in_flight_lock = threading.Lock()
+        if os.path.exists(path):
+            # left behind by a server that wasn't shut down cleanly
+            os.remove(path)
+        super().__init__(path, _Handler)
+
+    def fetch(self, endpoint: str, params: dict) -> Optional[dict]:
+        key = self.client._cache_key(endpoint, params)
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            fetching = future is None
+            if fetching:
+                future = self._in_flight[key] = Future()
+        if fetching:
+            try:
+                future.set_result(self.client._get_json(endpoint, params))
+            except Exception as error:
+                future.set_exception(error)
+            finally:
+                with self._in_flight_lock:
+                    del self._in_flight[key]
+        return future.result()
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # one json request per line, answered with one json reply per line
+    def handle(self):
+        for line in self.rfile:
+            request = json.loads(line)
+            try:
+                reply = {
+                    "body": self.server.fetch(request["endpoint"], request["params"])
+                }
+            except requests.HTTPError as error:
+                reply = {"error": str(error), "http_error": True}
+            except Exception as error:
+                reply = {"error": f"{type(error).__name__}: {error}"}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class ServerConnection:
+    def __init__(self, path: str):
+        _check_unix_sockets()
+        self.path = path
+
+    def fetch(self, endpoint: str, params: dict) -> Optional[dict]:
+        # a connection per request keeps clients safe to use from many threads
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.path)
+            request = {"endpoint": endpoint, "params": params}
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as replies:
+                reply = json.loads(replies.readline())
+        if "error" not in reply:
+            return reply["body"]
+        if reply.get("http_error"):
+            raise requests.HTTPError(reply["error"])
+        raise ServerError(reply["error"])
@@ -0,0 +1,152 @@
+import sqlite3
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from polygon_cache.resample import EXCHANGE_TIMEZONE
+
+PRICE_KEYS = ("o", "h", "l", "c", "vw")
+
+
+class SplitsTable:
+    # a small table of splits per ticker stored next to the cached responses,
+    # refreshed with a single splits call once it is older than max_age
+    def __init__(
+        self,
+        filename: str,
+        fetch_splits: Callable,
+        max_age: Optional[timedelta] = timedelta(days=1),
+    ):
+        self.filename = filename
+        self.fetch_splits = fetch_splits
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        with self._connection() as con:
+            con.execute(
+                "create table if not exists splits "
+                "(ticker, ex_date, ratio, primary key (ticker, ex_date))"
+            )
+            con.execute(
+                "create table if not exists splits_fetched "
+                "(ticker primary key, fetched_at)"
+            )
+
+    @contextmanager
+    def _connection(self):
+        with self._lock:
+            con = sqlite3.connect(self.filename)
+            try:
+                yield con
+                con.commit()
+            finally:
+                con.close()
+
+    def get(self, ticker: str) -> List[Tuple[str, float]]:
+        # returns (ex_date, ratio) pairs sorted by ex date
+        with self._lock:
+            if self._is_stale(ticker):
+                self.refresh(ticker)
+            with self._connection() as con:
+                return con.execute(
+                    "select ex_date, ratio from splits where ticker=? order by ex_date",
+                    (ticker,),
+                ).fetchall()
+
+    def _is_stale(self, ticker: str) -> bool:
+        with self._connection() as con:
+            row = con.execute(
+                "select fetched_at from splits_fetched where ticker=?", (ticker,)
+            ).fetchone()
+        if row is None:
+            return True
+        if self.max_age is None:
+            return False
+        return datetime.utcnow() - datetime.fromisoformat(row[0]) > self.max_age
+
+    def refresh(self, ticker: str):
+        response = self.fetch_splits(ticker)
+        splits = [
+            (ticker, split["exDate"], split["ratio"])
+            for split in getattr(response, "results", None) or []
+        ]
+        with self._connection() as con:
+            con.execute("delete from splits where ticker=?", (ticker,))
+            con.executemany("insert into splits values (?, ?, ?)", splits)
+            con.execute(
+                "insert or replace into splits_fetched values (?, ?)",
+                (ticker, datetime.utcnow().isoformat()),
+            )
+
+    def export(self, tickers: List[str]) -> Tuple[list, list]:
+        # the stored (ticker, ex_date, ratio) splits and (ticker, fetched_at)
+        # fetch times of some tickers
+        placeholders = ", ".join("?" * len(tickers))
+        with self._connection() as con:
+            splits = con.execute(
+                f"select * from splits where ticker in ({placeholders})", tickers
+            ).fetchall()
+            fetched = con.execute(
+                f"select * from splits_fetched where ticker in ({placeholders})",
+                tickers,
+            ).fetchall()
+        return splits, fetched
+
+    def load(self, splits: list, fetched: list):
+        # stores exported splits for the tickers that have none stored yet
+        with self._connection() as con:
+            known = {row[0] for row in con.execute("select ticker from splits_fetched")}
+            con.executemany(
+                "insert or replace into splits values (?, ?, ?)",
+                [split for split in splits if split[0] not in known],
+            )
+            con.executemany(
+                "insert into splits_fetched values (?, ?)",
+                [row for row in fetched if row[0] not in known],
+            )
+
+
+def _ex_date_ms(ex_date: str) -> int:
+    ex_datetime = EXCHANGE_TIMEZONE.localize(datetime.strptime(ex_date, "%Y-%m-%d"))
+    return int(ex_datetime.timestamp() * 1000)
+
+
+def adjust_for_splits(results: List[dict], splits: List[Tuple[str, float]]) -> list:
+    # bars before a split's ex date are multiplied by its ratio (0.25 for a 4
+    # for 1 split) and their volume divided by it, results must be sorted by t
+    if not splits:
+        return results
+
+    boundaries = [_ex_date_ms(ex_date) for ex_date, _ in splits]
+    # factors[i] is the cumulative ratio of every split after boundary i - 1
+    factors = [1.0] * (len(splits) + 1)
+    for i in range(len(splits) - 1, -1, -1):
+        factors[i] = factors[i + 1] * splits[i][1]
+
+    times = [bar["t"] for bar in results]
+    adjusted = []
+    segment_start = 0
+    for i, boundary in enumerate(boundaries):
+        # bars are sorted so each segment between two ex dates is one slice
+        segment_end = bisect_left(times, boundary, lo=segment_start)
+        adjusted += _scale_bars(results[segment_start:segment_end], factors[i])
+        segment_start = segment_end
+    adjusted += results[segment_start:]
+
+    return adjusted
+
+
+def _scale_bars(bars: List[dict], factor: float) -> List[dict]:
+    if factor == 1:
+        return bars
+    scaled = []
+    for bar in bars:
+        bar = dict(bar)
+        for key in PRICE_KEYS:
+            if key in bar:
+                bar[key] *= factor
+        if "v" in bar:
+            bar["v"] /= factor
+        scaled.append(bar)
+    return scaled
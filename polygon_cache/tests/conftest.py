@@ -0,0 +1,43 @@
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import responses
+
+
+def fake_minute_aggregates_callback(request):
+    # serves one bar at every full hour of every requested day
+    path = request.path_url.split("?")[0].split("/")
+    ticker, from_, to = path[4], path[8], path[9]
+    start = datetime.strptime(from_, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    end = datetime.strptime(to, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    results = []
+    current = start
+    while current < end + timedelta(days=1):
+        t = int(current.timestamp() * 1000)
+        results.append(
+            {"T": ticker, "v": 1, "o": 1, "c": 2, "h": 3, "l": 0, "t": t, "n": 1}
+        )
+        current += timedelta(hours=1)
+
+    body = {
+        "ticker": ticker,
+        "status": "OK",
+        "adjusted": True,
+        "queryCount": len(results),
+        "resultsCount": len(results),
+        "results": results,
+    }
+    return 200, {}, json.dumps(body)
+
+
+@pytest.fixture
+def fake_polygon_aggregates():
+    with responses.RequestsMock() as rsps:
+        rsps.add_callback(
+            responses.GET,
+            re.compile(r"https://api\.polygon\.io/v2/aggs/ticker/.*"),
+            callback=fake_minute_aggregates_callback,
+        )
+        yield rsps
@@ -502,1008 +502,8 @@ AGGREGATES_TEST = {
             "t": 100490,
             "v ": 1049,
         },
-        {
-            "T": "TIC",
-            "c": 105,
-            "h": 110,
-            "l": 95,
-            "n": 5,
-            "o": 100,
-            "t": 100000,
-            "v ": 1000,
-        },
-        {
-            "T": "TIC",
-            "c": 106,
-            "h": 111,
-            "l": 96,
-            "n": 6,
-            "o": 101,
-            "t": 100010,
-            "v ": 1001,
-        },
-        {
-            "T": "TIC",
-            "c": 107,
-            "h": 112,
-            "l": 97,
-            "n": 7,
-            "o": 102,
-            "t": 100020,
-            "v ": 1002,
-        },
-        {
-            "T": "TIC",
-            "c": 108,
-            "h": 113,
-            "l": 98,
-            "n": 8,
-            "o": 103,
-            "t": 100030,
-            "v ": 1003,
-        },
-        {
-            "T": "TIC",
-            "c": 109,
-            "h": 114,
-            "l": 99,
-            "n": 9,
-            "o": 104,
-            "t": 100040,
-            "v ": 1004,
-        },
-        {
-            "T": "TIC",
-            "c": 110,
-            "h": 115,
-            "l": 100,
-            "n": 10,
-            "o": 105,
-            "t": 100050,
-            "v ": 1005,
-        },
-        {
-            "T": "TIC",
-            "c": 111,
-            "h": 116,
-            "l": 101,
-            "n": 11,
-            "o": 106,
-            "t": 100060,
-            "v ": 1006,
-        },
-        {
-            "T": "TIC",
-            "c": 112,
-            "h": 117,
-            "l": 102,
-            "n": 12,
-            "o": 107,
-            "t": 100070,
-            "v ": 1007,
-        },
-        {
-            "T": "TIC",
-            "c": 113,
-            "h": 118,
-            "l": 103,
-            "n": 13,
-            "o": 108,
-            "t": 100080,
-            "v ": 1008,
-        },
-        {
-            "T": "TIC",
-            "c": 114,
-            "h": 119,
-            "l": 104,
-            "n": 14,
-            "o": 109,
-            "t": 100090,
-            "v ": 1009,
-        },
-        {
-            "T": "TIC",
-            "c": 115,
-            "h": 120,
-            "l": 105,
-            "n": 15,
-            "o": 110,
-            "t": 100100,
-            "v ": 1010,
-        },
-        {
-            "T": "TIC",
-            "c": 116,
-            "h": 121,
-            "l": 106,
-            "n": 16,
-            "o": 111,
-            "t": 100110,
-            "v ": 1011,
-        },
-        {
-            "T": "TIC",
-            "c": 117,
-            "h": 122,
-            "l": 107,
-            "n": 17,
-            "o": 112,
-            "t": 100120,
-            "v ": 1012,
-        },
-        {
-            "T": "TIC",
-            "c": 118,
-            "h": 123,
-            "l": 108,
-            "n": 18,
-            "o": 113,
-            "t": 100130,
-            "v ": 1013,
-        },
-        {
-            "T": "TIC",
-            "c": 119,
-            "h": 124,
-            "l": 109,
-            "n": 19,
-            "o": 114,
-            "t": 100140,
-            "v ": 1014,
-        },
-        {
-            "T": "TIC",
-            "c": 120,
-            "h": 125,
-            "l": 110,
-            "n": 20,
-            "o": 115,
-            "t": 100150,
-            "v ": 1015,
-        },
-        {
-            "T": "TIC",
-            "c": 121,
-            "h": 126,
-            "l": 111,
-            "n": 21,
-            "o": 116,
-            "t": 100160,
-            "v ": 1016,
-        },
-        {
-            "T": "TIC",
-            "c": 122,
-            "h": 127,
-            "l": 112,
-            "n": 22,
-            "o": 117,
-            "t": 100170,
-            "v ": 1017,
-        },
-        {
-            "T": "TIC",
-            "c": 123,
-            "h": 128,
-            "l": 113,
-            "n": 23,
-            "o": 118,
-            "t": 100180,
-            "v ": 1018,
-        },
-        {
-            "T": "TIC",
-            "c": 124,
-            "h": 129,
-            "l": 114,
-            "n": 24,
-            "o": 119,
-            "t": 100190,
-            "v ": 1019,
-        },
-        {
-            "T": "TIC",
-            "c": 125,
-            "h": 130,
-            "l": 115,
-            "n": 25,
-            "o": 120,
-            "t": 100200,
-            "v ": 1020,
-        },
-        {
-            "T": "TIC",
-            "c": 126,
-            "h": 131,
-            "l": 116,
-            "n": 26,
-            "o": 121,
-            "t": 100210,
-            "v ": 1021,
-        },
-        {
-            "T": "TIC",
-            "c": 127,
-            "h": 132,
-            "l": 117,
-            "n": 27,
-            "o": 122,
-            "t": 100220,
-            "v ": 1022,
-        },
-        {
-            "T": "TIC",
-            "c": 128,
-            "h": 133,
-            "l": 118,
-            "n": 28,
-            "o": 123,
-            "t": 100230,
-            "v ": 1023,
-        },
-        {
-            "T": "TIC",
-            "c": 129,
-            "h": 134,
-            "l": 119,
-            "n": 29,
-            "o": 124,
-            "t": 100240,
-            "v ": 1024,
-        },
-        {
-            "T": "TIC",
-            "c": 130,
-            "h": 135,
-            "l": 120,
-            "n": 30,
-            "o": 125,
-            "t": 100250,
-            "v ": 1025,
-        },
-        {
-            "T": "TIC",
-            "c": 131,
-            "h": 136,
-            "l": 121,
-            "n": 31,
-            "o": 126,
-            "t": 100260,
-            "v ": 1026,
-        },
-        {
-            "T": "TIC",
-            "c": 132,
-            "h": 137,
-            "l": 122,
-            "n": 32,
-            "o": 127,
-            "t": 100270,
-            "v ": 1027,
-        },
-        {
-            "T": "TIC",
-            "c": 133,
-            "h": 138,
-            "l": 123,
-            "n": 33,
-            "o": 128,
-            "t": 100280,
-            "v ": 1028,
-        },
-        {
-            "T": "TIC",
-            "c": 134,
-            "h": 139,
-            "l": 124,
-            "n": 34,
-            "o": 129,
-            "t": 100290,
-            "v ": 1029,
-        },
-        {
-            "T": "TIC",
-            "c": 135,
-            "h": 140,
-            "l": 125,
-            "n": 35,
-            "o": 130,
-            "t": 100300,
-            "v ": 1030,
-        },
-        {
-            "T": "TIC",
-            "c": 136,
-            "h": 141,
-            "l": 126,
-            "n": 36,
-            "o": 131,
-            "t": 100310,
-            "v ": 1031,
-        },
-        {
-            "T": "TIC",
-            "c": 137,
-            "h": 142,
-            "l": 127,
-            "n": 37,
-            "o": 132,
-            "t": 100320,
-            "v ": 1032,
-        },
-        {
-            "T": "TIC",
-            "c": 138,
-            "h": 143,
-            "l": 128,
-            "n": 38,
-            "o": 133,
-            "t": 100330,
-            "v ": 1033,
-        },
-        {
-            "T": "TIC",
-            "c": 139,
-            "h": 144,
-            "l": 129,
-            "n": 39,
-            "o": 134,
-            "t": 100340,
-            "v ": 1034,
-        },
-        {
-            "T": "TIC",
-            "c": 140,
-            "h": 145,
-            "l": 130,
-            "n": 40,
-            "o": 135,
-            "t": 100350,
-            "v ": 1035,
-        },
-        {
-            "T": "TIC",
-            "c": 141,
-            "h": 146,
-            "l": 131,
-            "n": 41,
-            "o": 136,
-            "t": 100360,
-            "v ": 1036,
-        },
-        {
-            "T": "TIC",
-            "c": 142,
-            "h": 147,
-            "l": 132,
-            "n": 42,
-            "o": 137,
-            "t": 100370,
-            "v ": 1037,
-        },
-        {
-            "T": "TIC",
-            "c": 143,
-            "h": 148,
-            "l": 133,
-            "n": 43,
-            "o": 138,
-            "t": 100380,
-            "v ": 1038,
-        },
-        {
-            "T": "TIC",
-            "c": 144,
-            "h": 149,
-            "l": 134,
-            "n": 44,
-            "o": 139,
-            "t": 100390,
-            "v ": 1039,
-        },
-        {
-            "T": "TIC",
-            "c": 145,
-            "h": 150,
-            "l": 135,
-            "n": 45,
-            "o": 140,
-            "t": 100400,
-            "v ": 1040,
-        },
-        {
-            "T": "TIC",
-            "c": 146,
-            "h": 151,
-            "l": 136,
-            "n": 46,
-            "o": 141,
-            "t": 100410,
-            "v ": 1041,
-        },
-        {
-            "T": "TIC",
-            "c": 147,
-            "h": 152,
-            "l": 137,
-            "n": 47,
-            "o": 142,
-            "t": 100420,
-            "v ": 1042,
-        },
-        {
-            "T": "TIC",
-            "c": 148,
-            "h": 153,
-            "l": 138,
-            "n": 48,
-            "o": 143,
-            "t": 100430,
-            "v ": 1043,
-        },
-        {
-            "T": "TIC",
-            "c": 149,
-            "h": 154,
-            "l": 139,
-            "n": 49,
-            "o": 144,
-            "t": 100440,
-            "v ": 1044,
-        },
-        {
-            "T": "TIC",
-            "c": 150,
-            "h": 155,
-            "l": 140,
-            "n": 50,
-            "o": 145,
-            "t": 100450,
-            "v ": 1045,
-        },
-        {
-            "T": "TIC",
-            "c": 151,
-            "h": 156,
-            "l": 141,
-            "n": 51,
-            "o": 146,
-            "t": 100460,
-            "v ": 1046,
-        },
-        {
-            "T": "TIC",
-            "c": 152,
-            "h": 157,
-            "l": 142,
-            "n": 52,
-            "o": 147,
-            "t": 100470,
-            "v ": 1047,
-        },
-        {
-            "T": "TIC",
-            "c": 153,
-            "h": 158,
-            "l": 143,
-            "n": 53,
-            "o": 148,
-            "t": 100480,
-            "v ": 1048,
-        },
-        {
-            "T": "TIC",
-            "c": 154,
-            "h": 159,
-            "l": 144,
-            "n": 54,
-            "o": 149,
-            "t": 100490,
-            "v ": 1049,
-        },
-        {
-            "T": "TIC",
-            "c": 105,
-            "h": 110,
-            "l": 95,
-            "n": 5,
-            "o": 100,
-            "t": 100000,
-            "v ": 1000,
-        },
-        {
-            "T": "TIC",
-            "c": 106,
-            "h": 111,
-            "l": 96,
-            "n": 6,
-            "o": 101,
-            "t": 100010,
-            "v ": 1001,
-        },
-        {
-            "T": "TIC",
-            "c": 107,
-            "h": 112,
-            "l": 97,
-            "n": 7,
-            "o": 102,
-            "t": 100020,
-            "v ": 1002,
-        },
-        {
-            "T": "TIC",
-            "c": 108,
-            "h": 113,
-            "l": 98,
-            "n": 8,
-            "o": 103,
-            "t": 100030,
-            "v ": 1003,
-        },
-        {
-            "T": "TIC",
-            "c": 109,
-            "h": 114,
-            "l": 99,
-            "n": 9,
-            "o": 104,
-            "t": 100040,
-            "v ": 1004,
-        },
-        {
-            "T": "TIC",
-            "c": 110,
-            "h": 115,
-            "l": 100,
-            "n": 10,
-            "o": 105,
-            "t": 100050,
-            "v ": 1005,
-        },
-        {
-            "T": "TIC",
-            "c": 111,
-            "h": 116,
-            "l": 101,
-            "n": 11,
-            "o": 106,
-            "t": 100060,
-            "v ": 1006,
-        },
-        {
-            "T": "TIC",
-            "c": 112,
-            "h": 117,
-            "l": 102,
-            "n": 12,
-            "o": 107,
-            "t": 100070,
-            "v ": 1007,
-        },
-        {
-            "T": "TIC",
-            "c": 113,
-            "h": 118,
-            "l": 103,
-            "n": 13,
-            "o": 108,
-            "t": 100080,
-            "v ": 1008,
-        },
-        {
-            "T": "TIC",
-            "c": 114,
-            "h": 119,
-            "l": 104,
-            "n": 14,
-            "o": 109,
-            "t": 100090,
-            "v ": 1009,
-        },
-        {
-            "T": "TIC",
-            "c": 115,
-            "h": 120,
-            "l": 105,
-            "n": 15,
-            "o": 110,
-            "t": 100100,
-            "v ": 1010,
-        },
-        {
-            "T": "TIC",
-            "c": 116,
-            "h": 121,
-            "l": 106,
-            "n": 16,
-            "o": 111,
-            "t": 100110,
-            "v ": 1011,
-        },
-        {
-            "T": "TIC",
-            "c": 117,
-            "h": 122,
-            "l": 107,
-            "n": 17,
-            "o": 112,
-            "t": 100120,
-            "v ": 1012,
-        },
-        {
-            "T": "TIC",
-            "c": 118,
-            "h": 123,
-            "l": 108,
-            "n": 18,
-            "o": 113,
-            "t": 100130,
-            "v ": 1013,
-        },
-        {
-            "T": "TIC",
-            "c": 119,
-            "h": 124,
-            "l": 109,
-            "n": 19,
-            "o": 114,
-            "t": 100140,
-            "v ": 1014,
-        },
-        {
-            "T": "TIC",
-            "c": 120,
-            "h": 125,
-            "l": 110,
-            "n": 20,
-            "o": 115,
-            "t": 100150,
-            "v ": 1015,
-        },
-        {
-            "T": "TIC",
-            "c": 121,
-            "h": 126,
-            "l": 111,
-            "n": 21,
-            "o": 116,
-            "t": 100160,
-            "v ": 1016,
-        },
-        {
-            "T": "TIC",
-            "c": 122,
-            "h": 127,
-            "l": 112,
-            "n": 22,
-            "o": 117,
-            "t": 100170,
-            "v ": 1017,
-        },
-        {
-            "T": "TIC",
-            "c": 123,
-            "h": 128,
-            "l": 113,
-            "n": 23,
-            "o": 118,
-            "t": 100180,
-            "v ": 1018,
-        },
-        {
-            "T": "TIC",
-            "c": 124,
-            "h": 129,
-            "l": 114,
-            "n": 24,
-            "o": 119,
-            "t": 100190,
-            "v ": 1019,
-        },
-        {
-            "T": "TIC",
-            "c": 125,
-            "h": 130,
-            "l": 115,
-            "n": 25,
-            "o": 120,
-            "t": 100200,
-            "v ": 1020,
-        },
-        {
-            "T": "TIC",
-            "c": 126,
-            "h": 131,
-            "l": 116,
-            "n": 26,
-            "o": 121,
-            "t": 100210,
-            "v ": 1021,
-        },
-        {
-            "T": "TIC",
-            "c": 127,
-            "h": 132,
-            "l": 117,
-            "n": 27,
-            "o": 122,
-            "t": 100220,
-            "v ": 1022,
-        },
-        {
-            "T": "TIC",
-            "c": 128,
-            "h": 133,
-            "l": 118,
-            "n": 28,
-            "o": 123,
-            "t": 100230,
-            "v ": 1023,
-        },
-        {
-            "T": "TIC",
-            "c": 129,
-            "h": 134,
-            "l": 119,
-            "n": 29,
-            "o": 124,
-            "t": 100240,
-            "v ": 1024,
-        },
-        {
-            "T": "TIC",
-            "c": 130,
-            "h": 135,
-            "l": 120,
-            "n": 30,
-            "o": 125,
-            "t": 100250,
-            "v ": 1025,
-        },
-        {
-            "T": "TIC",
-            "c": 131,
-            "h": 136,
-            "l": 121,
-            "n": 31,
-            "o": 126,
-            "t": 100260,
-            "v ": 1026,
-        },
-        {
-            "T": "TIC",
-            "c": 132,
-            "h": 137,
-            "l": 122,
-            "n": 32,
-            "o": 127,
-            "t": 100270,
-            "v ": 1027,
-        },
-        {
-            "T": "TIC",
-            "c": 133,
-            "h": 138,
-            "l": 123,
-            "n": 33,
-            "o": 128,
-            "t": 100280,
-            "v ": 1028,
-        },
-        {
-            "T": "TIC",
-            "c": 134,
-            "h": 139,
-            "l": 124,
-            "n": 34,
-            "o": 129,
-            "t": 100290,
-            "v ": 1029,
-        },
-        {
-            "T": "TIC",
-            "c": 135,
-            "h": 140,
-            "l": 125,
-            "n": 35,
-            "o": 130,
-            "t": 100300,
-            "v ": 1030,
-        },
-        {
-            "T": "TIC",
-            "c": 136,
-            "h": 141,
-            "l": 126,
-            "n": 36,
-            "o": 131,
-            "t": 100310,
-            "v ": 1031,
-        },
-        {
-            "T": "TIC",
-            "c": 137,
-            "h": 142,
-            "l": 127,
-            "n": 37,
-            "o": 132,
-            "t": 100320,
-            "v ": 1032,
-        },
-        {
-            "T": "TIC",
-            "c": 138,
-            "h": 143,
-            "l": 128,
-            "n": 38,
-            "o": 133,
-            "t": 100330,
-            "v ": 1033,
-        },
-        {
-            "T": "TIC",
-            "c": 139,
-            "h": 144,
-            "l": 129,
-            "n": 39,
-            "o": 134,
-            "t": 100340,
-            "v ": 1034,
-        },
-        {
-            "T": "TIC",
-            "c": 140,
-            "h": 145,
-            "l": 130,
-            "n": 40,
-            "o": 135,
-            "t": 100350,
-            "v ": 1035,
-        },
-        {
-            "T": "TIC",
-            "c": 141,
-            "h": 146,
-            "l": 131,
-            "n": 41,
-            "o": 136,
-            "t": 100360,
-            "v ": 1036,
-        },
-        {
-            "T": "TIC",
-            "c": 142,
-            "h": 147,
-            "l": 132,
-            "n": 42,
-            "o": 137,
-            "t": 100370,
-            "v ": 1037,
-        },
-        {
-            "T": "TIC",
-            "c": 143,
-            "h": 148,
-            "l": 133,
-            "n": 43,
-            "o": 138,
-            "t": 100380,
-            "v ": 1038,
-        },
-        {
-            "T": "TIC",
-            "c": 144,
-            "h": 149,
-            "l": 134,
-            "n": 44,
-            "o": 139,
-            "t": 100390,
-            "v ": 1039,
-        },
-        {
-            "T": "TIC",
-            "c": 145,
-            "h": 150,
-            "l": 135,
-            "n": 45,
-            "o": 140,
-            "t": 100400,
-            "v ": 1040,
-        },
-        {
-            "T": "TIC",
-            "c": 146,
-            "h": 151,
-            "l": 136,
-            "n": 46,
-            "o": 141,
-            "t": 100410,
-            "v ": 1041,
-        },
-        {
-            "T": "TIC",
-            "c": 147,
-            "h": 152,
-            "l": 137,
-            "n": 47,
-            "o": 142,
-            "t": 100420,
-            "v ": 1042,
-        },
-        {
-            "T": "TIC",
-            "c": 148,
-            "h": 153,
-            "l": 138,
-            "n": 48,
-            "o": 143,
-            "t": 100430,
-            "v ": 1043,
-        },
-        {
-            "T": "TIC",
-            "c": 149,
-            "h": 154,
-            "l": 139,
-            "n": 49,
-            "o": 144,
-            "t": 100440,
-            "v ": 1044,
-        },
-        {
-            "T": "TIC",
-            "c": 150,
-            "h": 155,
-            "l": 140,
-            "n": 50,
-            "o": 145,
-            "t": 100450,
-            "v ": 1045,
-        },
-        {
-            "T": "TIC",
-            "c": 151,
-            "h": 156,
-            "l": 141,
-            "n": 51,
-            "o": 146,
-            "t": 100460,
-            "v ": 1046,
-        },
-        {
-            "T": "TIC",
-            "c": 152,
-            "h": 157,
-            "l": 142,
-            "n": 52,
-            "o": 147,
-            "t": 100470,
-            "v ": 1047,
-        },
-        {
-            "T": "TIC",
-            "c": 153,
-            "h": 158,
-            "l": 143,
-            "n": 53,
-            "o": 148,
-            "t": 100480,
-            "v ": 1048,
-        },
-        {
-            "T": "TIC",
-            "c": 154,
-            "h": 159,
-            "l": 144,
-            "n": 54,
-            "o": 149,
-            "t": 100490,
-            "v ": 1049,
-        },
     ],
-    "resultsCount": 150,
+    "resultsCount": 50,
     "status": "OK",
     "ticker": "TIC",
 }
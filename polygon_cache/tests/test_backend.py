@@ -0,0 +1,68 @@
+from datetime import date
+
+import pytest
+
+from polygon_cache.backend import describe_url, gaps
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        (
+            "https://api.polygon.io/v2/aggs/ticker/TIC/range/5/minute/2020-01-01"
+            "/2020-01-06?apiKey=key&unadjusted=true",
+            {
+                "endpoint": "aggregates",
+                "ticker": "TIC",
+                "multiplier": 5,
+                "timespan": "minute",
+                "from_date": "2020-01-01",
+                "to_date": "2020-01-06",
+                "adjusted": False,
+            },
+        ),
+        (
+            "https://api.polygon.io/v2/ticks/stocks/nbbo/TIC/2020-01-02?limit=50000",
+            {
+                "endpoint": "quotes",
+                "ticker": "TIC",
+                "from_date": "2020-01-02",
+                "to_date": "2020-01-02",
+            },
+        ),
+        (
+            "https://api.polygon.io/v2/reference/splits/TIC?apiKey=key",
+            {"endpoint": "/v2/reference/splits/TIC"},
+        ),
+    ],
+)
+def test_describe_url(url, expected):
+    assert describe_url(url) == expected
+
+
+@pytest.mark.parametrize(
+    "intervals,expected",
+    [
+        ([], [(date(2020, 1, 1), date(2020, 1, 31))]),
+        ([(date(2019, 12, 1), date(2020, 2, 1))], []),
+        (
+            [
+                (date(2020, 1, 5), date(2020, 1, 10)),
+                (date(2020, 1, 20), date(2020, 2, 1)),
+            ],
+            [
+                (date(2020, 1, 1), date(2020, 1, 4)),
+                (date(2020, 1, 11), date(2020, 1, 19)),
+            ],
+        ),
+        (
+            [
+                (date(2019, 1, 1), date(2019, 1, 2)),
+                (date(2020, 1, 1), date(2020, 1, 30)),
+            ],
+            [(date(2020, 1, 31), date(2020, 1, 31))],
+        ),
+    ],
+)
+def test_gaps(intervals, expected):
+    assert gaps(intervals, date(2020, 1, 1), date(2020, 1, 31)) == expected
@@ -0,0 +1,117 @@
+import re
+import tracemalloc
+from array import array
+
+import pytest
+import responses
+
+from polygon_cache.bars import Bars, compact_bars
+from polygon_cache.cache import CachedRESTClient
+from polygon_cache.lazy import LazyResults
+
+RESULTS = [
+    {"T": "TIC", "v ": 1000, "o": 100, "c": 105.5, "t": 100000, "n": 5},
+    {"T": "TIC", "v ": 1001, "o": 101, "c": 106, "t": 100010},
+    {"T": "TIC", "v ": 1002.5, "o": 102, "c": 107, "t": 100020, "n": 7},
+]
+
+
+def test_bars():
+    bars = compact_bars(RESULTS)
+
+    assert len(bars) == 3
+    assert bars == RESULTS
+    assert bars.to_dicts() == RESULTS
+    assert (bars[0].c, bars[0]["t"], bars[-1].T, bars[2]["v "]) == (
+        105.5,
+        100000,
+        "TIC",
+        1002.5,
+    )
+    assert dict(bars[1]) == RESULTS[1]
+    assert "n" in bars[0] and "n" not in bars[1]
+    assert bars[1].get("n") is None
+    with pytest.raises(KeyError):
+        bars[1]["n"]
+    with pytest.raises(AttributeError):
+        bars[1].vw
+    with pytest.raises(IndexError):
+        bars[3]
+    assert bars[1:] == RESULTS[1:]
+    assert bars[::-2] == RESULTS[::-2]
+
+
+def test_bars_columns():
+    bars = compact_bars(RESULTS)
+
+    assert bars.column("t") == array("q", [100000, 100010, 100020])
+    assert bars.column("c") == array("d", [105.5, 106, 107])
+    assert bars.column("T") == ["TIC"] * 3
+    assert type(bars[0].o) is int
+    assert len(compact_bars([])) == 0
+
+
+def test_bars_memory():
+    results = [
+        {"v": i, "vw": i / 3, "o": i / 7, "c": i / 5, "h": i / 2, "l": i / 9, "t": i}
+        for i in range(10_000)
+    ]
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        dicts = [dict(result) for result in results]
+        dicts_size = tracemalloc.get_traced_memory()[0] - before
+        del dicts
+        before = tracemalloc.get_traced_memory()[0]
+        bars = compact_bars(results)
+        bars_size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    assert len(bars) == 10_000
+    assert bars_size * 3 < dicts_size
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_compact_aggregates(tmpdir, fake_polygon_aggregates, lazy):
+    client = CachedRESTClient(
+        "api_key", cache_location=str(tmpdir.join("polygon-cache"))
+    )
+    expected = client.stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+
+    response = client.stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-14", lazy=lazy, compact=True
+    )
+
+    assert isinstance(response.results, LazyResults if lazy else Bars)
+    assert response.results == expected.results
+    assert response.results[-1].t == expected.results[-1]["t"]
+    assert response.resultsCount == 14 * 24
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_compact_split_adjusted_aggregates(tmpdir, fake_polygon_aggregates, lazy):
+    fake_polygon_aggregates.add(
+        responses.GET,
+        re.compile(r"https://api\.polygon\.io/v2/reference/splits/TIC.*"),
+        json={
+            "status": "OK",
+            "count": 1,
+            "results": [{"ticker": "TIC", "exDate": "2020-06-03", "ratio": 0.5}],
+        },
+    )
+    client = CachedRESTClient(
+        "api_key",
+        cache_location=str(tmpdir.join("polygon-cache")),
+        local_split_adjustment=True,
+    )
+
+    adjusted = client.stocks_equities_aggregates(
+        "TIC", 1, "day", "2020-06-01", "2020-06-04", lazy=lazy, compact=True
+    )
+
+    assert [bar.c for bar in adjusted.results[:2]] == [1, 1]
+    assert [bar.v for bar in adjusted.results[:2]] == [2, 2]
+    assert adjusted.results[-1].c == 2
@@ -0,0 +1,33 @@
+import json
+
+from benchmarks.fake_polygon import FakePolygon, fake_client
+from benchmarks.run import BENCHMARKS, main
+
+
+def test_fake_polygon_rate_limits(tmpdir):
+    with FakePolygon(bars_per_day=10, rate_limit_every=3) as server:
+        client = fake_client(server, str(tmpdir.join("polygon-cache")))
+        response = client.stocks_equities_aggregates(
+            "AAA", 1, "minute", "2020-06-01", "2020-06-14", max_threads=1
+        )
+
+    assert response.resultsCount == 14 * 10
+    assert server.rate_limited == 1
+    assert server.requests == 4
+    assert client.metrics.total("polygon_cache_retries_total") == 1
+
+
+def test_benchmarks_against_baselines(tmpdir):
+    baselines = str(tmpdir.join("baselines.json"))
+    options = ["--scale", "0.01", "--latency", "0", "--repeat", "1"]
+
+    assert main(options + ["--baselines", baselines, "--save"]) == 0
+    with open(baselines) as file:
+        stored = json.load(file)
+    assert set(stored["benchmarks"]) == set(BENCHMARKS)
+
+    for result in stored["benchmarks"].values():
+        result["rate"] *= 1000
+    with open(baselines, "w") as file:
+        json.dump(stored, file)
+    assert main(options + ["--baselines", baselines, "--only", "combine"]) == 1
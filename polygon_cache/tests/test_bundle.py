@@ -0,0 +1,85 @@
+import pytest
+
+from polygon_cache import cli
+from polygon_cache.bundle import Bundle, export_bundle
+from polygon_cache.cache import CachedRESTClient, CacheMissError
+
+
+@pytest.fixture
+def source(tmpdir, fake_polygon_aggregates):
+    client = CachedRESTClient("api_key", cache_location=str(tmpdir.join("source")))
+    for ticker in ("AAA", "BBB"):
+        client.stocks_equities_aggregates(ticker, 1, "day", "2020-06-01", "2020-06-14")
+        client.stocks_equities_aggregates(
+            ticker, 1, "minute", "2020-06-01", "2020-06-14"
+        )
+    client.splits.load([("AAA", "2020-06-03", 0.25)], [("AAA", "2020-06-15")])
+    return client
+
+
+def test_export_selects_tickers_timespans_and_dates(source, tmpdir):
+    bundle_file = str(tmpdir.join("snapshot.bundle"))
+
+    exported = export_bundle(
+        source, bundle_file, ["AAA"], [(1, "minute")], "2020-06-08", "2020-06-14"
+    )
+
+    urls = Bundle(bundle_file).urls()
+    assert exported == len(urls) == 2
+    assert all("/AAA/range/1/minute/" in url for url in urls)
+    assert not any("apiKey" in url for url in urls)
+    assert Bundle(bundle_file).splits() == (
+        [("AAA", "2020-06-03", 0.25)],
+        [("AAA", "2020-06-15")],
+    )
+
+
+def test_mount_bundle_offline(source, tmpdir, fake_polygon_aggregates):
+    bundle_file = str(tmpdir.join("snapshot.bundle"))
+    export_bundle(source, bundle_file, ["AAA"])
+    calls = len(fake_polygon_aggregates.calls)
+
+    client = CachedRESTClient(
+        "other_key",
+        cache_location=str(tmpdir.join("ci")),
+        mode="offline",
+        local_split_adjustment=False,
+        bundles=[bundle_file],
+    )
+
+    for timespan in ("day", "minute"):
+        assert (
+            client.stocks_equities_aggregates(
+                "AAA", 1, timespan, "2020-06-01", "2020-06-14"
+            ).results
+            == source.stocks_equities_aggregates(
+                "AAA", 1, timespan, "2020-06-01", "2020-06-14"
+            ).results
+        )
+    with pytest.raises(CacheMissError):
+        client.stocks_equities_aggregates("BBB", 1, "day", "2020-06-01", "2020-06-14")
+    assert len(fake_polygon_aggregates.calls) == calls
+    assert client.splits.get("AAA") == [("2020-06-03", 0.25)]
+    assert client.cache.entries() == []
+
+
+def test_export_and_import_cli(source, tmpdir, fake_polygon_aggregates, capsys):
+    bundle_file = str(tmpdir.join("snapshot.bundle"))
+    tickers_file = tmpdir.join("tickers.txt")
+    tickers_file.write("AAA\nBBB\n")
+    cache_location = str(tmpdir.join("sharded"))
+    calls = len(fake_polygon_aggregates.calls)
+
+    for command in (
+        ["--cache-location", source.cache.filename[: -len(".sqlite")], "export"]
+        + [bundle_file, str(tickers_file), "--timespan", "day"],
+        ["--cache-location", cache_location, "--shards", "4", "import", bundle_file],
+    ):
+        assert cli.main(["--api-key", "api_key"] + command) == 0
+
+    assert "imported 2 responses" in capsys.readouterr().out
+    client = CachedRESTClient("api_key", cache_location=cache_location)
+    for ticker in ("AAA", "BBB"):
+        client.stocks_equities_aggregates(ticker, 1, "day", "2020-06-01", "2020-06-14")
+    assert len(fake_polygon_aggregates.calls) == calls
+    assert len(client.cache.entries()) == 2
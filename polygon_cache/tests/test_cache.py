@@ -1,13 +1,27 @@
+import json
 import os
-from datetime import datetime
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from urllib.parse import parse_qsl, urlparse
 
 import pytest
 import requests
 import responses
 from polygon import RESTClient
-from polygon.rest.models import StocksEquitiesAggregatesApiResponse
+from polygon.rest.models import (
+    HistoricTradesV2ApiResponse,
+    StocksEquitiesAggregatesApiResponse,
+)
 
-from polygon_cache.cache import CachedRESTClient
+from polygon_cache import backend
+from polygon_cache.cache import (
+    EQUITIES_CHUNK_DAYS,
+    CachedRESTClient,
+    CacheMissError,
+)
 from polygon_cache.tests import expected_values
 
 
@@ -216,3 +230,626 @@ def test_combine_aggregate_results_combined(create_client, empty_class):
     )
 
     assert combined.stuff == [1, "thing", {"hello": "hi"}]
+
+
+def test_resample_from_cached_minutes(tmpdir, fake_polygon_aggregates):
+    temp = str(tmpdir.join("polygon-cache"))
+    client = CachedRESTClient("api_key", cache_location=temp, resample_from_cache=True)
+    client.stocks_equities_aggregates("TIC", 1, "minute", "2020-06-01", "2020-06-14")
+    minute_calls = len(fake_polygon_aggregates.calls)
+
+    daily = client.stocks_equities_aggregates(
+        "TIC", 1, "day", "2020-06-01", "2020-06-14"
+    )
+
+    assert len(fake_polygon_aggregates.calls) == minute_calls
+    assert daily.resultsCount == len(daily.results) == 15
+    assert [bar["v"] for bar in daily.results[1:-1]] == [24] * 13
+
+
+def test_resample_from_cache_disabled(tmpdir, fake_polygon_aggregates):
+    temp = str(tmpdir.join("polygon-cache"))
+    client = CachedRESTClient("api_key", cache_location=temp)
+    client.stocks_equities_aggregates("TIC", 1, "minute", "2020-06-01", "2020-06-14")
+    minute_calls = len(fake_polygon_aggregates.calls)
+
+    client.stocks_equities_aggregates("TIC", 1, "day", "2020-06-01", "2020-06-14")
+
+    assert len(fake_polygon_aggregates.calls) == minute_calls + 1
+
+
+def test_local_split_adjustment(tmpdir, fake_polygon_aggregates):
+    fake_polygon_aggregates.add(
+        responses.GET,
+        re.compile(r"https://api\.polygon\.io/v2/reference/splits/TIC.*"),
+        json={
+            "status": "OK",
+            "count": 1,
+            "results": [{"ticker": "TIC", "exDate": "2020-06-03", "ratio": 0.5}],
+        },
+    )
+    temp = str(tmpdir.join("polygon-cache"))
+    client = CachedRESTClient(
+        "api_key", cache_location=temp, local_split_adjustment=True
+    )
+
+    adjusted = client.stocks_equities_aggregates(
+        "TIC", 1, "day", "2020-06-01", "2020-06-04"
+    )
+    unadjusted = client.stocks_equities_aggregates(
+        "TIC", 1, "day", "2020-06-01", "2020-06-04", unadjusted=True
+    )
+
+    aggregate_calls = [
+        call for call in fake_polygon_aggregates.calls if "/aggs/" in call.request.url
+    ]
+    assert len(aggregate_calls) == 1
+    assert "unadjusted=true" in aggregate_calls[0].request.url
+    assert adjusted.adjusted is True
+    assert [bar["c"] for bar in adjusted.results[:2]] == [1, 1]
+    assert [bar["v"] for bar in adjusted.results[:2]] == [2, 2]
+    assert adjusted.results[-1]["c"] == 2
+    assert [bar["c"] for bar in unadjusted.results[:2]] == [2, 2]
+
+
+def test_resample_split_adjusted_week(tmpdir, fake_polygon_aggregates):
+    fake_polygon_aggregates.add(
+        responses.GET,
+        re.compile(r"https://api\.polygon\.io/v2/reference/splits/TIC.*"),
+        json={
+            "status": "OK",
+            "count": 1,
+            "results": [{"ticker": "TIC", "exDate": "2020-06-03", "ratio": 0.5}],
+        },
+    )
+    client = CachedRESTClient(
+        "api_key",
+        cache_location=str(tmpdir.join("polygon-cache")),
+        local_split_adjustment=True,
+        resample_from_cache=True,
+    )
+    daily = client.stocks_equities_aggregates(
+        "TIC", 1, "day", "2020-06-01", "2020-06-05"
+    )
+    calls = len(fake_polygon_aggregates.calls)
+
+    weekly = client.stocks_equities_aggregates(
+        "TIC", 1, "week", "2020-06-01", "2020-06-05"
+    )
+
+    assert len(fake_polygon_aggregates.calls) == calls
+    assert weekly.adjusted is True
+    assert len(weekly.results) == 1
+    # the week spans the split, so its bars are adjusted before they're combined
+    assert weekly.results[0]["c"] == daily.results[-1]["c"] == 2
+    assert weekly.results[0]["h"] == max(bar["h"] for bar in daily.results) == 3
+    assert weekly.results[0]["v"] == sum(bar["v"] for bar in daily.results)
+
+
+def fake_ticks_callback(request):
+    # 7 trades a day where the third and fourth share a timestamp
+    ticker, date = request.path_url.split("?")[0].split("/")[5:7]
+    query = dict(parse_qsl(urlparse(request.url).query))
+    day_start = int(datetime.strptime(date, "%Y-%m-%d").timestamp()) * 10**9
+    ticks = [
+        {"t": day_start + offset, "q": sequence, "p": 100, "s": 1}
+        for sequence, offset in enumerate([1, 2, 3, 3, 4, 5, 6])
+    ]
+    timestamp = int(query.get("timestamp", 0))
+    page = [tick for tick in ticks if tick["t"] >= timestamp][: int(query["limit"])]
+    body = {
+        "ticker": ticker,
+        "results_count": len(page),
+        "db_latency": 1,
+        "success": True,
+        "map": {"p": "price", "q": "sequence_number"},
+        "results": page,
+    }
+    return 200, {}, json.dumps(body)
+
+
+@pytest.fixture
+def fake_polygon_ticks():
+    with responses.RequestsMock() as rsps:
+        rsps.add_callback(
+            responses.GET,
+            re.compile(r"https://api\.polygon\.io/v2/ticks/stocks/.*"),
+            callback=fake_ticks_callback,
+        )
+        yield rsps
+
+
+def test_historic_trades_pagination(create_client, fake_polygon_ticks):
+    trades = create_client.historic_trades_v2("TIC", "2020-06-04", limit=3)
+
+    assert [trade["q"] for trade in trades.results] == list(range(7))
+    assert trades.results_count == 7
+    assert len(fake_polygon_ticks.calls) == 4
+    assert trades.success is True
+    assert trades.map == {"p": "price", "q": "sequence_number"}
+
+
+def test_historic_trades_limit_is_clamped(create_client, fake_polygon_ticks, mocker):
+    mocker.patch("polygon_cache.cache.TICK_PAGE_LIMIT", 3)
+
+    trades = create_client.historic_trades_v2("TIC", "2020-06-04", limit=100)
+
+    assert [trade["q"] for trade in trades.results] == list(range(7))
+    assert "limit=3" in fake_polygon_ticks.calls[0].request.url
+
+
+def test_historic_quotes_range_skips_weekends_and_caches(
+    create_client, fake_polygon_ticks
+):
+    quotes = create_client.historic_n___bbo_quotes_v2_range(
+        "TIC", "2020-06-05", "2020-06-08"
+    )
+    calls = len(fake_polygon_ticks.calls)
+    create_client.historic_n___bbo_quotes_v2_range("TIC", "2020-06-05", "2020-06-08")
+
+    assert calls == 2
+    assert len(fake_polygon_ticks.calls) == calls
+    assert quotes.results_count == len(quotes.results) == 14
+    assert quotes.ticker == "TIC"
+    assert quotes.success is True
+
+
+@pytest.mark.parametrize(
+    "from_,to", [("2020-06-06", "2020-06-07"), ("2020-06-09", "2020-06-08")]
+)
+@responses.activate
+def test_historic_trades_range_without_weekdays(create_client, from_, to):
+    trades = create_client.historic_trades_v2_range("TIC", from_, to)
+
+    assert isinstance(trades, HistoricTradesV2ApiResponse)
+    assert trades.ticker == "TIC"
+    assert trades.results == []
+    assert trades.results_count == 0
+    assert len(responses.calls) == 0
+
+
+@pytest.mark.parametrize(
+    "url,expected_filter_response",
+    [
+        ("https://api.polygon.io/v2/ticks/stocks/trades/TIC/2020-01-15", True),
+        ("https://api.polygon.io/v2/ticks/stocks/nbbo/TIC/2020-01-17?limit=5", False),
+    ],
+)
+def test_cache_filter_url_date(url, expected_filter_response, freezer):
+    freezer.move_to("2020-01-17")
+    assert CachedRESTClient._filter_by_url_date(url) is expected_filter_response
+
+
+@pytest.mark.parametrize(
+    "method,timespan,expected_calls",
+    [
+        ("stocks_equities_aggregates", "minute", 3),
+        ("crypto_aggregates", "minute", 5),
+        ("forex_currencies_aggregates", "minute", 5),
+        ("crypto_aggregates", "hour", 1),
+        ("crypto_aggregates", "day", 1),
+    ],
+)
+def test_round_the_clock_aggregates_chunking(
+    create_client, fake_polygon_aggregates, method, timespan, expected_calls
+):
+    response = getattr(create_client, method)(
+        "X:BTCUSD", 1, timespan, "2020-06-01", "2020-06-14"
+    )
+
+    assert len(fake_polygon_aggregates.calls) == expected_calls
+    assert response.ticker == "X:BTCUSD"
+    assert response.resultsCount == 14 * 24
+
+
+@pytest.mark.parametrize(
+    "chunks,expected_timestamps",
+    [
+        ([[1, 2], [3, 4], [5]], [1, 2, 3, 4, 5]),
+        ([[1, 2, 3], [3, 4], [4, 5]], [1, 2, 3, 4, 5]),
+        ([[3, 4], [1, 2]], [1, 2, 3, 4]),
+        ([[1, 5], [2, 3, 4]], [1, 2, 3, 4, 5]),
+        ([[2, 1], [], [3]], [1, 2, 3]),
+        ([[1, 1, 2], [3]], [1, 2, 3]),
+        ([[2, 1, 2], [2, 3]], [1, 2, 3]),
+        ([], []),
+    ],
+)
+def test_merge_sorted_results(chunks, expected_timestamps):
+    merged = CachedRESTClient._merge_sorted_results(
+        [[{"t": t} for t in chunk] for chunk in chunks]
+    )
+    assert [result["t"] for result in merged] == expected_timestamps
+
+
+def test_merge_sorted_results_keeps_earliest_chunk():
+    merged = CachedRESTClient._merge_sorted_results(
+        [[{"t": 1, "c": "first"}], [{"t": 1, "c": "second"}, {"t": 2, "c": "x"}]]
+    )
+    assert merged == [{"t": 1, "c": "first"}, {"t": 2, "c": "x"}]
+
+
+def test_combine_aggregate_results_merged(create_client, empty_class):
+    client = create_client
+    combined = client._combine_aggregate_results(
+        [empty_class(results=[{"t": 1}, {"t": 2}]), empty_class()],
+        [],
+        [],
+        [],
+        empty_class,
+        merged_attrs=("results",),
+    )
+
+    assert combined.results == [{"t": 1}, {"t": 2}]
+
+
+def test_cache_coverage(create_client, fake_polygon_aggregates):
+    client = create_client
+    client.stocks_equities_aggregates("TIC", 1, "minute", "2020-06-01", "2020-06-14")
+    client.stocks_equities_aggregates("TIC", 1, "minute", "2020-07-01", "2020-07-03")
+    client.stocks_equities_aggregates("TIC", 1, "day", "2020-01-01", "2020-12-31")
+
+    assert client.cache.coverage("TIC", multiplier=1, timespan="minute") == [
+        (date(2020, 6, 1), date(2020, 6, 14)),
+        (date(2020, 7, 1), date(2020, 7, 3)),
+    ]
+    assert client.cache.coverage("TIC", timespan="day") == [
+        (date(2020, 1, 1), date(2020, 12, 31))
+    ]
+    assert client.cache.coverage("OTHER") == []
+    entry = client.cache.entries("TIC", timespan="day")[0]
+    assert entry["row_count"] == 366 * 24
+    assert entry["adjusted"] == 1
+    assert entry["bytes"] > 0
+
+
+def test_cache_coverage_skips_uncached_responses(
+    create_client, fake_polygon_aggregates, freezer
+):
+    freezer.move_to("2020-06-10 12:00")
+    client = create_client
+    client.stocks_equities_aggregates("TIC", 1, "day", "2020-06-01", "2020-06-14")
+
+    assert client.cache.coverage("TIC") == []
+
+
+def test_cache_reindex(create_client, fake_polygon_aggregates):
+    client = create_client
+    client.stocks_equities_aggregates("TIC", 1, "day", "2020-06-01", "2020-06-14")
+    with client.cache._index() as con:
+        con.execute("delete from entries")
+
+    client.cache.reindex()
+
+    assert client.cache.coverage("TIC") == [(date(2020, 6, 1), date(2020, 6, 14))]
+
+
+def test_cached_aggregates_served_without_threads(
+    create_client, fake_polygon_aggregates, mocker
+):
+    client = create_client
+    fetched = client.stocks_equities_aggregates(
+        "TIC", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+    executor = mocker.patch("polygon_cache.cache.ThreadPoolExecutor")
+
+    cached = client.stocks_equities_aggregates(
+        "TIC", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+
+    executor.assert_not_called()
+    assert cached.__dict__ == fetched.__dict__
+
+
+def test_only_missing_chunks_are_fetched(create_client, fake_polygon_aggregates):
+    client = create_client
+    client.stocks_equities_aggregates("TIC", 1, "minute", "2020-06-01", "2020-06-12")
+    calls = len(fake_polygon_aggregates.calls)
+
+    combined = client.stocks_equities_aggregates(
+        "TIC", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+
+    assert len(fake_polygon_aggregates.calls) == calls + 1
+    assert "2020-06-13/2020-06-14" in fake_polygon_aggregates.calls[-1].request.url
+    assert combined.resultsCount == 14 * 24
+
+
+def test_retry_after_429(create_client, mocker):
+    sleep = mocker.patch("polygon_cache.cache.time.sleep")
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            responses.GET,
+            re.compile(r"https://api\.polygon\.io/v2/reference/splits/TIC.*"),
+            status=429,
+            headers={"Retry-After": "3"},
+        )
+        rsps.add(
+            responses.GET,
+            re.compile(r"https://api\.polygon\.io/v2/reference/splits/TIC.*"),
+            json={"status": "OK", "count": 0, "results": []},
+        )
+        splits = create_client.reference_stock_splits("TIC")
+
+    sleep.assert_called_once_with(3.0)
+    assert splits.status == "OK"
+    metrics = create_client.metrics
+    assert (
+        metrics.value(
+            "polygon_cache_rate_limited_total", endpoint="/v2/reference/splits"
+        )
+        == 1
+    )
+    assert (
+        metrics.value("polygon_cache_retries_total", endpoint="/v2/reference/splits")
+        == 1
+    )
+
+
+def test_retries_exhausted(tmpdir, mocker):
+    mocker.patch("polygon_cache.cache.time.sleep")
+    client = CachedRESTClient(
+        "api_key", cache_location=str(tmpdir.join("polygon-cache")), max_retries=1
+    )
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            responses.GET,
+            re.compile(r"https://api\.polygon\.io/v2/reference/splits/TIC.*"),
+            status=429,
+        )
+        with pytest.raises(requests.HTTPError):
+            client.reference_stock_splits("TIC")
+        assert len(rsps.calls) == 2
+
+
+def test_rate_limit_only_applies_to_network_requests(
+    tmpdir, fake_polygon_aggregates, mocker
+):
+    client = CachedRESTClient(
+        "api_key",
+        cache_location=str(tmpdir.join("polygon-cache")),
+        requests_per_minute=60,
+    )
+    acquire = mocker.patch.object(client.rate_limiter, "acquire")
+
+    client.stocks_equities_aggregates("TIC", 1, "minute", "2020-06-01", "2020-06-14")
+    client.stocks_equities_aggregates("TIC", 1, "minute", "2020-06-01", "2020-06-14")
+    client._fetch_aggregate_chunk("TIC", 1, "minute", "2020-06-01", "2020-06-06")
+
+    assert acquire.call_count == 3
+
+
+def test_offline_mode_serves_cached_aggregates(tmpdir, fake_polygon_aggregates, mocker):
+    temp = str(tmpdir.join("polygon-cache"))
+    online = CachedRESTClient("api_key", cache_location=temp)
+    fetched = online.stocks_equities_aggregates(
+        "TIC", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+    calls = len(fake_polygon_aggregates.calls)
+    session = mocker.patch("requests.Session")
+
+    offline = CachedRESTClient("api_key", cache_location=temp, mode="offline")
+    cached = offline.stocks_equities_aggregates(
+        "TIC", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+
+    session.assert_not_called()
+    assert len(fake_polygon_aggregates.calls) == calls
+    assert cached.__dict__ == fetched.__dict__
+
+
+def test_offline_mode_cache_miss(tmpdir, fake_polygon_aggregates):
+    temp = str(tmpdir.join("polygon-cache"))
+    CachedRESTClient("api_key", cache_location=temp).stocks_equities_aggregates(
+        "TIC", 1, "minute", "2020-06-01", "2020-06-06"
+    )
+    offline = CachedRESTClient("api_key", cache_location=temp, mode="offline")
+
+    with pytest.raises(CacheMissError) as error:
+        offline.stocks_equities_aggregates(
+            "TIC", 1, "minute", "2020-06-01", "2020-06-14"
+        )
+    with pytest.raises(CacheMissError) as reference_error:
+        offline.reference_stock_splits("TIC")
+
+    assert error.value.missing == [
+        ("TIC", 1, "minute", "2020-06-07", "2020-06-12"),
+        ("TIC", 1, "minute", "2020-06-13", "2020-06-14"),
+    ]
+    assert reference_error.value.missing == [
+        "https://api.polygon.io/v2/reference/splits/TIC"
+    ]
+    assert len(fake_polygon_aggregates.calls) == 1
+
+
+def test_unknown_mode(tmpdir):
+    with pytest.raises(ValueError):
+        CachedRESTClient("api_key", cache_location=str(tmpdir.join("c")), mode="x")
+
+
+def test_lru_eviction(create_client, fake_polygon_aggregates):
+    client = create_client
+    for ticker in ("AAA", "BBB", "CCC"):
+        client.stocks_equities_aggregates(ticker, 1, "day", "2020-06-01", "2020-06-14")
+    client.stocks_equities_aggregates("AAA", 1, "day", "2020-06-01", "2020-06-14")
+    entry_size = client.cache.size() // 3
+
+    freed = client.cache.evict(max_size=entry_size * 2 + entry_size // 2)
+
+    assert freed == entry_size
+    assert client.cache.coverage("AAA") != []
+    assert client.cache.coverage("BBB") == []
+    assert client.cache.coverage("CCC") != []
+    assert not client._is_cached(
+        "BBB", 1, "day", "2020-06-01", "2020-06-14", {}, EQUITIES_CHUNK_DAYS
+    )
+
+
+def test_access_times_are_flushed_without_eviction(
+    monkeypatch, create_client, fake_polygon_aggregates
+):
+    monkeypatch.setattr(backend, "ACCESS_FLUSH_SIZE", 2)
+    client = create_client
+    for ticker in ("AAA", "BBB"):
+        client.stocks_equities_aggregates(ticker, 1, "day", "2020-06-01", "2020-06-14")
+    before = {entry["key"]: entry["last_access"] for entry in client.cache.entries()}
+
+    for ticker in ("AAA", "BBB"):
+        client.stocks_equities_aggregates(ticker, 1, "day", "2020-06-01", "2020-06-14")
+
+    assert client.cache._accessed == {}
+    after = {entry["key"]: entry["last_access"] for entry in client.cache.entries()}
+    assert all(after[key] > before[key] for key in before)
+
+
+def test_eviction_runs_in_background(tmpdir, fake_polygon_aggregates):
+    client = CachedRESTClient(
+        "api_key", cache_location=str(tmpdir.join("polygon-cache")), max_cache_size=1
+    )
+    client.stocks_equities_aggregates("AAA", 1, "day", "2020-06-01", "2020-06-14")
+
+    for _ in range(100):
+        if client.cache.size() == 0:
+            break
+        time.sleep(0.05)
+    assert client.cache.size() == 0
+
+
+def test_archive_tier(create_client, fake_polygon_aggregates):
+    client = create_client
+    old = client.stocks_equities_aggregates("AAA", 1, "day", "2010-01-01", "2010-06-14")
+    client.stocks_equities_aggregates("AAA", 1, "day", "2020-06-01", "2020-06-14")
+    size = client.cache.size()
+
+    assert client.cache.archive(date(2019, 1, 1)) == 1
+
+    assert 0 < client.cache.size() < size
+    assert client.cache.size("archive") == size - client.cache.size()
+    assert os.path.exists(client.cache.archive_filename)
+    assert [entry["tier"] for entry in client.cache.entries("AAA")] == [
+        "archive",
+        "hot",
+    ]
+    calls = len(fake_polygon_aggregates.calls)
+    archived = client.stocks_equities_aggregates(
+        "AAA", 1, "day", "2010-01-01", "2010-06-14"
+    )
+    assert archived.results == old.results
+    assert len(fake_polygon_aggregates.calls) == calls
+    assert client.cache.archive(date(2019, 1, 1)) == 0
+
+
+def test_sharded_cache(tmpdir, fake_polygon_aggregates):
+    location = str(tmpdir.join("polygon-cache"))
+    client = CachedRESTClient("api_key", cache_location=location, shards=4)
+    for ticker in ("AAA", "BBB", "CCC", "DDD"):
+        client.stocks_equities_aggregates(ticker, 1, "day", "2020-06-01", "2020-06-14")
+    calls = len(fake_polygon_aggregates.calls)
+
+    reopened = CachedRESTClient("api_key", cache_location=location)
+    results = reopened.stocks_equities_aggregates(
+        "BBB", 1, "day", "2020-06-01", "2020-06-14"
+    ).results
+
+    assert len(fake_polygon_aggregates.calls) == calls
+    assert len(results) == 14 * 24
+    assert len(reopened.cache.shards) == 4
+    assert sorted(os.listdir(location))[:4] == [
+        "polygon-cache.sqlite",
+        "shard-000.sqlite",
+        "shard-001.sqlite",
+        "shard-002.sqlite",
+    ]
+    for ticker in ("AAA", "BBB", "CCC", "DDD"):
+        assert [
+            entry["ticker"] for entry in reopened.cache.shard_for(ticker).entries()
+        ].count(ticker) == 1
+    assert len(reopened.cache.entries()) == 4
+    with pytest.raises(ValueError):
+        CachedRESTClient("api_key", cache_location=location, shards=8)
+
+
+def test_compact(create_client, fake_polygon_aggregates):
+    client = create_client
+    expected = {
+        ticker: client.stocks_equities_aggregates(
+            ticker, 1, "day", "2018-06-01", "2019-06-14"
+        ).results
+        for ticker in ("AAA", "BBB", "CCC")
+    }
+    client.cache.archive(date(2019, 1, 1))
+    for entry in client.cache.entries("BBB"):
+        client.cache.delete(entry["key"])
+    size = os.path.getsize(client.cache.filename)
+
+    freed = client.cache.compact(recompress=True)
+
+    assert freed > 0
+    assert os.path.getsize(client.cache.filename) < size
+    calls = len(fake_polygon_aggregates.calls)
+    results = client.stocks_equities_aggregates(
+        "AAA", 1, "day", "2018-06-01", "2019-06-14"
+    ).results
+    assert results == expected["AAA"]
+    assert len(fake_polygon_aggregates.calls) == calls
+
+
+def test_compact_keeps_writes_of_open_connections(create_client):
+    client = create_client
+    con = sqlite3.connect(client.cache.filename)
+    con.execute("create table other_writer (value)")
+    con.commit()
+
+    client.cache.compact()
+    con.execute("insert into other_writer values (1)")
+    con.commit()
+    con.close()
+
+    con = sqlite3.connect(client.cache.filename)
+    assert con.execute("select value from other_writer").fetchall() == [(1,)]
+    con.close()
+
+
+def test_compact_doesnt_block_readers(create_client):
+    client = create_client
+    con = sqlite3.connect(client.cache.filename)
+    con.execute("create table filler (value)")
+    con.executemany(
+        "insert into filler values (?)", ((os.urandom(1000),) for _ in range(50000))
+    )
+    con.execute("delete from filler where rowid % 2 = 0")
+    con.commit()
+    con.close()
+
+    compacting = threading.Thread(target=client.cache.compact)
+    reader = sqlite3.connect(client.cache.filename, timeout=0)
+    compacting.start()
+    reads = 0
+    while compacting.is_alive():
+        reader.execute("select count(*) from entries").fetchone()
+        reads += 1
+    compacting.join()
+    reader.close()
+
+    assert reads > 0
+    assert os.path.getsize(client.cache.filename) < 40_000_000
+
+
+def test_metrics(create_client, fake_polygon_aggregates):
+    client = create_client
+    client.stocks_equities_aggregates("AAA", 1, "minute", "2020-06-01", "2020-06-14")
+    client.stocks_equities_aggregates("AAA", 1, "minute", "2020-06-01", "2020-06-14")
+
+    metrics = client.metrics
+    assert metrics.value("polygon_cache_misses_total", endpoint="aggregates") == 3
+    assert metrics.value("polygon_cache_hits_total", endpoint="aggregates") == 3
+    assert metrics.value("polygon_cache_upstream_seconds", endpoint="aggregates") == 3
+    assert metrics.value("polygon_cache_parse_seconds", endpoint="aggregates") == 6
+    assert metrics.value("polygon_cache_combine_seconds", endpoint="aggregates") == 2
+    assert metrics.total("polygon_cache_downloaded_bytes_total") == sum(
+        len(call.response.content) for call in fake_polygon_aggregates.calls
+    )
+    assert (
+        'polygon_cache_misses_total{endpoint="aggregates"} 3'
+        in metrics.prometheus().splitlines()
+    )
@@ -0,0 +1,198 @@
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import responses
+
+from polygon_cache.cache import CachedRESTClient, CacheMissError
+from polygon_cache.lazy import LazyResults
+
+
+@pytest.fixture
+def client(tmpdir):
+    return CachedRESTClient("api_key", cache_location=str(tmpdir.join("polygon-cache")))
+
+
+def lazy_results(chunks, counts, **kwargs):
+    loads = []
+
+    def load(indices):
+        loads.append(sorted(indices))
+        return {i: chunks[i] for i in indices}
+
+    return LazyResults(counts, load, **kwargs), loads
+
+
+@pytest.fixture
+def overlapping_polygon_aggregates():
+    # like fake_polygon_aggregates but every response starts a day early, so
+    # each chunk repeats the last day of the chunk before it
+    def callback(request):
+        path = request.path_url.split("?")[0].split("/")
+        start = datetime.strptime(path[8], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        end = datetime.strptime(path[9], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        results = []
+        current = start - timedelta(days=1)
+        while current < end + timedelta(days=1):
+            results.append({"T": path[4], "c": 2, "t": int(current.timestamp() * 1000)})
+            current += timedelta(hours=1)
+        body = {
+            "ticker": path[4],
+            "status": "OK",
+            "adjusted": True,
+            "queryCount": len(results),
+            "results": results,
+        }
+        return 200, {}, json.dumps(body)
+
+    with responses.RequestsMock() as rsps:
+        rsps.add_callback(
+            responses.GET,
+            re.compile(r"https://api\.polygon\.io/v2/aggs/ticker/.*"),
+            callback=callback,
+        )
+        yield rsps
+
+
+def test_lazy_results_sequence():
+    chunks = [[1, 2, 3], [], [4, 5], [6]]
+    results, loads = lazy_results(chunks, [3, 0, 2, 1])
+
+    assert len(results) == 6
+    assert loads == []
+    assert results[-1] == 6
+    assert results[3] == 4
+    assert loads == [[3], [2]]
+    assert results[1:5:2] == [2, 4]
+    assert results[::-2] == [6, 4, 2]
+    assert list(results) == [1, 2, 3, 4, 5, 6]
+    with pytest.raises(IndexError):
+        results[6]
+
+
+def test_lazy_results_load_unknown_counts():
+    results, loads = lazy_results([[1, 2], [3], [4, 5], [6]], [2, None, None, 1])
+
+    assert results[:2] == [1, 2]
+    assert results[2] == 3
+    assert loads == [[0], [1]]
+    assert results[-1] == 6
+    assert loads == [[0], [1], [2], [3]]
+
+
+@pytest.mark.parametrize(
+    "timestamps",
+    [
+        [[1, 5], [3, 7]],
+        [[1, 2, 3], [3, 4], [2, 5]],
+        [[3, 4], [1, 2]],
+        [[1, 2], [], [3, 9], [4, 5], [10]],
+        [[1, 2], [3, 4], [5]],
+    ],
+)
+@pytest.mark.parametrize("indexed", [False, True])
+def test_lazy_results_merge_overlapping_chunks_like_eager(timestamps, indexed):
+    chunks = [[{"t": t, "chunk": i} for t in ts] for i, ts in enumerate(timestamps)]
+    results, _ = lazy_results(
+        chunks,
+        [len(chunk) if indexed else None for chunk in chunks],
+        key="t",
+        bounds=[(ts[0], ts[-1]) if indexed and ts else None for ts in timestamps],
+    )
+    eager = CachedRESTClient._merge_sorted_results(chunks)
+
+    assert len(results) == len(eager)
+    assert [results[i] for i in range(len(eager))] == eager
+    assert results[-1] == eager[-1]
+    assert list(results) == eager
+
+
+def test_lazy_results_load_overlapping_chunks_together():
+    chunks = [[{"t": t} for t in ts] for ts in [[1, 2], [3, 6], [5, 7], [8]]]
+    results, loads = lazy_results(
+        chunks, [2, 2, 2, 1], key="t", bounds=[(1, 2), (3, 6), (5, 7), (8, 8)]
+    )
+
+    assert results[2] == {"t": 3}
+    assert loads == [[1, 2]]
+    assert len(results) == 7
+    assert results[-1] == {"t": 8}
+    assert loads == [[1, 2], [3]]
+
+
+def test_lazy_results_trust_counts_of_chunks_that_dont_overlap():
+    chunks = [[{"t": t} for t in chunk] for chunk in [[1, 2], [3, 4], [5]]]
+    results, loads = lazy_results(
+        chunks, [2, 2, 1], key="t", bounds=[(1, 2), (3, 4), (5, 5)]
+    )
+
+    assert len(results) == 5
+    assert results[-1] == {"t": 5}
+    assert loads == [[2]]
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_lazy_response_matches_eager_when_chunks_overlap(
+    client, overlapping_polygon_aggregates, cached
+):
+    eager = client.stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+    if not cached:
+        client.cache.clear()
+
+    lazy = client.stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-14", lazy=True
+    )
+
+    assert eager.resultsCount == 15 * 24
+    assert lazy.resultsCount == eager.resultsCount
+    assert lazy.results[-1] == eager.results[-1]
+    assert lazy.results == eager.results
+
+
+def test_lazy_response_from_cache(client, fake_polygon_aggregates, mocker):
+    eager = client.stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+    get_responses = mocker.spy(client.cache, "get_responses")
+
+    lazy = client.stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-14", lazy=True
+    )
+
+    assert lazy.resultsCount == 14 * 24
+    assert lazy.results.loaded_chunks == 0
+    assert lazy.results[-100:] == eager.results[-100:]
+    # the last chunk only has two days of bars
+    assert lazy.results.loaded_chunks == 2
+    assert get_responses.call_count == 1
+    assert lazy.results == eager.results
+    assert lazy.queryCount == eager.queryCount
+    assert (lazy.ticker, lazy.status, lazy.adjusted) == ("AAA", "OK", True)
+
+
+def test_lazy_response_fetches_when_touched(client, fake_polygon_aggregates):
+    response = client.stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-14", lazy=True
+    )
+    assert len(fake_polygon_aggregates.calls) == 0
+
+    # chunks that aren't cached could overlap any other chunk, so they're all
+    # fetched together once a result is touched
+    assert response.results[0]["t"] == 1590969600000
+    assert len(fake_polygon_aggregates.calls) == 3
+    assert len(response.results) == 14 * 24
+    assert len(fake_polygon_aggregates.calls) == 3
+
+
+def test_lazy_offline_misses(tmpdir):
+    client = CachedRESTClient(
+        "api_key", cache_location=str(tmpdir.join("polygon-cache")), mode="offline"
+    )
+
+    with pytest.raises(CacheMissError):
+        client.stocks_equities_aggregates(
+            "AAA", 1, "minute", "2020-06-01", "2020-06-14", lazy=True
+        )
@@ -0,0 +1,43 @@
+from datetime import date
+
+from benchmarks.fake_polygon import FakePolygon
+from benchmarks.load import plan_calls, run_load
+
+
+def plan(seed):
+    return plan_calls(
+        seed,
+        40,
+        10,
+        1.1,
+        [(1, "minute"), (1, "day")],
+        date(2020, 1, 1),
+        date(2020, 3, 31),
+        10,
+    )
+
+
+def test_plan_is_reproducible():
+    planned = plan(0)
+
+    assert planned == plan(0)
+    assert planned != plan(1)
+    tickers = [ticker for ticker, *_ in planned]
+    assert tickers.count("T0001") > tickers.count("T0010")
+    assert all("2020-01-01" <= from_ <= to <= "2020-03-31" for *_, from_, to in planned)
+
+
+def test_load_report(tmpdir):
+    with FakePolygon(bars_per_day=10) as server:
+        report = run_load(
+            server, str(tmpdir.join("polygon-cache")), plan(0), 8, warm_fraction=0.5
+        )
+
+    assert report.calls == 40
+    assert not report.failed
+    assert len(report.latencies) == 40
+    assert report.percentile(50) <= report.percentile(99)
+    assert report.hits > 0
+    assert report.upstream_calls == report.misses > 0
+    assert report.cache_bytes_after > report.cache_bytes_before > 0
+    assert "latency p50" in report.summary()
@@ -0,0 +1,73 @@
+import tracemalloc
+
+import pytest
+
+from polygon_cache.cache import CachedRESTClient
+from polygon_cache.memory import MemoryProfiler
+from polygon_cache.metrics import Metrics
+
+# tracemalloc.reset_peak is new in python 3.9
+needs_reset_peak = pytest.mark.skipif(
+    not hasattr(tracemalloc, "reset_peak"), reason="needs python 3.9 or later"
+)
+
+
+@needs_reset_peak
+def test_stage_peaks():
+    profiler = MemoryProfiler(Metrics())
+
+    with profiler.call("call") as peaks:
+        with profiler.stage("allocate"):
+            block = bytearray(10_000_000)
+            del block
+        with profiler.stage("small"):
+            bytearray(1000)
+
+    assert 10_000_000 <= peaks["allocate"] < 11_000_000
+    assert peaks["small"] < 1_000_000
+    assert peaks["call"] >= peaks["allocate"]
+    assert not tracemalloc.is_tracing()
+    assert profiler.metrics.value("polygon_cache_peak_memory_bytes", stage="call") == 1
+
+
+@needs_reset_peak
+def test_aggregates_peak_memory(tmpdir, fake_polygon_aggregates):
+    client = CachedRESTClient(
+        "api_key", cache_location=str(tmpdir.join("polygon-cache")), profile_memory=True
+    )
+
+    response = client.stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+
+    peaks = response.peak_memory
+    assert set(peaks) == {"stocks_equities_aggregates", "parse", "model", "combine"}
+    assert all(peak > 0 for peak in peaks.values())
+    assert peaks["stocks_equities_aggregates"] >= max(peaks.values())
+    assert client.metrics.value("polygon_cache_peak_memory_bytes", stage="parse") == 3
+    assert 'stage="combine",le="1048576"' in client.metrics.prometheus()
+
+
+@pytest.mark.skipif(hasattr(tracemalloc, "reset_peak"), reason="python 3.8 only")
+def test_profiling_memory_needs_python_3_9(tmpdir):
+    with pytest.raises(ValueError, match="python 3.9"):
+        MemoryProfiler(Metrics())
+    with pytest.raises(ValueError, match="python 3.9"):
+        CachedRESTClient(
+            "api_key",
+            cache_location=str(tmpdir.join("polygon-cache")),
+            profile_memory=True,
+        )
+
+
+def test_memory_is_not_profiled_by_default(tmpdir, fake_polygon_aggregates):
+    client = CachedRESTClient(
+        "api_key", cache_location=str(tmpdir.join("polygon-cache"))
+    )
+
+    response = client.stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+
+    assert not hasattr(response, "peak_memory")
+    assert client.metrics.total("polygon_cache_peak_memory_bytes") == 0
@@ -0,0 +1,43 @@
+import pytest
+
+from polygon_cache.metrics import Metrics, endpoint_label
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        (
+            "https://api.polygon.io/v2/aggs/ticker/TIC/range/1/day/2020-01-01"
+            "/2020-01-31",
+            "aggregates",
+        ),
+        ("https://api.polygon.io/v2/ticks/stocks/nbbo/TIC/2020-01-02", "quotes"),
+        ("https://api.polygon.io/v2/reference/splits/TIC", "/v2/reference/splits"),
+    ],
+)
+def test_endpoint_label(url, expected):
+    assert endpoint_label(url) == expected
+
+
+def test_prometheus():
+    metrics = Metrics(buckets=(0.1, 1))
+    metrics.inc("polygon_cache_hits_total", endpoint="aggregates")
+    metrics.inc("polygon_cache_hits_total", 2, endpoint="aggregates")
+    metrics.inc("polygon_cache_downloaded_bytes_total", 1500, endpoint='a"b')
+    for seconds in (0.05, 0.1, 0.5, 5):
+        metrics.observe("polygon_cache_upstream_seconds", seconds, endpoint="trades")
+
+    lines = metrics.prometheus().splitlines()
+
+    assert "# TYPE polygon_cache_hits_total counter" in lines
+    assert 'polygon_cache_hits_total{endpoint="aggregates"} 3' in lines
+    assert 'polygon_cache_downloaded_bytes_total{endpoint="a\\"b"} 1500' in lines
+    assert "# TYPE polygon_cache_upstream_seconds histogram" in lines
+    assert [line for line in lines if line.startswith("polygon_cache_upstream")] == [
+        'polygon_cache_upstream_seconds_bucket{endpoint="trades",le="0.1"} 2',
+        'polygon_cache_upstream_seconds_bucket{endpoint="trades",le="1"} 3',
+        'polygon_cache_upstream_seconds_bucket{endpoint="trades",le="+Inf"} 4',
+        'polygon_cache_upstream_seconds_sum{endpoint="trades"} 5.65',
+        'polygon_cache_upstream_seconds_count{endpoint="trades"} 4',
+    ]
+    assert metrics.total("polygon_cache_upstream_seconds") == pytest.approx(5.65)
@@ -0,0 +1,112 @@
+import os
+import time
+from datetime import date
+
+import pytest
+
+from polygon_cache import cli
+from polygon_cache.cache import CachedRESTClient
+from polygon_cache.partitions import CLAIM_TIMEOUT, PartitionedFileCache
+from polygon_cache.warm import warm
+
+
+def test_partitioned_file_cache(tmpdir, fake_polygon_aggregates):
+    location = str(tmpdir.join("shared"))
+    client = CachedRESTClient("api_key", cache_location=location, multi_host=True)
+    fetched = client.stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+    calls = len(fake_polygon_aggregates.calls)
+
+    other_host = CachedRESTClient("api_key", cache_location=location)
+    cached = other_host.stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+
+    assert isinstance(other_host.cache, PartitionedFileCache)
+    assert len(fake_polygon_aggregates.calls) == calls
+    assert cached.results == fetched.results
+    names = os.listdir(os.path.join(location, "AAA"))
+    assert len(names) == 3
+    assert all(name.endswith(".partition") for name in names)
+    assert other_host.cache.coverage("AAA") == [(date(2020, 6, 1), date(2020, 6, 14))]
+    assert sum(entry["row_count"] for entry in other_host.cache.entries("AAA")) == (
+        14 * 24
+    )
+
+
+def test_claims(tmpdir):
+    cache = PartitionedFileCache(str(tmpdir.join("shared")))
+    other_host = PartitionedFileCache(str(tmpdir.join("shared")))
+
+    assert cache.claim("AAA/key")
+    assert not other_host.claim("AAA/key")
+    cache.release("AAA/key")
+    assert other_host.claim("AAA/key")
+
+    # claims left behind by warmers that died are taken over
+    stale = time.time() - CLAIM_TIMEOUT - 1
+    os.utime(os.path.join(cache.location, "AAA/key.lock"), (stale, stale))
+    assert cache.claim("AAA/key")
+
+
+def test_stale_claims_are_taken_over_once(tmpdir):
+    cache = PartitionedFileCache(str(tmpdir.join("shared")))
+    other_host = PartitionedFileCache(str(tmpdir.join("shared")))
+    lock = os.path.join(cache.location, "AAA/key.lock")
+    assert cache.claim("AAA/key")
+    stale = time.time() - CLAIM_TIMEOUT - 1
+    os.utime(lock, (stale, stale))
+    status = os.stat(lock)
+    # another host has claimed the takeover of this stale lock
+    takeover = f"{lock}.{status.st_ino}.{status.st_mtime_ns}.takeover"
+    open(takeover, "w").close()
+
+    assert not other_host.claim("AAA/key")
+    assert os.stat(lock).st_ino == status.st_ino
+
+    os.remove(takeover)
+    assert other_host.claim("AAA/key")
+    assert not cache.claim("AAA/key")
+    os.utime(takeover, (stale, stale))
+    cache.compact()
+    assert not os.path.exists(takeover)
+
+
+def test_warmers_split_chunks(tmpdir, fake_polygon_aggregates):
+    location = str(tmpdir.join("shared"))
+    client = CachedRESTClient("api_key", cache_location=location, multi_host=True)
+    key = client._cache_key(
+        client._aggregate_endpoint("BBB", 1, "day", "2020-06-01", "2020-06-14")
+    )
+    assert client.cache.claim(key)
+
+    report = warm(client, ["AAA", "BBB"], [(1, "day")], "2020-06-01", "2020-06-14")
+
+    assert (report.fetched, report.claimed) == (1, 1)
+    assert "1 fetched by other warmers" in report.summary()
+    assert not client.cache.has_key(key)
+
+
+def test_multi_host_cache_isnt_archived(tmpdir, capsys):
+    location = str(tmpdir.join("shared"))
+    cache = PartitionedFileCache(location)
+
+    with pytest.raises(ValueError, match="no archive tier"):
+        cache.archive(date(2020, 1, 1))
+    with pytest.raises(ValueError, match="can't be evicted"):
+        cache.evict()
+    with pytest.raises(SystemExit) as exit:
+        cli.main(
+            [
+                "--api-key",
+                "api_key",
+                "--cache-location",
+                location,
+                "--multi-host",
+                "archive",
+            ]
+        )
+
+    assert exit.value.code == 2
+    assert "A multi host cache has no archive tier" in capsys.readouterr().err
@@ -0,0 +1,77 @@
+import pytest
+
+from polygon_cache import cli
+from polygon_cache.cache import CachedRESTClient
+
+
+@pytest.fixture
+def client(tmpdir):
+    return CachedRESTClient(
+        "api_key",
+        cache_location=str(tmpdir.join("polygon-cache")),
+        requests_per_minute=60,
+    )
+
+
+def test_plan_marks_hits_and_misses(client, fake_polygon_aggregates):
+    client.stocks_equities_aggregates("AAA", 1, "minute", "2020-06-01", "2020-06-14")
+    calls = len(fake_polygon_aggregates.calls)
+
+    plan = client.plan_stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-26"
+    )
+
+    assert len(fake_polygon_aggregates.calls) == calls
+    assert [(chunk.from_, chunk.to, chunk.cached) for chunk in plan.chunks] == [
+        ("2020-06-01", "2020-06-06", True),
+        ("2020-06-07", "2020-06-12", True),
+        ("2020-06-13", "2020-06-18", False),
+        ("2020-06-19", "2020-06-24", False),
+        ("2020-06-25", "2020-06-26", False),
+    ]
+    # misses are estimated from the 24 bars a day that are cached
+    assert [chunk.rows for chunk in plan.chunks] == [144, 144, 144, 144, 48]
+    assert plan.calls == 3
+    assert plan.bytes_to_fetch == sum(chunk.bytes for chunk in plan.chunks[2:])
+    assert plan.chunks[2].bytes == pytest.approx(plan.chunks[0].bytes, rel=0.01)
+    # the rate limit allows a call a second
+    assert plan.seconds == pytest.approx(2)
+
+
+def test_plan_estimates_uncached_tickers(client):
+    plan = client.plan_stocks_equities_aggregates(
+        "AAA", 1, "day", "2020-06-01", "2020-06-28"
+    )
+
+    assert plan.calls == 1
+    # four weeks of weekdays
+    assert plan.rows == 20
+    assert plan.bytes_to_fetch == 20 * 100
+
+
+def test_plan_cli(tmpdir, capsys):
+    tickers_file = tmpdir.join("tickers.txt")
+    tickers_file.write("AAA\nBBB\n")
+
+    exit_code = cli.main(
+        [
+            "--api-key",
+            "api_key",
+            "--cache-location",
+            str(tmpdir.join("polygon-cache")),
+            "plan",
+            str(tickers_file),
+            "--timespan",
+            "day",
+            "--from",
+            "2020-06-01",
+            "--to",
+            "2020-06-28",
+            "--chunks",
+        ]
+    )
+
+    out = capsys.readouterr().out
+    assert exit_code == 0
+    assert "BBB 1/day 2020-06-01 - 2020-06-28 miss 20 rows 2000 bytes" in out
+    assert "planned 2 chunks: 0 cached, 2 api calls" in out
@@ -0,0 +1,17 @@
+from polygon_cache.ratelimit import RateLimiter
+
+
+def test_rate_limiter_waits_between_requests(mocker):
+    clock = mocker.patch("polygon_cache.ratelimit.time")
+    clock.monotonic.return_value = 100.0
+    limiter = RateLimiter(requests_per_minute=60, burst=2)
+
+    limiter.acquire()
+    limiter.acquire()
+    clock.sleep.assert_not_called()
+
+    clock.sleep.side_effect = lambda seconds: setattr(
+        clock.monotonic, "return_value", clock.monotonic.return_value + seconds
+    )
+    limiter.acquire()
+    clock.sleep.assert_called_once_with(1.0)
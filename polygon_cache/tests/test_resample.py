@@ -0,0 +1,113 @@
+from datetime import datetime
+
+import pytest
+import pytz
+
+from polygon_cache.resample import can_resample, resample_aggregates
+
+
+def unix_ms(*args) -> int:
+    eastern = pytz.timezone("America/New_York")
+    return int(eastern.localize(datetime(*args)).timestamp() * 1000)
+
+
+def minute_bar(t, price, volume=10):
+    return {
+        "T": "TIC",
+        "v": volume,
+        "vw": price,
+        "o": price,
+        "c": price + 1,
+        "h": price + 2,
+        "l": price - 2,
+        "t": t,
+        "n": 1,
+    }
+
+
+@pytest.mark.parametrize(
+    "source_multiplier,source_timespan,multiplier,timespan,expected",
+    [
+        (1, "minute", 5, "minute", True),
+        (1, "minute", 1, "minute", False),
+        (2, "minute", 5, "minute", False),
+        (1, "minute", 1, "hour", True),
+        (1, "minute", 1, "day", True),
+        (1, "hour", 1, "day", True),
+        (1, "day", 1, "week", True),
+        (2, "day", 1, "week", False),
+        (1, "day", 1, "hour", False),
+    ],
+)
+def test_can_resample(
+    source_multiplier, source_timespan, multiplier, timespan, expected
+):
+    assert (
+        can_resample(source_multiplier, source_timespan, multiplier, timespan)
+        is expected
+    )
+
+
+def test_resample_five_minutes():
+    start = unix_ms(2020, 6, 4, 9, 30)
+    bars = [minute_bar(start + i * 60000, 100 + i, volume=i + 1) for i in range(7)]
+
+    resampled = resample_aggregates(bars, 5, "minute")
+
+    assert resampled == [
+        {
+            "T": "TIC",
+            "o": 100,
+            "h": 106,
+            "l": 98,
+            "c": 105,
+            "t": start,
+            "v": 15,
+            "vw": (100 * 1 + 101 * 2 + 102 * 3 + 103 * 4 + 104 * 5) / 15,
+            "n": 5,
+        },
+        {
+            "T": "TIC",
+            "o": 105,
+            "h": 108,
+            "l": 103,
+            "c": 107,
+            "t": start + 5 * 60000,
+            "v": 13,
+            "vw": (105 * 6 + 106 * 7) / 13,
+            "n": 2,
+        },
+    ]
+
+
+def test_resample_day_aligned_to_exchange_timezone():
+    # 19:59 and 20:00 eastern are on the same day in new york but 20:00 is
+    # already the next day in utc
+    bars = [
+        minute_bar(unix_ms(2020, 6, 4, 19, 59), 100),
+        minute_bar(unix_ms(2020, 6, 4, 20, 0), 101),
+        minute_bar(unix_ms(2020, 6, 5, 4, 0), 102),
+    ]
+
+    resampled = resample_aggregates(bars, 1, "day")
+
+    assert [bar["t"] for bar in resampled] == [
+        unix_ms(2020, 6, 4),
+        unix_ms(2020, 6, 5),
+    ]
+    assert [bar["c"] for bar in resampled] == [102, 103]
+
+
+@pytest.mark.parametrize(
+    "timespan,expected_start",
+    [("week", (2020, 5, 31)), ("month", (2020, 6, 1)), ("quarter", (2020, 4, 1))],
+)
+def test_resample_calendar_buckets(timespan, expected_start):
+    bars = [minute_bar(unix_ms(2020, 6, day, 12), 100 + day) for day in (1, 3, 5)]
+
+    resampled = resample_aggregates(bars, 1, timespan)
+
+    assert len(resampled) == 1
+    assert resampled[0]["t"] == unix_ms(*expected_start)
+    assert resampled[0]["o"] == 101
+    assert resampled[0]["c"] == 106
@@ -0,0 +1,84 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from polygon_cache.cache import CachedRESTClient
+from polygon_cache.server import CacheServer
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="needs unix sockets"
+)
+
+
+@pytest.fixture
+def server(tmpdir):
+    client = CachedRESTClient("api_key", cache_location=str(tmpdir.join("shared")))
+    # pytest's tmpdir can be longer than the 104 bytes macOS allows in a socket
+    # path
+    directory = tempfile.mkdtemp()
+    server = CacheServer(client, os.path.join(directory, "server.sock"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(directory)
+
+
+def thin_client(tmpdir, server):
+    return CachedRESTClient(
+        "api_key", cache_location=str(tmpdir.join("shared")), server=server.path
+    )
+
+
+def test_thin_clients_share_the_cache(tmpdir, server, fake_polygon_aggregates):
+    first, second = thin_client(tmpdir, server), thin_client(tmpdir, server)
+
+    fetched = first.stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+    calls = len(fake_polygon_aggregates.calls)
+    cached = second.stocks_equities_aggregates(
+        "AAA", 1, "minute", "2020-06-01", "2020-06-14"
+    )
+
+    assert calls == 3
+    assert len(fake_polygon_aggregates.calls) == calls
+    assert cached.results == fetched.results
+    assert first._session is None
+    assert len(server.client.cache.entries("AAA")) == 3
+
+
+def test_server_fetches_concurrent_misses_once(tmpdir, server, mocker):
+    def slow_get_json(endpoint, params):
+        time.sleep(0.2)
+        return {"status": "OK", "results": []}
+
+    get_json = mocker.patch.object(
+        server.client, "_get_json", side_effect=slow_get_json
+    )
+    clients = [thin_client(tmpdir, server) for _ in range(4)]
+
+    with ThreadPoolExecutor(4) as executor:
+        responses = list(
+            executor.map(lambda client: client.reference_stock_splits("AAA"), clients)
+        )
+
+    assert get_json.call_count == 1
+    assert all(response.results == [] for response in responses)
+
+
+def test_server_errors_reach_the_client(tmpdir, server, mocker):
+    mocker.patch.object(
+        server.client, "_get_json", side_effect=requests.HTTPError("403 Forbidden")
+    )
+
+    with pytest.raises(requests.HTTPError, match="403 Forbidden"):
+        thin_client(tmpdir, server).reference_stock_splits("AAA")
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from polygon_cache.splits import SplitsTable, adjust_for_splits
+from polygon_cache.tests.test_resample import minute_bar, unix_ms
+
+
+def test_adjust_for_splits():
+    bars = [
+        minute_bar(unix_ms(2020, 8, 27, 12), 400, volume=100),
+        minute_bar(unix_ms(2020, 8, 28, 12), 400, volume=100),
+        minute_bar(unix_ms(2020, 8, 31, 12), 100, volume=400),
+        minute_bar(unix_ms(2021, 1, 4, 12), 50, volume=800),
+    ]
+
+    adjusted = adjust_for_splits(bars, [("2020-08-28", 0.5), ("2020-08-31", 0.25)])
+
+    assert [bar["o"] for bar in adjusted] == [50, 100, 100, 50]
+    assert [bar["h"] for bar in adjusted] == [50.25, 100.5, 102, 52]
+    assert [bar["v"] for bar in adjusted] == [800, 400, 400, 800]
+    # the cached bars themselves are never modified
+    assert bars[0]["o"] == 400
+
+
+def test_adjust_for_splits_no_splits():
+    bars = [minute_bar(unix_ms(2020, 8, 27, 12), 400)]
+    assert adjust_for_splits(bars, []) is bars
+
+
+class FakeSplitsResponse:
+    def __init__(self, results):
+        self.results = results
+
+
+@pytest.fixture
+def splits_table(tmpdir, mocker):
+    fetch = mocker.Mock(
+        return_value=FakeSplitsResponse(
+            [
+                {"ticker": "TIC", "exDate": "2020-08-31", "ratio": 0.25},
+                {"ticker": "TIC", "exDate": "2014-06-09", "ratio": 1 / 7},
+            ]
+        )
+    )
+    return SplitsTable(str(tmpdir.join("cache.sqlite")), fetch), fetch
+
+
+def test_splits_table_fetched_once(splits_table):
+    table, fetch = splits_table
+
+    assert table.get("TIC") == [("2014-06-09", 1 / 7), ("2020-08-31", 0.25)]
+    assert table.get("TIC") == [("2014-06-09", 1 / 7), ("2020-08-31", 0.25)]
+    fetch.assert_called_once_with("TIC")
+
+
+def test_splits_table_refreshes_when_stale(splits_table, freezer):
+    table, fetch = splits_table
+    table.get("TIC")
+
+    freezer.move_to(datetime.utcnow() + timedelta(days=2))
+    table.get("TIC")
+
+    assert fetch.call_count == 2
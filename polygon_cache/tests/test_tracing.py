@@ -0,0 +1,60 @@
+from collections import Counter
+
+from polygon_cache.cache import CachedRESTClient
+from polygon_cache.tracing import CallbackTracer, span, tracing
+
+
+def test_span_is_a_noop_without_tracer():
+    with span("stage") as current:
+        current.set_attribute("key", "value")
+
+
+def test_callback_tracer_nests_spans():
+    started, ended = [], []
+    tracer = CallbackTracer(on_start=started.append, on_end=ended.append)
+
+    with tracing(tracer):
+        with span("outer", a=1) as outer:
+            with span("inner") as inner:
+                inner.set_attribute("b", 2)
+
+    assert [s.name for s in started] == ["polygon_cache.outer", "polygon_cache.inner"]
+    assert [s.name for s in ended] == ["polygon_cache.inner", "polygon_cache.outer"]
+    assert inner.parent is outer
+    assert (outer.attributes, inner.attributes) == ({"a": 1}, {"b": 2})
+    assert outer.seconds >= inner.seconds
+
+
+def test_aggregates_stages(tmpdir, fake_polygon_aggregates):
+    spans = []
+    client = CachedRESTClient(
+        "api_key",
+        cache_location=str(tmpdir.join("polygon-cache")),
+        tracer=CallbackTracer(on_end=spans.append),
+    )
+
+    client.stocks_equities_aggregates("AAA", 1, "minute", "2020-06-01", "2020-06-14")
+
+    names = Counter(s.name.split(".")[1] for s in spans)
+    assert names == {
+        "stocks_equities_aggregates": 1,
+        "plan": 1,
+        "cache_lookup": 1,
+        "fetch_chunk": 3,
+        "http": 3,
+        "cache_write": 3,
+        "parse": 3,
+        "combine": 1,
+    }
+    root = spans[-1]
+    assert root.name == "polygon_cache.stocks_equities_aggregates"
+    assert root.attributes["ticker"] == "AAA"
+    for current in spans:
+        if current.name == "polygon_cache.fetch_chunk":
+            assert current.parent is root
+            assert current.attributes["queue_seconds"] >= 0
+        if current.name == "polygon_cache.http":
+            assert current.parent.name == "polygon_cache.fetch_chunk"
+            assert current.attributes["status"] == 200
+        if current.name == "polygon_cache.cache_write":
+            assert current.parent.name == "polygon_cache.http"
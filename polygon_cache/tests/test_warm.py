@@ -0,0 +1,130 @@
+from datetime import date
+
+import pytest
+
+from polygon_cache import cli
+from polygon_cache.backfill import BackfillManifest
+from polygon_cache.cache import CachedRESTClient
+from polygon_cache.warm import parse_timespan, read_tickers, warm
+
+
+@pytest.fixture
+def client(tmpdir):
+    return CachedRESTClient("api_key", cache_location=str(tmpdir.join("polygon-cache")))
+
+
+@pytest.mark.parametrize(
+    "value,expected", [("minute", (1, "minute")), ("5/minute", (5, "minute"))]
+)
+def test_parse_timespan(value, expected):
+    assert parse_timespan(value) == expected
+
+
+def test_read_tickers(tmpdir):
+    tickers_file = tmpdir.join("tickers.txt")
+    tickers_file.write("AAPL\n\n# comment\n MSFT \n")
+    assert read_tickers(str(tickers_file)) == ["AAPL", "MSFT"]
+
+
+def test_warm(client, fake_polygon_aggregates):
+    client.stocks_equities_aggregates("AAA", 1, "minute", "2020-06-01", "2020-06-06")
+
+    report = warm(
+        client,
+        ["AAA", "BBB"],
+        [(1, "minute"), (1, "day")],
+        "2020-06-01",
+        "2020-06-14",
+    )
+
+    assert report.planned == 3 + 3 + 1 + 1
+    assert report.cached == 1
+    assert report.fetched == 7
+    assert report.failed == []
+    assert report.gaps == {}
+    assert report.bars == 14 * 24 * 3 + 8 * 24
+    assert client.cache.coverage("BBB", timespan="minute") == [
+        (date(2020, 6, 1), date(2020, 6, 14))
+    ]
+
+
+def test_warm_reports_gaps(client, fake_polygon_aggregates, freezer):
+    freezer.move_to("2020-06-10 12:00")
+
+    report = warm(client, ["AAA"], [(1, "minute")], "2020-06-01", "2020-06-14")
+
+    assert report.gaps == {
+        ("AAA", 1, "minute"): [(date(2020, 6, 7), date(2020, 6, 14))]
+    }
+    assert "gap AAA 1/minute 2020-06-07 - 2020-06-14" in report.summary()
+
+
+def test_warm_cli(tmpdir, fake_polygon_aggregates, capsys):
+    tickers_file = tmpdir.join("tickers.txt")
+    tickers_file.write("AAA\nBBB\n")
+
+    exit_code = cli.main(
+        [
+            "--api-key",
+            "api_key",
+            "--cache-location",
+            str(tmpdir.join("polygon-cache")),
+            "warm",
+            str(tickers_file),
+            "--timespan",
+            "day",
+            "--from",
+            "2020-06-01",
+            "--to",
+            "2020-06-14",
+        ]
+    )
+
+    assert exit_code == 0
+    assert "0 already cached, 2 fetched, 0 failed" in capsys.readouterr().out
+
+
+def test_warm_job_resumes_unfinished_chunks(client, fake_polygon_aggregates, mocker):
+    fetch_chunk = client._fetch_aggregate_chunk
+
+    def fail_first_call(*args, **kwargs):
+        if fetch.call_count == 1:
+            raise ConnectionError("network blip")
+        return fetch_chunk(*args, **kwargs)
+
+    fetch = mocker.patch.object(
+        client, "_fetch_aggregate_chunk", side_effect=fail_first_call
+    )
+
+    first = warm(
+        client, ["AAA"], [(1, "day")], "2010-01-01", "2020-06-14", 1, job="nightly"
+    )
+    plan = mocker.spy(client, "_plan_aggregate_chunks")
+    second = warm(
+        client, ["AAA"], [(1, "day")], "2010-01-01", "2020-06-14", 1, job="nightly"
+    )
+    third = warm(
+        client, ["AAA"], [(1, "day")], "2010-01-01", "2020-06-14", 1, job="nightly"
+    )
+
+    assert (first.planned, first.fetched, len(first.failed)) == (2, 1, 1)
+    assert (second.planned, second.resumed, second.fetched) == (2, 1, 1)
+    assert (third.planned, third.resumed, third.fetched) == (2, 2, 0)
+    plan.assert_not_called()
+    assert fetch.call_count == 3
+    assert BackfillManifest(client.cache.filename).progress("nightly") == {"done": 2}
+
+
+def test_warm_counts_chunks_cached_after_the_lookup(
+    client, fake_polygon_aggregates, mocker
+):
+    client.stocks_equities_aggregates("AAA", 1, "day", "2020-06-01", "2020-06-14")
+    # another warmer caches the chunk after this one looked it up
+    mocker.patch.object(client.cache, "cached_keys", return_value=set())
+
+    report = warm(
+        client, ["AAA"], [(1, "day")], "2020-06-01", "2020-06-14", job="nightly"
+    )
+
+    assert (report.cached, report.fetched, report.claimed) == (1, 0, 0)
+    assert BackfillManifest(client.cache.filename).progress("nightly") == {"done": 1}
@@ -0,0 +1,101 @@
+import contextvars
+import time
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Optional
+
+# the tracer of the client call in progress, copied into pool threads with the
+# rest of the context so spans there nest under the call's span
+_current_tracer = contextvars.ContextVar("polygon_cache_tracer", default=None)
+_current_span = contextvars.ContextVar("polygon_cache_span", default=None)
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+@contextmanager
+def tracing(tracer):
+    # makes the tracer, anything with an opentelemetry style
+    # start_as_current_span(name, attributes=...), trace the calls within
+    token = _current_tracer.set(tracer)
+    try:
+        yield
+    finally:
+        _current_tracer.reset(token)
+
+
+def span(name: str, **attributes):
+    # a span of one stage if a tracer is active, attribute values should be
+    # str, bool, int or float like opentelemetry expects
+    tracer = _current_tracer.get()
+    if tracer is None:
+        return nullcontext(NOOP_SPAN)
+    return tracer.start_as_current_span(f"polygon_cache.{name}", attributes=attributes)
+
+
+def submit_in_span(
+    executor: Executor, name: str, attributes: dict, fn: Callable, *args, **kwargs
+) -> Future:
+    # runs fn in a pool thread in a span that is a child of the current one,
+    # with how long it waited for a thread as its queue_seconds attribute
+    context = contextvars.copy_context()
+    submitted = time.perf_counter()
+
+    def run():
+        queued = time.perf_counter() - submitted
+        with span(name, queue_seconds=queued, **attributes):
+            return fn(*args, **kwargs)
+
+    return executor.submit(context.run, run)
+
+
+class Span:
+    def __init__(self, name: str, attributes: dict, parent: Optional["Span"]):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.parent = parent
+        self.error: Optional[BaseException] = None
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    @property
+    def seconds(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+
+class CallbackTracer:
+    # a tracer without any dependencies that calls on_start(span) and
+    # on_end(span) around every stage, e.g. to log slow stages or to forward
+    # them to a tracing backend without an opentelemetry sdk
+    def __init__(
+        self,
+        on_start: Optional[Callable[[Span], None]] = None,
+        on_end: Optional[Callable[[Span], None]] = None,
+    ):
+        self.on_start = on_start
+        self.on_end = on_end
+
+    @contextmanager
+    def start_as_current_span(self, name: str, attributes: Optional[dict] = None):
+        current = Span(name, attributes, _current_span.get())
+        token = _current_span.set(current)
+        if self.on_start is not None:
+            self.on_start(current)
+        try:
+            yield current
+        except BaseException as error:
+            current.error = error
+            raise
+        finally:
+            current.end = time.perf_counter()
+            _current_span.reset(token)
+            if self.on_end is not None:
+                self.on_end(current)
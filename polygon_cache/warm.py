@@ -0,0 +1,180 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from polygon_cache.backend import gaps
+from polygon_cache.backfill import DONE, FAILED, BackfillManifest
+
+
+def parse_timespan(value: str) -> Tuple[int, str]:
+    # timespans are given as "minute" or with a multiplier as "5/minute"
+    multiplier, _, timespan = value.rpartition("/")
+    return int(multiplier or 1), timespan
+
+
+def read_tickers(path: str) -> List[str]:
+    # one ticker per line, blank lines and lines starting with # are skipped
+    with open(path) as tickers_file:
+        lines = (line.strip() for line in tickers_file)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+class WarmReport:
+    def __init__(self):
+        self.planned = 0
+        self.resumed = 0
+        self.cached = 0
+        self.claimed = 0
+        self.fetched = 0
+        self.failed = []
+        self.bars = 0
+        self.seconds = 0.0
+        self.gaps = {}
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.fetched / self.seconds if self.seconds else 0.0
+
+    @property
+    def bars_per_second(self) -> float:
+        return self.bars / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        planned = (
+            f"planned {self.planned} chunks: {self.resumed} done in earlier runs, "
+            f"{self.cached} already cached, {self.fetched} fetched, "
+            f"{len(self.failed)} failed"
+        )
+        if self.claimed:
+            planned += f", {self.claimed} fetched by other warmers"
+        lines = [
+            planned,
+            f"fetched {self.bars} bars in {self.seconds:.1f}s "
+            f"({self.chunks_per_second:.2f} chunks/s, {self.bars_per_second:.0f} bars/s)",
+        ]
+        for (ticker, multiplier, timespan), missing in self.gaps.items():
+            for start, end in missing:
+                lines.append(f"gap {ticker} {multiplier}/{timespan} {start} - {end}")
+        for chunk, error in self.failed:
+            lines.append(f"failed {' '.join(map(str, chunk))}: {error}")
+        return "\n".join(lines)
+
+
+def plan_chunks(client, tickers, timespans, from_, to) -> List[tuple]:
+    # every (ticker, multiplier, timespan, from, to) aggregates call needed
+    return [
+        (ticker, multiplier, timespan, *dates)
+        for ticker in tickers
+        for multiplier, timespan in timespans
+        for dates in client._plan_aggregate_chunks(
+            timespan, from_, to, client._chunk_days_for(ticker)
+        )
+    ]
+
+
+class ChunkClaimed(Exception):
+    # another warmer, possibly on another host, is fetching the chunk
+    pass
+
+
+class ChunkCached(Exception):
+    # another warmer fetched the chunk between the lookup and the claim
+    pass
+
+
+def _fetch_claimed(client, chunk: tuple, key: str, query_params: dict):
+    if not client.cache.claim(key):
+        raise ChunkClaimed(chunk)
+    try:
+        # it may have been fetched between the lookup and the claim
+        if client.cache.has_key(key):
+            raise ChunkCached(chunk)
+        return client._fetch_aggregate_chunk(*chunk, **query_params)
+    finally:
+        client.cache.release(key)
+
+
+def warm(
+    client, tickers, timespans, from_, to, concurrency=4, job: Optional[str] = None
+) -> WarmReport:
+    # fetches every chunk that isn't cached yet with at most `concurrency`
+    # requests in flight, the client's rate limiter applies to each of them.
+    # with a job name every chunk's completion is saved as it finishes so a
+    # rerun with the same name resumes from the unfinished chunks. chunks are
+    # claimed before they're fetched so warmers sharing a multi host cache
+    # split the work between them
+    report = WarmReport()
+    started = time.monotonic()
+    query_params = {"unadjusted": "true"} if client.local_split_adjustment else {}
+
+    manifest = BackfillManifest(client.cache.filename) if job else None
+    if manifest is not None and manifest.exists(job):
+        chunks = manifest.unfinished(job)
+        report.planned = sum(manifest.progress(job).values())
+        report.resumed = report.planned - len(chunks)
+    else:
+        chunks = plan_chunks(client, tickers, timespans, from_, to)
+        report.planned = len(chunks)
+        if manifest is not None:
+            manifest.plan(job, chunks)
+
+    keys = [
+        client._cache_key(client._aggregate_endpoint(*chunk), query_params)
+        for chunk in chunks
+    ]
+    cached_keys = client.cache.cached_keys(keys)
+    misses = [
+        (chunk, key) for chunk, key in zip(chunks, keys) if key not in cached_keys
+    ]
+    report.cached = len(chunks) - len(misses)
+    if manifest is not None:
+        manifest.mark(
+            job,
+            [chunk for chunk, key in zip(chunks, keys) if key in cached_keys],
+            DONE,
+        )
+
+    if misses:
+        with ThreadPoolExecutor(concurrency) as executor:
+            futures = {
+                executor.submit(_fetch_claimed, client, chunk, key, query_params): chunk
+                for chunk, key in misses
+            }
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    response = future.result()
+                except ChunkClaimed:
+                    report.claimed += 1
+                    continue
+                except ChunkCached:
+                    report.cached += 1
+                    if manifest is not None:
+                        manifest.mark(job, [chunk], DONE)
+                    continue
+                except Exception as error:
+                    report.failed.append((chunk, error))
+                    if manifest is not None:
+                        manifest.mark(job, [chunk], FAILED, str(error))
+                    continue
+                report.fetched += 1
+                report.bars += len(getattr(response, "results", None) or [])
+                if manifest is not None:
+                    manifest.mark(job, [chunk], DONE)
+
+    report.seconds = time.monotonic() - started
+
+    start = datetime.strptime(from_, "%Y-%m-%d").date()
+    end = datetime.strptime(to, "%Y-%m-%d").date()
+    for ticker in tickers:
+        for multiplier, timespan in timespans:
+            missing = gaps(
+                client.cache.coverage(ticker, multiplier=multiplier, timespan=timespan),
+                start,
+                end,
+            )
+            if missing:
+                report.gaps[(ticker, multiplier, timespan)] = missing
+
+    return report